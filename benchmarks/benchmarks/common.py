@@ -0,0 +1,17 @@
+"""Utilities shared by the benchmarks."""
+
+from __future__ import division, print_function, absolute_import
+import warnings
+
+
+class Benchmark(object):
+    """Base class with sensible options for the benchmarks."""
+    goal_time = 0.25
+    timeout = 300
+
+
+def solve(fun, *args, **kwargs):
+    """Call ``fun`` ignoring the warnings it raises."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return fun(*args, **kwargs)
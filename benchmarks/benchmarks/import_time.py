@@ -0,0 +1,52 @@
+"""Benchmarks for the import time of ``ipsolver``.
+
+Every import is timed in a new Python process, so the modules
+already imported by other benchmarks do not affect the result.
+"""
+
+from __future__ import division, print_function, absolute_import
+import os
+import subprocess
+import sys
+from .common import Benchmark
+
+try:
+    import ipsolver
+except ImportError:
+    pass
+
+
+STATEMENTS = {"package": "import ipsolver",
+              "minimize_constrained":
+                  "from ipsolver import minimize_constrained"}
+
+CODE = """
+from timeit import default_timer
+start = default_timer()
+{0}
+print(default_timer() - start)
+"""
+
+
+class ImportTime(Benchmark):
+    """Time, in seconds, to import ``ipsolver`` in a new process."""
+    params = [['package', 'minimize_constrained']]
+    param_names = ['statement']
+    unit = "seconds"
+    repeat = 5
+
+    def setup(self, statement):
+        # Find the package from the source tree as well.
+        source_dir = os.path.dirname(os.path.dirname(ipsolver.__file__))
+        self.env = dict(os.environ)
+        self.env["PYTHONPATH"] = os.pathsep.join(
+            [source_dir] + [p for p in [os.environ.get("PYTHONPATH")] if p])
+
+    def track_import_time(self, statement):
+        times = []
+        for _ in range(self.repeat):
+            output = subprocess.check_output(
+                [sys.executable, "-c", CODE.format(STATEMENTS[statement])],
+                env=self.env)
+            times.append(float(output))
+        return min(times)
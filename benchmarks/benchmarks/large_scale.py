@@ -0,0 +1,114 @@
+"""Benchmarks for ``minimize_constrained`` on large sparse problems.
+
+The problem sizes can be changed with the environment variable
+``IPSOLVER_BENCHMARK_SIZES`` (a comma-separated list of sizes),
+e.g., ``IPSOLVER_BENCHMARK_SIZES=100000,1000000``, and those of
+the time to the first iteration with ``IPSOLVER_SETUP_BENCHMARK_SIZES``
+(by default 10^6).
+"""
+
+from __future__ import division, print_function, absolute_import
+import os
+from .common import Benchmark, solve
+
+try:
+    from ipsolver import minimize_constrained
+    from .large_scale_problems import (OptimalControl, SparseQP,
+                                       BoundConstrainedQuadratic,
+                                       BandedNonlinearEquations)
+except ImportError:
+    pass
+
+
+SIZES = [int(n) for n in
+         os.environ.get("IPSOLVER_BENCHMARK_SIZES", "1000,10000").split(",")]
+SETUP_SIZES = [int(n) for n in
+               os.environ.get("IPSOLVER_SETUP_BENCHMARK_SIZES",
+                              "1000000").split(",")]
+
+
+def get_problem(name, n):
+    if name == 'OptimalControl':
+        return OptimalControl(n_steps=n//2)
+    elif name == 'SparseQP':
+        return SparseQP(n)
+    elif name == 'BoundConstrainedQuadratic':
+        return BoundConstrainedQuadratic(n)
+    elif name == 'BandedNonlinearEquations':
+        return BandedNonlinearEquations(n)
+
+
+class LargeScaleProblems(Benchmark):
+    """Solve sparse problems with about ``n`` variables."""
+    params = [
+        ['OptimalControl', 'SparseQP', 'BoundConstrainedQuadratic',
+         'BandedNonlinearEquations'],
+        SIZES
+    ]
+    param_names = ['problem', 'n']
+    timeout = 3600
+
+    def setup(self, name, n):
+        self.prob = get_problem(name, n)
+        self.constr = self.prob.constr
+        self.result = self.solve()
+
+    def solve(self):
+        prob = self.prob
+        return solve(minimize_constrained, prob.fun, prob.x0, prob.grad,
+                     prob.hess, self.constr, sparse_jacobian=True)
+
+    def time_solve(self, name, n):
+        self.solve()
+
+    def track_nfev(self, name, n):
+        return self.result.nfev
+
+    def track_niter(self, name, n):
+        return self.result.niter
+
+    def track_cg_niter(self, name, n):
+        return self.result.cg_niter
+
+
+class TimeToFirstIteration(Benchmark):
+    """Time from the call to ``minimize_constrained`` until the end
+    of the first iteration, i.e., the setup of the constraints and of
+    the solver followed by a single iteration, for very large ``n``."""
+    params = [
+        ['OptimalControl', 'BoundConstrainedQuadratic',
+         'BandedNonlinearEquations'],
+        SETUP_SIZES
+    ]
+    param_names = ['problem', 'n']
+    timeout = 3600
+
+    def setup(self, name, n):
+        self.prob = get_problem(name, n)
+
+    def time_first_iteration(self, name, n):
+        prob = self.prob
+        solve(minimize_constrained, prob.fun, prob.x0, prob.grad,
+              prob.hess, prob.constr, sparse_jacobian=True,
+              callback=lambda state: True)
+
+
+class ProblemGeneration(Benchmark):
+    """Generate the problems and evaluate their derivatives once."""
+    params = [
+        ['OptimalControl', 'SparseQP', 'BoundConstrainedQuadratic',
+         'BandedNonlinearEquations'],
+        SIZES
+    ]
+    param_names = ['problem', 'n']
+
+    def time_generate(self, name, n):
+        prob = get_problem(name, n)
+        prob.grad(prob.x0)
+        prob.hess(prob.x0)
+        constr = prob.constr
+        if not isinstance(constr, tuple):
+            constr = (constr,)
+        for c in constr:
+            if hasattr(c, "_jac"):
+                c._jac(prob.x0)
@@ -0,0 +1,261 @@
+"""Scalable large-scale sparse test problems.
+
+All the problems provide analytic first and second derivatives as
+sparse matrices and are assembled with vectorized operations only,
+so they can be generated with 10^5-10^7 variables. Every problem
+has the attributes ``x0``, ``fun``, ``grad``, ``hess`` and ``constr``
+used by ``minimize_constrained``, in the same format as the problems
+from ``ipsolver/tests/test_minimized_constrained.py``.
+"""
+
+from __future__ import division, print_function, absolute_import
+import numpy as np
+import scipy.sparse as spc
+from ipsolver import NonlinearConstraint, LinearConstraint, BoxConstraint
+
+__all__ = ['OptimalControl',
+           'SparseQP',
+           'BoundConstrainedQuadratic',
+           'BandedNonlinearEquations']
+
+
+def _random_sparse(m, n, nnz_per_row, rng):
+    """Random sparse matrix with about ``nnz_per_row`` elements per row.
+
+    Unlike ``scipy.sparse.random`` it does not sample without
+    replacement among all the ``m*n`` positions, hence can be used
+    for very large dimensions."""
+    rows = np.repeat(np.arange(m), nnz_per_row)
+    cols = rng.randint(0, n, m*nnz_per_row)
+    data = rng.normal(size=m*nnz_per_row)
+    return spc.csr_matrix((data, (rows, cols)), shape=(m, n))
+
+
+class OptimalControl:
+    """Discretized nonlinear optimal control problem.
+
+    Explicit Euler discretization, with ``n_steps`` steps of
+    size ``h = 1/n_steps``, of:
+
+        minimize 1/2 int_0^1 (y(t) - sin(2 pi t))**2 + alpha u(t)**2 dt
+        subject to: y'(t) = u(t) - sin(y(t)),  y(0) = y_init
+                    -u_max <= u(t) <= u_max
+
+    The variables are ``x = [y[0], ..., y[n_steps], u[0], ...,
+    u[n_steps-1]]``, the equality constraints are:
+
+        y[0] - y_init = 0
+        y[k+1] - y[k] - h*(u[k] - sin(y[k])) = 0
+
+    and the constraint Jacobian is banded.
+    """
+    def __init__(self, n_steps=1000, alpha=1e-2, y_init=1.0, u_max=2.0):
+        self.n_steps = n_steps
+        self.h = 1/n_steps
+        self.alpha = alpha
+        self.y_init = y_init
+        self.u_max = u_max
+        self.n_vars = 2*n_steps + 1
+        self.y_target = np.sin(2*np.pi*np.linspace(0, 1, n_steps + 1))
+        self.x0 = np.zeros(self.n_vars)
+        self.x_opt = None
+
+    def _split(self, x):
+        return x[:self.n_steps+1], x[self.n_steps+1:]
+
+    def fun(self, x):
+        y, u = self._split(x)
+        return self.h/2*(np.sum((y - self.y_target)**2)
+                         + self.alpha*np.sum(u**2))
+
+    def grad(self, x):
+        y, u = self._split(x)
+        return self.h*np.hstack((y - self.y_target, self.alpha*u))
+
+    def hess(self, x):
+        d = np.hstack((np.full(self.n_steps+1, self.h),
+                       np.full(self.n_steps, self.alpha*self.h)))
+        return spc.diags(d, format="csr")
+
+    @property
+    def constr(self):
+        N, h = self.n_steps, self.h
+        k = np.arange(N)
+
+        def fun(x):
+            y, u = self._split(x)
+            return np.hstack((y[0] - self.y_init,
+                              y[1:] - y[:-1] - h*(u - np.sin(y[:-1]))))
+
+        def jac(x):
+            y, _ = self._split(x)
+            rows = np.hstack((0, k + 1, k + 1, k + 1))
+            cols = np.hstack((0, k + 1, k, N + 1 + k))
+            data = np.hstack((1, np.ones(N), -1 + h*np.cos(y[:-1]),
+                              np.full(N, -h)))
+            return spc.csr_matrix((data, (rows, cols)),
+                                  shape=(N + 1, self.n_vars))
+
+        def hess(x, v):
+            y, _ = self._split(x)
+            d = np.zeros(self.n_vars)
+            d[:N] = -h*np.sin(y[:-1])*v[1:]
+            return spc.diags(d, format="csr")
+
+        lb = np.hstack((np.full(N + 1, -np.inf), np.full(N, -self.u_max)))
+        ub = np.hstack((np.full(N + 1, np.inf), np.full(N, self.u_max)))
+        return (NonlinearConstraint(fun, ("equals",), jac, hess),
+                BoxConstraint(("interval", lb, ub)))
+
+
+class SparseQP:
+    """Sparse equality-constrained convex quadratic problem.
+
+    The following optimization problem:
+
+        minimize 1/2 x.T H x + c.T x
+        subject to: A x = b
+
+    with ``n`` variables and ``m`` constraints. ``H`` is a random
+    sparse symmetric diagonally dominant (hence positive definite)
+    matrix and ``A = [I, R]``, with ``R`` a random sparse matrix,
+    has full row rank. Both have about ``nnz_per_row`` nonzero
+    elements per row.
+    """
+    def __init__(self, n=1000, m=None, nnz_per_row=5, random_state=0):
+        rng = np.random.RandomState(random_state)
+        if m is None:
+            m = n//2
+        self.n_vars = n
+        R = _random_sparse(n, n, nnz_per_row, rng)
+        H = R + R.T
+        diagonal = np.asarray(abs(H).sum(axis=1)).ravel() + 1
+        self.H = (H + spc.diags(diagonal)).tocsr()
+        self.c = rng.normal(size=n)
+        self.A = spc.hstack((spc.eye(m),
+                             _random_sparse(m, n - m, nnz_per_row, rng)),
+                            format="csr")
+        self.b = rng.normal(size=m)
+        self.x0 = np.zeros(n)
+        self.x_opt = None
+
+    def fun(self, x):
+        return 1/2*x.dot(self.H.dot(x)) + self.c.dot(x)
+
+    def grad(self, x):
+        return self.H.dot(x) + self.c
+
+    def hess(self, x):
+        return self.H
+
+    @property
+    def constr(self):
+        return LinearConstraint(self.A, ("equals", self.b))
+
+
+class BoundConstrainedQuadratic:
+    """One-dimensional obstacle problem.
+
+    Finite-difference discretization, with ``n`` interior points
+    ``t[i]``, of an elastic string with a reaction term pushed by a
+    constant force against the obstacle ``psi(t) = -0.5 - 2*(t - 0.5)**2``:
+
+        minimize 1/2 x.T (L + sigma I) x - f.T x
+        subject to: x >= psi(t)
+
+    where ``L = tridiag(-1, 2, -1)``. The reaction term keeps the
+    problem well conditioned for any ``n``, and the constraint is
+    active in a large region around ``t = 0.5``.
+    """
+    def __init__(self, n=1000, force=-1.0, sigma=1.0):
+        self.n_vars = n
+        h = 1/(n + 1)
+        t = np.linspace(h, 1 - h, n)
+        self.L = spc.diags([-np.ones(n-1), (2 + sigma)*np.ones(n),
+                            -np.ones(n-1)], [-1, 0, 1], format="csr")
+        self.f = np.full(n, force)
+        self.psi = -0.5 - 2*(t - 0.5)**2
+        self.x0 = np.zeros(n)
+        self.x_opt = None
+
+    def fun(self, x):
+        return 1/2*x.dot(self.L.dot(x)) - self.f.dot(x)
+
+    def grad(self, x):
+        return self.L.dot(x) - self.f
+
+    def hess(self, x):
+        return self.L
+
+    @property
+    def constr(self):
+        return BoxConstraint(("greater", self.psi))
+
+
+class BandedNonlinearEquations:
+    """Minimum-norm solution of the Broyden banded system.
+
+    The following optimization problem:
+
+        minimize 1/2 ||x||**2
+        subject to: x[i]*(2 + 5*x[i]**2) + 1
+                    - sum(x[j]*(1 + x[j]) for j in J[i]) = 0
+
+    for ``i = 0, ..., n-1``, where ``J[i]`` contains the indices
+    ``j != i`` with ``i - lower <= j <= i + upper``. The Jacobian
+    is banded and the Hessian of the constraints is diagonal.
+
+    References
+    ----------
+    .. [1] More, J. J., Garbow, B. S., and Hillstrom, K. E. "Testing
+           unconstrained optimization software." ACM Transactions
+           on Mathematical Software 7.1 (1981): 17-41.
+    """
+    def __init__(self, n=1000, lower=5, upper=1):
+        self.n_vars = n
+        self.lower = lower
+        self.upper = upper
+        self.offsets = [d for d in range(-lower, upper + 1) if d != 0]
+        self.x0 = -np.ones(n)
+        self.x_opt = None
+
+    def fun(self, x):
+        return 1/2*x.dot(x)
+
+    def grad(self, x):
+        return x
+
+    def hess(self, x):
+        return spc.eye(self.n_vars, format="csr")
+
+    @property
+    def constr(self):
+        n = self.n_vars
+
+        def fun(x):
+            q = x*(1 + x)
+            c = x*(2 + 5*x**2) + 1
+            for d in self.offsets:
+                if d > 0:
+                    c[:n-d] -= q[d:]
+                else:
+                    c[-d:] -= q[:n+d]
+            return c
+
+        def jac(x):
+            p = -(1 + 2*x)
+            diagonals = [2 + 15*x**2]
+            for d in self.offsets:
+                diagonals.append(p[d:] if d > 0 else p[:n+d])
+            return spc.diags(diagonals, [0] + self.offsets, format="csr")
+
+        def hess(x, v):
+            # sum(v[i] for i in [j - upper, j + lower] if i != j)
+            cumsum = np.hstack((0, np.cumsum(v)))
+            j = np.arange(n)
+            start = np.maximum(j - self.upper, 0)
+            stop = np.minimum(j + self.lower + 1, n)
+            window = cumsum[stop] - cumsum[start] - v
+            return spc.diags(30*x*v - 2*window, format="csr")
+
+        return NonlinearConstraint(fun, ("equals",), jac, hess)
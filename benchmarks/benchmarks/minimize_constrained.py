@@ -0,0 +1,162 @@
+"""Benchmarks for ``minimize_constrained`` on the bundled test problems."""
+
+from __future__ import division, print_function, absolute_import
+from .common import Benchmark, solve
+
+try:
+    from ipsolver import minimize_constrained
+    from ipsolver.tests.test_minimized_constrained import (
+        Maratos, HyperbolicIneq, Rosenbrock, IneqRosenbrock,
+        EqIneqRosenbrock, Elec)
+except ImportError:
+    pass
+
+try:
+    import sksparse
+except ImportError:
+    sksparse = None
+
+
+METHODS = ['equality_constrained_sqp', 'tr_interior_point']
+FACTORIZATION_METHODS = ['QRFactorization', 'SVDFactorization',
+                         'AugmentedSystem', 'NormalEquation']
+SPARSE_FACTORIZATION_METHODS = ('AugmentedSystem', 'NormalEquation')
+
+
+class _MinimizeConstrained(Benchmark):
+    """Solve a problem once during ``setup`` and time the solution.
+
+    Besides the execution time, the number of function evaluations,
+    of iterations and of CG iterations are tracked.
+    """
+    def get_problem(self, *params):
+        """Return the problem and its constraints."""
+        raise NotImplementedError
+
+    def get_options(self, *params):
+        """Return the solver options, besides the factorization method."""
+        return {}
+
+    def setup(self, *params):
+        prob, constr = self.get_problem(*params)
+        method, factorization_method = params[-2:]
+        if (method == 'equality_constrained_sqp'
+                and _has_inequalities(constr)):
+            # Not supported: skipped.
+            raise NotImplementedError()
+        if factorization_method == 'NormalEquation' and sksparse is None:
+            raise NotImplementedError()
+        self.prob = prob
+        self.constr = constr
+        if factorization_method is None:
+            # Planned by the solver.
+            sparse_jacobian = None
+        else:
+            sparse_jacobian = (factorization_method
+                               in SPARSE_FACTORIZATION_METHODS)
+        self.kwargs = dict(
+            method=method,
+            sparse_jacobian=sparse_jacobian,
+            options=dict(self.get_options(*params),
+                         factorization_method=factorization_method))
+        self.result = self.solve()
+
+    def solve(self):
+        prob = self.prob
+        return solve(minimize_constrained, prob.fun, prob.x0, prob.grad,
+                     prob.hess, self.constr, **self.kwargs)
+
+    def time_solve(self, *params):
+        self.solve()
+
+    def track_nfev(self, *params):
+        return self.result.nfev
+
+    def track_niter(self, *params):
+        return self.result.niter
+
+    def track_cg_niter(self, *params):
+        return self.result.cg_niter
+
+
+def _has_inequalities(constr):
+    if not isinstance(constr, (list, tuple)):
+        constr = [constr]
+    for c in constr:
+        if c.kind[0] != 'equals':
+            return True
+    return False
+
+
+class SmallProblems(_MinimizeConstrained):
+    params = [
+        ['Maratos', 'HyperbolicIneq', 'Rosenbrock',
+         'IneqRosenbrock', 'EqIneqRosenbrock'],
+        METHODS,
+        FACTORIZATION_METHODS
+    ]
+    param_names = ['problem', 'method', 'factorization_method']
+
+    def get_problem(self, name, method, factorization_method):
+        prob = {'Maratos': Maratos,
+                'HyperbolicIneq': HyperbolicIneq,
+                'Rosenbrock': Rosenbrock,
+                'IneqRosenbrock': IneqRosenbrock,
+                'EqIneqRosenbrock': EqIneqRosenbrock}[name]()
+        return prob, prob.constr
+
+
+class ScalableRosenbrock(_MinimizeConstrained):
+    params = [
+        [10, 50, 100],
+        ['equality_constrained_sqp'],
+        ['QRFactorization', 'AugmentedSystem', None]
+    ]
+    param_names = ['n', 'method', 'factorization_method']
+
+    def get_problem(self, n, method, factorization_method):
+        prob = Rosenbrock(n)
+        return prob, prob.constr
+
+
+class ElecProblem(_MinimizeConstrained):
+    params = [
+        [10, 25, 50],
+        METHODS,
+        FACTORIZATION_METHODS
+    ]
+    param_names = ['n_electrons', 'method', 'factorization_method']
+
+    def get_problem(self, n_electrons, method, factorization_method):
+        prob = Elec(n_electrons)
+        constr = prob.constr
+        if method == 'equality_constrained_sqp':
+            # Electrons on the surface of the sphere.
+            constr.kind = ('equals',)
+        return prob, constr
+
+
+class NonmonotoneAcceptance(_MinimizeConstrained):
+    params = [
+        ['Maratos', 'Elec'],
+        [1, 2, 3, 5],
+        ['equality_constrained_sqp'],
+        ['AugmentedSystem']
+    ]
+    param_names = ['problem', 'nonmonotone_memory', 'method',
+                   'factorization_method']
+
+    def get_problem(self, name, nonmonotone_memory, method,
+                    factorization_method):
+        if name == 'Maratos':
+            # Starting on the opposite side of the circle.
+            prob = Maratos(degrees=170)
+            return prob, prob.constr
+        prob = Elec(25)
+        constr = prob.constr
+        constr.kind = ('equals',)
+        return prob, constr
+
+    def get_options(self, name, nonmonotone_memory, method,
+                    factorization_method):
+        return {'nonmonotone_memory': nonmonotone_memory}
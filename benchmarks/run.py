@@ -0,0 +1,164 @@
+"""Run the benchmarks without asv and store the results.
+
+Usage::
+
+    python run.py [-b REGEX] [-o FILE] [--compare FILE] [--repeat N]
+
+Every benchmark class from the ``benchmarks`` package is run for all
+combinations of its parameters. ``time_*`` methods are timed (the best
+of ``--repeat`` runs is kept) and the values returned by ``track_*``
+methods are recorded. The results are stored as JSON in the directory
+``results/`` (or in the file given by ``-o``). With ``--compare`` the
+results are compared with a previously stored file and the regressions
+are reported.
+"""
+
+from __future__ import division, print_function, absolute_import
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import pkgutil
+import platform
+import re
+import subprocess
+import sys
+import time
+from timeit import default_timer
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import numpy as np
+import scipy
+
+
+def discover(pattern=None):
+    """Yield ``(name, class)`` for all the benchmark classes."""
+    import benchmarks
+    for module_info in pkgutil.iter_modules(benchmarks.__path__):
+        module = importlib.import_module("benchmarks." + module_info[1])
+        for class_name, cls in inspect.getmembers(module, inspect.isclass):
+            if (class_name.startswith("_")
+                    or cls.__module__ != module.__name__
+                    or not hasattr(cls, "params")):
+                continue
+            name = module_info[1] + "." + class_name
+            if pattern is None or re.search(pattern, name):
+                yield name, cls
+
+
+def run_benchmark(cls, repeat):
+    """Run all the benchmarks of ``cls`` and return a list of records."""
+    params = cls.params
+    if params and not isinstance(params[0], (list, tuple)):
+        params = [params]
+    methods = [name for name in dir(cls)
+               if name.startswith("time_") or name.startswith("track_")]
+    records = []
+    for combination in itertools.product(*params):
+        bench = cls()
+        try:
+            if hasattr(bench, "setup"):
+                bench.setup(*combination)
+        except NotImplementedError:
+            continue
+        record = {"params": dict(zip(cls.param_names, combination))}
+        for name in methods:
+            method = getattr(bench, name)
+            if name.startswith("time_"):
+                times = []
+                for _ in range(repeat):
+                    start = default_timer()
+                    method(*combination)
+                    times.append(default_timer() - start)
+                record[name] = min(times)
+            else:
+                record[name] = method(*combination)
+        records.append(record)
+    return records
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BENCHMARK_DIR,
+            stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new, factor):
+    """Print the benchmarks whose time or tracked values got worse
+    by more than ``factor``. Returns the number of regressions."""
+    n_regressions = 0
+    for name, records in new["benchmarks"].items():
+        old_records = {json.dumps(r["params"], sort_keys=True): r
+                       for r in old["benchmarks"].get(name, [])}
+        for record in records:
+            key = json.dumps(record["params"], sort_keys=True)
+            if key not in old_records:
+                continue
+            for field, value in record.items():
+                old_value = old_records[key].get(field)
+                if field == "params" or not old_value:
+                    continue
+                ratio = value/old_value
+                if ratio > factor:
+                    n_regressions += 1
+                    print("{0} {1} {2}: {3:.4g} -> {4:.4g} ({5:.2f}x)"
+                          .format(name, key, field, old_value,
+                                  value, ratio))
+    return n_regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-b", "--bench", default=None,
+                        help="Run only benchmarks matching this regex.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Output file.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of timing repetitions.")
+    parser.add_argument("--compare", default=None,
+                        help="Previous results to compare with.")
+    parser.add_argument("--factor", type=float, default=1.1,
+                        help="Ratio above which a change is reported "
+                             "as a regression.")
+    args = parser.parse_args(argv)
+
+    results = {"date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "revision": git_revision(),
+               "python": platform.python_version(),
+               "numpy": np.__version__,
+               "scipy": scipy.__version__,
+               "machine": platform.machine(),
+               "benchmarks": {}}
+    for name, cls in discover(args.bench):
+        print("Running", name)
+        results["benchmarks"][name] = run_benchmark(cls, args.repeat)
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(BENCHMARK_DIR, "results")
+        if not os.path.isdir(results_dir):
+            os.makedirs(results_dir)
+        output = os.path.join(results_dir, "{0}-{1}.json".format(
+            time.strftime("%Y%m%d-%H%M%S"), (results["revision"] or "")[:8]))
+    with open(output, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+    print("Results stored in", output)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if compare(old, results, args.factor) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,43 @@
-"""Interior point solver."""
+"""Interior point solver.
 
-from ._minimize_constrained import minimize_constrained
-from ._constraints import (NonlinearConstraint,
-                           LinearConstraint,
-                           BoxConstraint)
+The public objects are imported from their modules on first access,
+so ``import ipsolver`` does not load SciPy until one of them is used.
+"""
 
-all = ["minimize_constrained", "NonlinearConstraint",
-       "LinearConstraint", "BoxConstraint"]
+import importlib
+
+# Module defining each public object.
+_MODULES = {"minimize_constrained": "._minimize_constrained",
+            "minimize_constrained_batch": "._minimize_constrained_batch",
+            "minimize_constrained_async": "._minimize_constrained_async",
+            "ProcessPool": "._process_pool",
+            "NonlinearConstraint": "._constraints",
+            "LinearConstraint": "._constraints",
+            "BoxConstraint": "._constraints",
+            "ArrayRecorder": "._recorders",
+            "CSVRecorder": "._recorders",
+            "JSONLinesRecorder": "._recorders",
+            "LoggingRecorder": "._recorders"}
+
+all = ["minimize_constrained", "minimize_constrained_batch",
+       "minimize_constrained_async", "ProcessPool",
+       "NonlinearConstraint",
+       "LinearConstraint", "BoxConstraint",
+       "ArrayRecorder", "CSVRecorder", "JSONLinesRecorder",
+       "LoggingRecorder"]
+
+
+def __getattr__(name):
+    try:
+        module_name = _MODULES[name]
+    except KeyError:
+        raise AttributeError("module {0!r} has no attribute "
+                             "{1!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache it, so ``__getattr__`` is not called again.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULES))
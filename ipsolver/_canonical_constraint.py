@@ -8,7 +8,8 @@ from ._constraints import (NonlinearConstraint,
 __all__ = ['CanonicalConstraint',
            'to_canonical',
            'lagrangian_hessian',
-           'empty_canonical_constraint']
+           'empty_canonical_constraint',
+           'convert_jacobian']
 
 
 class CanonicalConstraint:
@@ -134,7 +135,8 @@ def lagrangian_hessian(constraint, hess):
                 result += h.dot(p)
             return result
 
-        return spc.linalg.LinearOperator((n, n), matvec)
+        from scipy.sparse.linalg import LinearOperator
+        return LinearOperator((n, n), matvec, dtype=float)
 
     return lagr_hess
 
@@ -163,6 +165,33 @@ def empty_canonical_constraint(x0, n_vars, sparse_jacobian=None):
                                empty_J, empty_J)
 
 
+def convert_jacobian(constraint, sparse_jacobian):
+    """Return CanonicalConstraint with the Jacobians of ``constraint``
+    converted to sparse (csr) matrices if ``sparse_jacobian`` is True
+    or to dense arrays otherwise."""
+    if sparse_jacobian:
+        def convert(J):
+            return spc.csr_matrix(J)
+    else:
+        def convert(J):
+            if spc.issparse(J):
+                return J.toarray()
+            return np.atleast_2d(J)
+
+    def jac(x):
+        J_ineq, J_eq = constraint.jac(x)
+        return convert(J_ineq), convert(J_eq)
+
+    return CanonicalConstraint(constraint.n_vars, constraint.n_ineq,
+                               constraint.n_eq, constraint.constr, jac,
+                               constraint.hess, bool(sparse_jacobian),
+                               constraint.enforce_feasibility,
+                               constraint.x0, constraint.c_ineq0,
+                               constraint.c_eq0,
+                               convert(constraint.J_ineq0),
+                               convert(constraint.J_eq0))
+
+
 # ************************************************************ #
 # **********           Auxiliar Functions           ********** #
 # ************************************************************ #
@@ -230,11 +259,55 @@ def _nonlinear_to_canonical(nonlinear):
 
 
 def _linear_to_canonical(linear):
-    return _nonlinear_to_canonical(linear.to_nonlinear())
+    canonical = _nonlinear_to_canonical(linear.to_nonlinear())
+    # The Jacobian matrices are constant, hence converted only once.
+    J_ineq0 = canonical.J_ineq0
+    J_eq0 = canonical.J_eq0
+
+    def new_jac(x):
+        return J_ineq0, J_eq0
+    canonical.jac = new_jac
+    return canonical
 
 
 def _box_to_canonical(box):
-    return _linear_to_canonical(box.to_linear())
+    if not box.sparse_jacobian:
+        return _linear_to_canonical(box.to_linear())
+    # Parse constraints
+    eq, ineq, val_eq, val_ineq, sign, fun_len \
+        = _parse_constraint(box.kind)
+    # Get dimensions
+    n_eq = len(eq)
+    n_ineq = len(ineq)
+    n_vars = box.n
+
+    def new_constr(x):
+        return _convert_constr(x, n_vars, n_eq, n_ineq,
+                               eq, ineq, val_eq, val_ineq,
+                               sign)
+    c_ineq0, c_eq0 = _convert_constr(box.x0, n_vars, n_eq, n_ineq,
+                                     eq, ineq, val_eq, val_ineq,
+                                     sign)
+
+    # The rows of the identity matrix selected by ``eq`` and
+    # ``ineq``, built directly in CSR format (one element per row).
+    J_eq0 = spc.csr_matrix((np.ones(n_eq), eq, np.arange(n_eq+1)),
+                           shape=(n_eq, n_vars))
+    J_ineq0 = spc.csr_matrix((sign, ineq, np.arange(n_ineq+1)),
+                             shape=(n_ineq, n_vars))
+
+    def new_jac(x):
+        return J_ineq0, J_eq0
+
+    if n_ineq == 0:
+        enforce_feasibility = np.empty(0, dtype=bool)
+    else:
+        enforce_feasibility = box.enforce_feasibility[ineq]
+
+    return CanonicalConstraint(n_vars, n_ineq, n_eq,
+                               new_constr, new_jac, None,
+                               True, enforce_feasibility, box.x0,
+                               c_ineq0, c_eq0, J_ineq0, J_eq0)
 
 
 def _convert_constr(c, n_vars, n_eq, n_ineq,
@@ -253,12 +326,16 @@ def _convert_sparse_jac(J, n_vars, n_eq, n_ineq,
                         sign):
     # Empty jacobian
     empty = spc.csr_matrix(np.empty((0, n_vars)))
-    # Compute equality and inequality Jacobian matrices
-    J_eq = J[eq, :] if n_eq > 0 else empty
+    # Compute equality and inequality Jacobian matrices. When all
+    # the constraints are equalities ``J`` is returned unchanged.
+    if n_eq == J.shape[0]:
+        J_eq = J
+    else:
+        J_eq = J[eq, :] if n_eq > 0 else empty
     if n_ineq > 0:
-        D = spc.lil_matrix((n_ineq, n_ineq))
-        D.setdiag(sign)
-        J_ineq = D*J[ineq, :]
+        # Scale the rows of the (copied) selected rows by ``sign``
+        J_ineq = spc.csr_matrix(J[ineq, :])
+        J_ineq.data = J_ineq.data*np.repeat(sign, np.diff(J_ineq.indptr))
     else:
         J_ineq = empty
     # Return Jacobian matrices
@@ -270,8 +347,12 @@ def _convert_dense_jac(J, n_vars, n_eq, n_ineq,
                        sign):
     # Empty jacobian
     empty = np.empty((0, n_vars))
-    # Compute equality and inequality Jacobian matrices
-    J_eq = J[eq, :] if n_eq > 0 else empty
+    # Compute equality and inequality Jacobian matrices. When all
+    # the constraints are equalities ``J`` is returned unchanged.
+    if n_eq == J.shape[0]:
+        J_eq = J
+    else:
+        J_eq = J[eq, :] if n_eq > 0 else empty
     if n_ineq > 0:
         J_ineq = np.multiply(J[ineq, :], sign[:, np.newaxis])
     else:
@@ -328,32 +409,39 @@ def _parse_constraint(kind):
         sign = np.empty(0)
         fun_len = len(c)
     elif kind[0] in ("greater", "less", "interval"):
-        # Constraint type
+        # Constraint type. Infinite bounds are represented by None.
+        lb = None
+        ub = None
         if kind[0] == "greater":
             lb = np.asarray(kind[1], dtype=float)
-            ub = np.full_like(lb, np.inf, dtype=float)
+            fun_len = len(lb)
         elif kind[0] == "less":
             ub = np.asarray(kind[1], dtype=float)
-            lb = np.full_like(ub, -np.inf, dtype=float)
+            fun_len = len(ub)
         elif kind[0] == "interval":
             lb = np.asarray(kind[1], dtype=float)
             ub = np.asarray(kind[2], dtype=float)
-        # Set auxiliar values
-        arange = np.arange(len(lb), dtype=int)
-        ones = np.ones(len(lb))
-        lb_isinf = np.isinf(lb)
-        ub_isinf = np.isinf(ub)
-        eq_list = (lb == ub) & ~lb_isinf & ~ub_isinf
+            fun_len = len(lb)
+        # Indices of the finite lower and upper bounds
+        # and of the equality constraints (lb == ub).
+        lower = (np.flatnonzero(~np.isinf(lb)) if lb is not None
+                 else np.empty(0, dtype=int))
+        upper = (np.flatnonzero(~np.isinf(ub)) if ub is not None
+                 else np.empty(0, dtype=int))
+        if lb is not None and ub is not None:
+            is_eq = lb[lower] == ub[lower]
+            eq = lower[is_eq]
+            lower = lower[~is_eq]
+            upper = upper[lb[upper] != ub[upper]]
+        else:
+            eq = np.empty(0, dtype=int)
         # Set returns
-        eq = arange[eq_list]
-        val_eq = lb[eq_list]
-        ineq = np.hstack((arange[~eq_list & ~lb_isinf],
-                          arange[~eq_list & ~ub_isinf]))
-        val_ineq = np.hstack((lb[~eq_list & ~lb_isinf],
-                              ub[~eq_list & ~ub_isinf]))
-        sign = np.hstack((-ones[~eq_list & ~lb_isinf],
-                          ones[~eq_list & ~ub_isinf]))
-        fun_len = len(lb)
+        val_eq = lb[eq] if len(eq) > 0 else np.empty(0)
+        ineq = np.hstack((lower, upper))
+        val_ineq = np.hstack((lb[lower] if lb is not None else [],
+                              ub[upper] if ub is not None else []))
+        sign = np.hstack((np.full(len(lower), -1.0),
+                          np.full(len(upper), 1.0)))
     else:
         raise RuntimeError("Never be here.")
 
@@ -425,7 +513,8 @@ def _concatenate_canonical_constraints(constraints,
                 result += h.dot(p)
             return result
 
-        return spc.linalg.LinearOperator((n_vars, n_vars), matvec)
+        from scipy.sparse.linalg import LinearOperator
+        return LinearOperator((n_vars, n_vars), matvec, dtype=float)
 
     # Concatenate feasible constraint list
     enforce_feasibility_list = [constr.enforce_feasibility
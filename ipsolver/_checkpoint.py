@@ -0,0 +1,66 @@
+"""Checkpoints of the solver state.
+
+A checkpoint contains everything needed to continue an interrupted
+execution of `minimize_constrained` from the iteration it was taken
+at: the iterate, slack variables and Lagrange multipliers, the trust
+radius, the penalty, the barrier parameter and subproblem tolerance
+and the counters. It is stored as a NumPy ``.npz`` file.
+"""
+
+from __future__ import division, print_function, absolute_import
+import numpy as np
+import os
+
+__all__ = ['save_checkpoint', 'load_checkpoint', 'COUNTERS']
+
+
+COUNTERS = ("niter", "nfev", "ngev", "ncev", "njev", "nhev",
+            "nhev_skipped", "nfactor", "nfactor_reused", "cg_niter")
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(filename, state, method, n_vars):
+    """Save the solver ``state`` to ``filename``.
+
+    For 'tr_interior_point' ``state.x`` contains the variables
+    followed by the slack variables. The file is first written
+    under a temporary name and then renamed, so an interruption
+    while saving never leaves a corrupted checkpoint behind.
+    """
+    x = np.asarray(state.x)
+    values = dict(version=CHECKPOINT_VERSION,
+                  method=method,
+                  x=x[:n_vars],
+                  s=x[n_vars:],
+                  v=state.v,
+                  trust_radius=state.trust_radius,
+                  penalty=state.penalty,
+                  barrier_parameter=state.get("barrier_parameter", np.nan),
+                  tolerance=state.get("tolerance", np.nan))
+    for name in COUNTERS:
+        values[name] = state[name]
+
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        np.savez(f, **values)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """Load a checkpoint saved by `save_checkpoint` as a dictionary."""
+    with np.load(filename) as data:
+        if int(data["version"]) != CHECKPOINT_VERSION:
+            raise ValueError("Unsupported checkpoint version.")
+        checkpoint = dict(method=str(data["method"]),
+                          x=data["x"],
+                          s=data["s"],
+                          v=data["v"],
+                          trust_radius=float(data["trust_radius"]),
+                          penalty=float(data["penalty"]),
+                          barrier_parameter=float(data["barrier_parameter"]),
+                          tolerance=float(data["tolerance"]))
+        for name in COUNTERS:
+            checkpoint[name] = int(data[name])
+    return checkpoint
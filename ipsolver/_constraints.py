@@ -1,9 +1,10 @@
 from __future__ import division, print_function, absolute_import
 import numpy as np
 import scipy.sparse as spc
-from scipy.sparse.linalg import LinearOperator
 from ._numdiff import approx_derivative
+from ._memoize import MemoizeJac
 from warnings import warn
+from copy import copy
 
 
 __all__ = ['NonlinearConstraint',
@@ -45,12 +46,18 @@ class NonlinearConstraint:
         where ``lb``,  ``ub`` and ``c`` are (m,) ndarrays or
         scalar values. In the latter case, the same value
         will be repeated for all the constraints.
-    jac : callable
+    jac : {callable, True}
         Jacobian Matrix:
 
             jac(x) -> {ndarray, sparse matrix}, shape (m, n)
 
-        where x is a (n,) ndarray.
+        where x is a (n,) ndarray. If True, ``fun`` is assumed to
+        return both the constraints and the Jacobian matrix:
+
+            fun(x) -> array_like, {ndarray, sparse matrix}
+
+        and the last evaluation is cached, so both are obtained
+        with a single call to ``fun``.
     hess : {callable, '2-point', '3-point', 'cs', None}
         Method for computing the Hessian matrix. The keywords
         select a finite difference scheme for numerical
@@ -75,34 +82,51 @@ class NonlinearConstraint:
         each does not. Alternatively, a single boolean can be used to
         specify the feasibility required of all constraints. By default it
         is False.
+    hessp : callable, optional
+        Product of the Hessian matrix of `dot(fun, v)` with an
+        arbitrary vector:
+
+            hessp(x, v, p) -> array_like, shape (n,)
+
+        where x and p are (n,) ndarrays and v is a (m,) ndarray. When
+        given, the Hessian matrix is never formed and ``hess`` is
+        ignored.
     """
-    def __init__(self, fun, kind, jac, hess='2-point', enforce_feasibility=False):
+    def __init__(self, fun, kind, jac, hess='2-point', enforce_feasibility=False,
+                 hessp=None):
         self._fun = fun
         self.kind = kind
         self._jac = jac
         self._hess = hess
+        self._hessp = hessp
         self.enforce_feasibility = enforce_feasibility
         self.isinitialized = False
 
     def evaluate_and_initialize(self, x0, sparse_jacobian=None):
+        if self._jac is True:
+            fun = MemoizeJac(self._fun)
+            jac = fun.derivative
+        else:
+            fun = self._fun
+            jac = self._jac
         x0 = np.atleast_1d(x0).astype(float)
-        f0 = np.atleast_1d(self._fun(x0))
+        f0 = np.atleast_1d(fun(x0))
         v0 = np.zeros_like(f0)
-        J0 = self._jac(x0)
+        J0 = jac(x0)
 
         def fun_wrapped(x):
-            return np.atleast_1d(self._fun(x))
+            return np.atleast_1d(fun(x))
 
         if sparse_jacobian or (sparse_jacobian is None and spc.issparse(J0)):
             def jac_wrapped(x):
-                return spc.csr_matrix(self._jac(x))
+                return spc.csr_matrix(jac(x))
             self.sparse_jacobian = True
 
             self.J0 = spc.csr_matrix(J0)
 
         else:
             def jac_wrapped(x):
-                J = self._jac(x)
+                J = jac(x)
                 if spc.issparse(J):
                     return J.toarray()
                 else:
@@ -114,7 +138,17 @@ class NonlinearConstraint:
             else:
                 self.J0 = np.atleast_2d(J0)
 
-        if callable(self._hess):
+        from scipy.sparse.linalg import LinearOperator  # imported on first use
+        if self._hessp is not None:
+            n = x0.size
+
+            def hess_wrapped(x, v):
+                def matvec(p):
+                    return np.asarray(self._hessp(x, v, p),
+                                      dtype=float).reshape(-1)
+                return LinearOperator((n, n), matvec, dtype=float)
+
+        elif callable(self._hess):
             H0 = self._hess(x0, v0)
 
             if spc.issparse(H0):
@@ -318,7 +352,7 @@ class BoxConstraint:
         self.n = x0.size
         self.m = f0.size
         if sparse_jacobian or sparse_jacobian is None:
-            J0 = spc.eye(self.n).tocsr()
+            J0 = spc.eye(self.n, format="csr")
             self.sparse_jacobian = True
         else:
             J0 = np.eye(self.n)
@@ -364,9 +398,30 @@ class BoxConstraint:
         return self.to_linear().to_nonlinear()
 
 
+def initialize_constraint(constraint, x0, sparse_jacobian=None):
+    """Return an initialized copy of ``constraint`` and the initial point.
+
+    ``constraint`` itself is left untouched. The copy is shallow: it
+    refers to the functions, matrices and bounds of ``constraint``
+    instead of duplicating them, since the initialization only replaces
+    attributes of the copy and never modifies their values in place.
+    """
+    initialized = copy(constraint)
+    x0 = initialized.evaluate_and_initialize(x0, sparse_jacobian)
+    return initialized, x0
+
+
 # ************************************************************ #
 # **********           Auxiliar Functions           ********** #
 # ************************************************************ #
+def _broadcast(a, m):
+    """Return ``a`` (of size 1 or ``m``) as a read-only (m,) array.
+
+    A scalar is broadcast without being copied, i.e., the
+    result has a stride of 0."""
+    return np.broadcast_to(np.reshape(a, -1), (m,))
+
+
 def _check_kind(kind, m):
     if not isinstance(kind, (tuple, list, str)):
         raise ValueError("The parameter `kind` should be a tuple, "
@@ -395,17 +450,17 @@ def _check_kind(kind, m):
                 raise ValueError("`ub` has the wrong dimension.")
             if keyword == "equals":
                 raise ValueError("`c` has the wrong dimension.")
-        c = np.resize(c, m)
+        c = _broadcast(c, m)
         return (keyword, c)
     elif keyword == "interval":
         lb = np.asarray(kind[1], dtype=float)
         if np.size(lb) not in (1, m):
             raise ValueError("`lb` has the wrong dimension.")
-        lb = np.resize(lb, m)
+        lb = _broadcast(lb, m)
         ub = np.asarray(kind[2], dtype=float)
         if np.size(ub) not in (1, m):
             raise ValueError("`ub` has the wrong dimension.")
-        ub = np.resize(ub, m)
+        ub = _broadcast(ub, m)
         if (lb > ub).any():
             raise ValueError("lb[i] > ub[i].")
         return (keyword, lb, ub)
@@ -427,51 +482,50 @@ def _check_enforce_feasibility(enforce_feasibility, m):
 
 
 def _is_feasible(kind, enforce_feasibility, f0):
+    if not enforce_feasibility.any():
+        return True
+    f0 = f0[enforce_feasibility]
     keyword = kind[0]
-    if keyword == "equals":
-        lb = np.asarray(kind[1], dtype=float)
-        ub = np.asarray(kind[1], dtype=float)
-    elif keyword == "greater":
-        lb = np.asarray(kind[1], dtype=float)
-        ub = np.full_like(lb, np.inf, dtype=float)
+    if keyword in ("equals", "greater"):
+        lb = np.asarray(kind[1], dtype=float)[enforce_feasibility]
+        ub = lb if keyword == "equals" else np.inf
     elif keyword == "less":
-        ub = np.asarray(kind[1], dtype=float)
-        lb = np.full_like(ub, -np.inf, dtype=float)
+        lb = -np.inf
+        ub = np.asarray(kind[1], dtype=float)[enforce_feasibility]
     elif keyword == "interval":
-        lb = np.asarray(kind[1], dtype=float)
-        ub = np.asarray(kind[2], dtype=float)
+        lb = np.asarray(kind[1], dtype=float)[enforce_feasibility]
+        ub = np.asarray(kind[2], dtype=float)[enforce_feasibility]
     else:
         raise RuntimeError("Never be here.")
 
-    return ((lb[enforce_feasibility] <= f0[enforce_feasibility]).all()
-            and (f0[enforce_feasibility] <= ub[enforce_feasibility]).all())
+    return (lb <= f0).all() and (f0 <= ub).all()
 
 
 def _reinforce_box_constraint(kind, enforce_feasibility, x0,
                               relative_tolerance=0.01,
                               absolute_tolerance=0.01):
         """Reinforce box constraint"""
-        x0 = np.copy(np.asarray(x0, dtype=float))
+        x0_new = np.array(x0, dtype=float)
         keyword = kind[0]
+        n = np.size(x0_new)
         if keyword == "greater":
             lb = np.asarray(kind[1], dtype=float)
-            ub = np.full_like(lb, np.inf, dtype=float)
+            ub = np.full(n, np.inf)
         elif keyword == "less":
             ub = np.asarray(kind[1], dtype=float)
-            lb = np.full_like(ub, -np.inf, dtype=float)
+            lb = np.full(n, -np.inf)
         elif keyword == "interval":
             lb = np.asarray(kind[1], dtype=float)
             ub = np.asarray(kind[2], dtype=float)
 
-        x0_new = np.copy(x0)
-        for i in range(np.size(x0)):
-            if enforce_feasibility[i]:
-                if not np.isinf(lb[i]):
-                    lower_bound = min(lb[i]+absolute_tolerance,
-                                      lb[i]+relative_tolerance*(ub[i]-lb[i]))
-                    x0_new[i] = max(x0_new[i], lower_bound)
-                if not np.isinf(ub[i]):
-                    upper_bound = max(ub[i]-absolute_tolerance,
-                                      ub[i]-relative_tolerance*(ub[i]-lb[i]))
-                    x0_new[i] = min(x0_new[i], upper_bound)
+        with np.errstate(invalid="ignore"):
+            width = ub - lb
+        lower = enforce_feasibility & ~np.isinf(lb)
+        lower_bound = np.minimum(lb[lower] + absolute_tolerance,
+                                 lb[lower] + relative_tolerance*width[lower])
+        x0_new[lower] = np.maximum(x0_new[lower], lower_bound)
+        upper = enforce_feasibility & ~np.isinf(ub)
+        upper_bound = np.maximum(ub[upper] - absolute_tolerance,
+                                 ub[upper] - relative_tolerance*width[upper])
+        x0_new[upper] = np.minimum(x0_new[upper], upper_bound)
         return x0_new
@@ -3,6 +3,8 @@
 
 from .equality_constrained_sqp import equality_constrained_sqp
 from .tr_interior_point import tr_interior_point
+from .batched_sqp import batched_equality_constrained_sqp
 
 __all__ = ['equality_constrained_sqp',
-           'tr_interior_point']
+           'tr_interior_point',
+           'batched_equality_constrained_sqp']
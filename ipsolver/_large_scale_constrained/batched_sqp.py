@@ -0,0 +1,542 @@
+"""Batched Byrd-Omojokun Trust-Region SQP method.
+
+Advance a population of structurally identical equality-constrained
+problems in lockstep. All the linear algebra (projections, dogleg
+and projected CG) operates on stacked arrays with a leading batch
+dimension, so the Python overhead of each iteration is amortized
+over the whole population. Intended for many small dense problems.
+"""
+
+from __future__ import division, print_function, absolute_import
+import numpy as np
+from numpy.linalg import norm
+
+__all__ = [
+    'BatchedProjections',
+    'batched_sphere_intersections',
+    'batched_modified_dogleg',
+    'batched_projected_cg',
+    'batched_equality_constrained_sqp'
+]
+
+
+def _bdot(M, x):
+    """Compute ``M[k].dot(x[k])`` for every problem ``k`` in the batch."""
+    return np.einsum('kij,kj->ki', M, x)
+
+
+def _bdot_t(M, x):
+    """Compute ``M[k].T.dot(x[k])`` for every problem ``k`` in the batch."""
+    return np.einsum('kji,kj->ki', M, x)
+
+
+def _rowdot(x, y):
+    """Compute ``x[k].dot(y[k])`` for every problem ``k`` in the batch."""
+    return np.einsum('ki,ki->k', x, y)
+
+
+class BatchedProjections:
+    """Null-space, least-squares and row-space operators for a batch.
+
+    Stacked counterpart of ``projections`` using the SVD factorization
+    of each matrix ``A[k]``. The SVD is used (rather than QR) because
+    it is available stacked in ``np.linalg`` and copes with Jacobian
+    matrices with deficient row rank.
+
+    Parameters
+    ----------
+    A : ndarray, shape (k, m, n)
+        Stacked matrices.
+    tol : float, optional
+        Tolerance for singular values.
+    """
+    def __init__(self, A, tol=1e-15):
+        self.tol = tol
+        self.U, self.inv_s, self.Vt = self._factorize(A)
+
+    def _factorize(self, A):
+        k, m, n = np.shape(A)
+        if m == 0:
+            return np.empty((k, 0, 0)), np.empty((k, 0)), np.empty((k, 0, n))
+        U, s, Vt = np.linalg.svd(A, full_matrices=False)
+        # Remove dimensions related with very small singular values
+        keep = s > self.tol
+        inv_s = np.zeros_like(s)
+        inv_s[keep] = 1/s[keep]
+        return U, inv_s, Vt*keep[:, :, np.newaxis]
+
+    def take(self, idx):
+        """Return the operators restricted to the problems ``idx``."""
+        new = BatchedProjections.__new__(BatchedProjections)
+        new.tol = self.tol
+        new.U = self.U[idx]
+        new.inv_s = self.inv_s[idx]
+        new.Vt = self.Vt[idx]
+        return new
+
+    def update(self, idx, A):
+        """Refactorize the problems ``idx`` given new matrices ``A``."""
+        self.U[idx], self.inv_s[idx], self.Vt[idx] = self._factorize(A)
+
+    def null_space(self, x):
+        """Compute ``x - A.T inv(A A.T) A x`` for every problem."""
+        return x - _bdot_t(self.Vt, _bdot(self.Vt, x))
+
+    def least_squares(self, x):
+        """Compute ``inv(A A.T) A x`` for every problem."""
+        return _bdot(self.U, self.inv_s*_bdot(self.Vt, x))
+
+    def row_space(self, x):
+        """Compute ``A.T inv(A A.T) x`` for every problem."""
+        return _bdot_t(self.Vt, self.inv_s*_bdot_t(self.U, x))
+
+
+def batched_sphere_intersections(z, d, trust_radius, entire_line=False):
+    """Find the intersection between segments (or lines) and balls.
+
+    Stacked counterpart of ``sphere_intersections``: for every problem
+    ``k`` find the interval ``ta[k] <= t <= tb[k]`` for which
+    ``z[k] + t*d[k]`` lies inside ``||x|| <= trust_radius[k]``.
+
+    Parameters
+    ----------
+    z : ndarray, shape (k, n)
+        Initial points.
+    d : ndarray, shape (k, n)
+        Directions.
+    trust_radius : ndarray, shape (k,)
+        Ball radii. Should be finite.
+    entire_line : bool, optional
+        When ``True`` consider the entire lines ``z + t*d``, otherwise
+        consider only the segments ``0 <= t <= 1``.
+
+    Returns
+    -------
+    ta, tb : ndarray, shape (k,)
+        Intersection intervals (zero when there is no intersection).
+    intersect : ndarray of bool, shape (k,)
+        Whether each line/segment intersects its ball.
+    """
+    a = _rowdot(d, d)
+    b = 2*_rowdot(z, d)
+    c = _rowdot(z, z) - trust_radius**2
+    discriminant = b*b - 4*a*c
+    intersect = (a > 0) & (discriminant >= 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_discriminant = np.sqrt(np.maximum(discriminant, 0))
+        # Same roundoff-friendly formula used by ``sphere_intersections``.
+        aux = b + np.copysign(sqrt_discriminant, b)
+        t1 = -aux / (2*a)
+        t2 = -2*c / aux
+    ta = np.fmin(t1, t2)
+    tb = np.fmax(t1, t2)
+    if not entire_line:
+        intersect &= ~((tb < 0) | (ta > 1))
+        ta = np.maximum(0, ta)
+        tb = np.minimum(1, tb)
+    ta = np.where(intersect, ta, 0)
+    tb = np.where(intersect, tb, 0)
+    return ta, tb, intersect
+
+
+def batched_modified_dogleg(A, proj, b, trust_radius):
+    """Approximately minimize ``1/2*|| A[k] x + b[k] ||^2`` for every problem.
+
+    Stacked counterpart of ``modified_dogleg`` for problems without
+    box constraints.
+
+    Parameters
+    ----------
+    A : ndarray, shape (k, m, n)
+        Stacked matrices.
+    proj : BatchedProjections
+        Projection operators related to ``A``.
+    b : ndarray, shape (k, m)
+        Stacked vectors.
+    trust_radius : ndarray, shape (k,)
+        Trust radius of each problem.
+
+    Returns
+    -------
+    x : ndarray, shape (k, n)
+        Solution of each problem.
+    """
+    # Compute minimum norm minimizer of 1/2*|| A x + b ||^2.
+    newton_point = -proj.row_space(b)
+    # Compute gradient vector ``g = A.T b`` and the cauchy point
+    # ``cauchy_point = g.T g / (g.T A.T A g)``.
+    g = _bdot_t(A, b)
+    A_g = _bdot(A, g)
+    g_g = _rowdot(g, g)
+    Ag_Ag = _rowdot(A_g, A_g)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        step = np.where(Ag_Ag > 0, g_g / Ag_Ag, 0)
+    cauchy_point = -step[:, np.newaxis]*g
+    origin_point = np.zeros_like(cauchy_point)
+
+    # Check the segment between cauchy_point and newton_point and,
+    # when there is no intersection, the one between the origin
+    # and cauchy_point.
+    p = newton_point - cauchy_point
+    _, alpha, intersect = batched_sphere_intersections(cauchy_point, p,
+                                                       trust_radius)
+    _, alpha_c, _ = batched_sphere_intersections(origin_point, cauchy_point,
+                                                 trust_radius)
+    x1 = np.where(intersect[:, np.newaxis],
+                  cauchy_point + alpha[:, np.newaxis]*p,
+                  alpha_c[:, np.newaxis]*cauchy_point)
+    # Check the segment between origin and newton_point.
+    _, alpha_n, _ = batched_sphere_intersections(origin_point, newton_point,
+                                                 trust_radius)
+    x2 = alpha_n[:, np.newaxis]*newton_point
+
+    # Return the best solution among x1 and x2 or, for interior
+    # newton points, the newton point itself.
+    use_x1 = norm(_bdot(A, x1) + b, axis=1) < norm(_bdot(A, x2) + b, axis=1)
+    x = np.where(use_x1[:, np.newaxis], x1, x2)
+    inside = norm(newton_point, axis=1) <= trust_radius
+    return np.where(inside[:, np.newaxis], newton_point, x)
+
+
+def batched_projected_cg(H, c, proj, b, trust_radius, max_iter=None):
+    """Solve stacked EQP problems with the projected CG method.
+
+    Stacked counterpart of ``projected_cg`` for problems without box
+    constraints: for every problem ``k`` approximately minimize
+    ``1/2 x.T H[k] x + x.T c[k]`` subject to ``A[k] x + b[k] = 0``
+    and ``||x|| <= trust_radius[k]``. Problems that meet a stopping
+    condition are frozen while the remaining ones keep iterating.
+
+    Unlike ``projected_cg``, no exception is raised when the
+    constraints of a problem cannot be satisfied inside its trust
+    region: the problem is marked in ``info['infeasible']``, its
+    ``stop_cond`` is 0 and ``x[k]`` is the minimum norm solution of
+    its constraints. The other problems are solved as usual.
+
+    Parameters
+    ----------
+    H : ndarray, shape (k, n, n)
+        Stacked Hessian matrices.
+    c : ndarray, shape (k, n)
+        Stacked gradients of the quadratic objective functions.
+    proj : BatchedProjections
+        Projection operators related to the constraint matrices.
+    b : ndarray, shape (k, m)
+        Right-hand side of the constraint equations.
+    trust_radius : ndarray, shape (k,)
+        Trust radius of each problem. Should be finite.
+    max_iter : int, optional
+        Maximum algorithm iterations. By default uses ``max_iter = n-m``.
+
+    Returns
+    -------
+    x : ndarray, shape (k, n)
+        Solution of each EQP problem.
+    info : Dict
+        Dictionary containing the arrays ``niter``, ``stop_cond`` and
+        ``hits_boundary``, with the same meaning as in ``projected_cg``,
+        and the boolean array ``infeasible``.
+    """
+    CLOSE_TO_ZERO = 1e-25
+
+    n_batch, n = np.shape(c)
+    m = np.shape(b)[1]
+
+    # Initial Values
+    x = proj.row_space(-b)
+    r = proj.null_space(_bdot(H, x) + c)
+    g = proj.null_space(r)
+    p = -g
+    H_p = _bdot(H, p)
+    rt_g = _rowdot(g, g)
+
+    niter = np.zeros(n_batch, dtype=int)
+    stop_cond = np.ones(n_batch, dtype=int)
+    hits_boundary = np.zeros(n_batch, dtype=bool)
+
+    tr_distance = trust_radius - norm(x, axis=1)
+    # Problems whose constraints cannot be satisfied inside the
+    # trust region are not solved.
+    infeasible = tr_distance < 0
+    stop_cond[infeasible] = 0
+    # Problems for which ``x`` is already on the boundary are solved.
+    boundary = ~infeasible & (tr_distance < CLOSE_TO_ZERO)
+    stop_cond[boundary] = 2
+    hits_boundary[boundary] = True
+    active = ~infeasible & ~boundary
+
+    # Set default tolerance
+    tol = np.maximum(np.minimum(0.01 * np.sqrt(rt_g), 0.1 * rt_g),
+                     CLOSE_TO_ZERO)
+    # Set maximum iterations
+    if max_iter is None:
+        max_iter = n-m
+    max_iter = min(max_iter, n-m)
+
+    for i in range(max_iter):
+        # Stop criteria - Tolerance : r.T g < tol
+        converged = active & (rt_g < tol)
+        stop_cond[converged] = 4
+        active &= ~converged
+        if not active.any():
+            break
+        niter[active] += 1
+        # Compute curvature
+        pt_H_p = _rowdot(H_p, p)
+        # Stop criteria - Negative curvature
+        negative = active & (pt_H_p <= 0)
+        if negative.any():
+            _, alpha, intersect = batched_sphere_intersections(
+                x, p, trust_radius, entire_line=True)
+            x = np.where((negative & intersect)[:, np.newaxis],
+                         x + alpha[:, np.newaxis]*p, x)
+            stop_cond[negative] = 3
+            hits_boundary[negative] = True
+            active &= ~negative
+
+        # Get next step
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alpha = np.where(active, rt_g / pt_H_p, 0)
+        alpha_p = alpha[:, np.newaxis]*p
+        x_next = x + alpha_p
+
+        # Stop criteria - Hits boundary
+        boundary = active & (norm(x_next, axis=1) >= trust_radius)
+        if boundary.any():
+            _, theta, intersect = batched_sphere_intersections(
+                x, alpha_p, trust_radius)
+            x = np.where((boundary & intersect)[:, np.newaxis],
+                         x + theta[:, np.newaxis]*alpha_p, x)
+            stop_cond[boundary] = 2
+            hits_boundary[boundary] = True
+            active &= ~boundary
+        if not active.any():
+            break
+
+        # Update residual and project it: g+ = Z r+
+        r_next = r + alpha[:, np.newaxis]*H_p
+        g_next = proj.null_space(r_next)
+        # Compute conjugate direction step
+        rt_g_next = _rowdot(g_next, g_next)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = np.where(active, rt_g_next / rt_g, 0)
+        p_next = -g_next + beta[:, np.newaxis]*p
+        # Prepare for next iteration (only for active problems)
+        act = active[:, np.newaxis]
+        x = np.where(act, x_next, x)
+        g = np.where(act, g_next, g)
+        r = g
+        p = np.where(act, p_next, p)
+        rt_g = np.where(active, rt_g_next, rt_g)
+        H_p = _bdot(H, p)
+
+    info = {'niter': niter, 'stop_cond': stop_cond,
+            'hits_boundary': hits_boundary, 'infeasible': infeasible}
+    return x, info
+
+
+def batched_equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
+                                     x0, fun0, grad0, constr0, jac0,
+                                     stop_criteria, state,
+                                     initial_penalty=1.0,
+                                     initial_trust_radius=1.0):
+    """Solve a batch of equality-constrained problems using trust-region SQP.
+
+    Solve the ``k`` optimization problems:
+
+        minimize fun(x[k])
+        subject to: constr(x[k]) = 0
+
+    in lockstep, using the same Byrd-Omojokun Trust-Region SQP iteration
+    implemented by ``equality_constrained_sqp`` (without box constraints
+    on the step and without scaling). The callables receive only the rows
+    of the problems that are still being iterated:
+
+        fun_and_constr(x) -> (ndarray, shape (k',), ndarray, shape (k', m))
+        grad_and_jac(x) -> (ndarray, shape (k', n), ndarray, shape (k', m, n))
+        lagr_hess(x, v) -> ndarray, shape (k', n, n)
+
+    ``stop_criteria(state)`` should return a boolean array, shape (k,),
+    indicating which problems should stop. Problems that stop are frozen
+    while the remaining ones keep iterating.
+    """
+    PENALTY_FACTOR = 0.3  # Rho from formula (3.51), reference [2]_, p.891.
+    LARGE_REDUCTION_RATIO = 0.9
+    INTERMEDIARY_REDUCTION_RATIO = 0.3
+    SUFFICIENT_REDUCTION_RATIO = 1e-8  # Eta from reference [2]_, p.892.
+    TRUST_ENLARGEMENT_FACTOR_L = 7.0
+    TRUST_ENLARGEMENT_FACTOR_S = 2.0
+    MAX_TRUST_REDUCTION = 0.5
+    MIN_TRUST_REDUCTION = 0.1
+    SOC_THRESHOLD = 0.1
+    TR_FACTOR = 0.8  # Zeta from formula (3.21), reference [2]_, p.885.
+
+    n_batch, n = np.shape(x0)
+
+    # Initial values
+    x = np.array(x0, dtype=float)
+    trust_radius = np.full(n_batch, initial_trust_radius, dtype=float)
+    penalty = np.full(n_batch, initial_penalty, dtype=float)
+    # Compute Values
+    f = np.array(fun0, dtype=float)
+    c = np.array(grad0, dtype=float)
+    b = np.array(constr0, dtype=float)
+    A = np.array(jac0, dtype=float)
+    H = np.zeros((n_batch, n, n))
+    # Get projections
+    proj = BatchedProjections(A)
+    # Compute least-square lagrange multipliers
+    v = -proj.least_squares(c)
+
+    # Update state parameters
+    state.optimality = norm(c + _bdot_t(A, v), np.inf, axis=1)
+    state.constr_violation = (norm(b, np.inf, axis=1) if b.shape[1] > 0
+                              else np.zeros(n_batch))
+    state.niter += 1
+    state.x = x
+    state.v = v
+    state.fun = f
+    state.grad = c
+    state.constr = b
+    state.jac = A
+    state.trust_radius = trust_radius
+    state.penalty = penalty
+
+    compute_hess = np.ones(n_batch, dtype=bool)
+    done = np.asarray(stop_criteria(state), dtype=bool)
+    while not done.all():
+        idx = np.flatnonzero(~done)
+        # Compute Lagrangian Hessian
+        need = idx[compute_hess[idx]]
+        if need.size > 0:
+            H[need] = lagr_hess(x[need], v[need])
+            state.nhev[need] += 1
+        x_i, f_i, b_i, c_i = x[idx], f[idx], b[idx], c[idx]
+        A_i, H_i, proj_i = A[idx], H[idx], proj.take(idx)
+        trust_radius_i = trust_radius[idx]
+
+        # Normal Step - `dn`
+        dn = batched_modified_dogleg(A_i, proj_i, b_i,
+                                     TR_FACTOR*trust_radius_i)
+
+        # Tangential Step - `dt`
+        c_t = _bdot(H_i, dn) + c_i
+        b_t = np.zeros_like(b_i)
+        trust_radius_t = np.sqrt(np.maximum(
+            trust_radius_i**2 - _rowdot(dn, dn), 0))
+        dt, info_cg = batched_projected_cg(H_i, c_t, proj_i, b_t,
+                                           trust_radius_t)
+
+        # Compute update (normal + tangential steps).
+        d = dn + dt
+
+        # Compute second order model: 1/2 d H d + c.T d + f.
+        quadratic_model = 1/2*_rowdot(_bdot(H_i, d), d) + _rowdot(c_i, d)
+        # Compute linearized constraint: l = A d + b.
+        linearized_constr = _bdot(A_i, d) + b_i
+        # Compute new penalty parameter according to formula (3.52),
+        # reference [2]_, p.891.
+        norm_b = norm(b_i, axis=1)
+        vpred = np.maximum(1e-16, norm_b - norm(linearized_constr, axis=1))
+        previous_penalty = penalty[idx]
+        new_penalty = quadratic_model / ((1-PENALTY_FACTOR)*vpred)
+        penalty_i = np.where(quadratic_model > 0,
+                             np.maximum(previous_penalty, new_penalty),
+                             previous_penalty)
+        # Compute predicted reduction according to formula (3.52),
+        # reference [2]_, p.891.
+        predicted_reduction = -quadratic_model + penalty_i*vpred
+
+        # Compute merit function at current point
+        merit_function = f_i + penalty_i*norm_b
+        # Evaluate function and constraints at trial point
+        x_next = x_i + d
+        f_next, b_next = fun_and_constr(x_next)
+        f_next = np.array(f_next, dtype=float)
+        b_next = np.array(b_next, dtype=float)
+        state.nfev[idx] += 1
+        state.ncev[idx] += 1
+        # Compute merit function at trial point
+        merit_function_next = f_next + penalty_i*norm(b_next, axis=1)
+        # Compute actual reduction and reduction ratio according
+        # to formula (3.54), reference [2]_, p.892.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reduction_ratio = ((merit_function - merit_function_next)
+                               / predicted_reduction)
+
+        # Second order correction (SOC), reference [2]_, p.892.
+        soc = np.flatnonzero(
+            (reduction_ratio < SUFFICIENT_REDUCTION_RATIO)
+            & (norm(dn, axis=1) <= SOC_THRESHOLD * norm(dt, axis=1)))
+        if soc.size > 0:
+            # Compute second order correction
+            y = -proj_i.take(soc).row_space(b_next[soc])
+            # Compute tentative point
+            x_soc = x_i[soc] + d[soc] + y
+            f_soc, b_soc = fun_and_constr(x_soc)
+            state.nfev[idx[soc]] += 1
+            state.ncev[idx[soc]] += 1
+            # Recompute reduction ratio
+            merit_function_soc = f_soc + penalty_i[soc]*norm(b_soc, axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                reduction_ratio_soc = ((merit_function[soc]
+                                        - merit_function_soc)
+                                       / predicted_reduction[soc])
+            use_soc = reduction_ratio_soc >= SUFFICIENT_REDUCTION_RATIO
+            soc = soc[use_soc]
+            x_next[soc] = x_soc[use_soc]
+            f_next[soc] = f_soc[use_soc]
+            b_next[soc] = b_soc[use_soc]
+            reduction_ratio[soc] = reduction_ratio_soc[use_soc]
+
+        # Readjust trust region step, formula (3.55), reference [2]_, p.892.
+        norm_d = norm(d, axis=1)
+        large = reduction_ratio >= LARGE_REDUCTION_RATIO
+        intermediary = (~large
+                        & (reduction_ratio >= INTERMEDIARY_REDUCTION_RATIO))
+        small = reduction_ratio < SUFFICIENT_REDUCTION_RATIO
+        new_trust_radius = trust_radius_i.copy()
+        new_trust_radius[large] = np.maximum(
+            TRUST_ENLARGEMENT_FACTOR_L * norm_d, trust_radius_i)[large]
+        new_trust_radius[intermediary] = np.maximum(
+            TRUST_ENLARGEMENT_FACTOR_S * norm_d, trust_radius_i)[intermediary]
+        # Reduce trust region step, according to reference [3]_, p.696.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reduced = ((1-SUFFICIENT_REDUCTION_RATIO)/(1-reduction_ratio)
+                       * norm_d)
+        reduced = np.where(
+            reduced >= MAX_TRUST_REDUCTION * trust_radius_i,
+            MAX_TRUST_REDUCTION * trust_radius_i,
+            np.where(reduced >= MIN_TRUST_REDUCTION * trust_radius_i,
+                     reduced, MIN_TRUST_REDUCTION * trust_radius_i))
+        new_trust_radius[small] = reduced[small]
+
+        # Update iteration
+        state.niter[idx] += 1
+        accepted = reduction_ratio >= SUFFICIENT_REDUCTION_RATIO
+        acc = idx[accepted]
+        if acc.size > 0:
+            x[acc] = x_next[accepted]
+            f[acc] = f_next[accepted]
+            b[acc] = b_next[accepted]
+            c[acc], A[acc] = grad_and_jac(x[acc])
+            state.ngev[acc] += 1
+            state.njev[acc] += 1
+            # Get projections
+            proj.update(acc, A[acc])
+            # Compute least-square lagrange multipliers
+            v[acc] = -proj.take(acc).least_squares(c[acc])
+            # Otimality values
+            state.optimality[acc] = norm(c[acc] + _bdot_t(A[acc], v[acc]),
+                                         np.inf, axis=1)
+            if b.shape[1] > 0:
+                state.constr_violation[acc] = norm(b[acc], np.inf, axis=1)
+        compute_hess[idx] = accepted
+        penalty[idx] = np.where(accepted, penalty_i, previous_penalty)
+        trust_radius[idx] = new_trust_radius
+        # Store values
+        state.cg_niter[idx] += info_cg["niter"]
+        state.cg_stop_cond[idx] = info_cg["stop_cond"]
+        done |= np.asarray(stop_criteria(state), dtype=bool)
+
+    return state
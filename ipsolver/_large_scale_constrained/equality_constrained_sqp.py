@@ -1,18 +1,76 @@
 """Byrd-Omojokun Trust-Region SQP method."""
 
 from __future__ import division, print_function, absolute_import
+from collections import deque
 import scipy.sparse as spc
-from .projections import projections
-from .qp_subproblem import modified_dogleg, projected_cg, box_intersections
+from .projections import ReusableProjections
+from .qp_subproblem import (modified_dogleg, projected_cg, projected_gltr,
+                            box_intersections)
+from .profiling import NULL_PROFILER
 import numpy as np
 from numpy.linalg import norm
 
-__all__ = ['equality_constrained_sqp']
+__all__ = ['equality_constrained_sqp',
+           'IdentityScaling',
+           'DiagonalScaling']
+
+
+class IdentityScaling:
+    """Identity scaling matrix of order ``n``.
+
+    ``S.dot(d)`` returns ``d`` itself, without copying it, even when
+    ``out`` is given.
+    """
+    def __init__(self, n):
+        self.shape = (n, n)
+
+    def dot(self, d, out=None):
+        return d
+
+
+class DiagonalScaling:
+    """Diagonal scaling matrix ``S = diag(diagonal)``.
+
+    ``S.dot(d)`` is the elementwise product ``diagonal*d``, stored
+    in ``out`` when it is given. The array ``diagonal`` is not
+    copied, so the owner of the scaling may update it in place
+    instead of building a new scaling matrix at each iteration.
+    """
+    def __init__(self, diagonal):
+        self.diagonal = diagonal
+        self.shape = (diagonal.size, diagonal.size)
+
+    def dot(self, d, out=None):
+        return np.multiply(self.diagonal, d, out=out)
 
 
 def default_scaling(x):
     n, = np.shape(x)
-    return spc.eye(n)
+    return IdentityScaling(n)
+
+
+def _scale(S, d, out):
+    """Return ``S.dot(d)``, stored in ``out`` when ``S`` supports it."""
+    if isinstance(S, (IdentityScaling, DiagonalScaling)):
+        return S.dot(d, out=out)
+    return S.dot(d)
+
+
+def _cast_operator(M, dtype):
+    """Return ``M`` as an operator whose products have type ``dtype``.
+
+    Sparse and dense matrices are converted, so their products are
+    computed in ``dtype``. Other operators are applied in their own
+    precision and only the result is converted.
+    """
+    if spc.issparse(M) or isinstance(M, np.ndarray):
+        return M.astype(dtype)
+
+    from scipy.sparse.linalg import LinearOperator  # imported on first use
+
+    def matvec(x):
+        return np.asarray(M.dot(x), dtype=dtype)
+    return LinearOperator(M.shape, matvec, dtype=dtype)
 
 
 def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
@@ -24,7 +82,16 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
                              initial_trust_radius=1.0,
                              scaling=default_scaling,
                              return_all=False,
-                             factorization_method=None):
+                             factorization_method=None,
+                             profiler=NULL_PROFILER,
+                             deadline=None,
+                             hessian_refresh_every=1,
+                             hessian_refresh_xtol=np.inf,
+                             hessian_refresh_vtol=np.inf,
+                             factorization_reuse_tol=0,
+                             dtype=None,
+                             tangential_solver='cg',
+                             nonmonotone_memory=1):
     """Solve nonlinear equality-constrained problem using trust-region SQP.
 
     Solve optimization problem:
@@ -35,6 +102,61 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
     using Byrd-Omojokun Trust-Region SQP method described in [1]_. Several
     implementation details are based on [2]_ and [3]_, p. 549.
 
+    The steps are scaled by ``scaling(x)``, which returns a matrix
+    or an operator ``S`` with a ``dot`` method (by default an
+    `IdentityScaling`), evaluated at every accepted step. The
+    products of `IdentityScaling` and `DiagonalScaling` are stored in
+    a preallocated array, the other ones are allocated by ``S``. The
+    previous ``S`` is not used afterwards, so ``scaling`` may update
+    and return the same object, e.g., a `DiagonalScaling`.
+
+    The wall time spent on each phase of the iteration is recorded
+    by ``profiler`` (a ``SolverProfiler``), when one is given.
+    The CG iterations are interrupted once ``timeit.default_timer()``
+    exceeds ``deadline``.
+
+    After an accepted step the Lagrangian Hessian is only evaluated
+    again if ``hessian_refresh_every`` accepted steps were taken since
+    its latest evaluation, or if the norm of the change of ``x``
+    or of the Lagrange multipliers since then exceeds
+    ``hessian_refresh_xtol`` or ``hessian_refresh_vtol``. Otherwise
+    the previous Hessian is reused and ``state.nhev_skipped`` is
+    incremented. By default it is evaluated at every accepted step.
+
+    The factorization of the constraint Jacobian is reused while
+    its relative change (in the Frobenius norm) does not exceed
+    ``factorization_reuse_tol``, see `ReusableProjections`. The
+    number of factorizations and of reused factorizations are
+    added to ``state.nfactor`` and ``state.nfactor_reused``.
+
+    When ``dtype`` is given (e.g., ``np.float32``) the tangential
+    step is computed by projected CG in this precision: the vectors,
+    the Lagrangian Hessian (when it is a matrix) and the output of
+    the projections have type ``dtype``. The factorizations, the
+    projections and their iterative refinement, the normal step and
+    the merit function tests remain in double precision. Once the
+    optimality drops below ``sqrt(np.finfo(dtype).eps)`` the
+    tangential step is computed in double precision, which refines
+    the solution to full accuracy.
+
+    The tangential step is computed by `projected_cg` when
+    ``tangential_solver='cg'`` and by `projected_gltr` when
+    ``tangential_solver='gltr'``. The latter does not stop at
+    directions of negative curvature, which may result in better
+    steps and fewer iterations for nonconvex problems.
+
+    A trial point is accepted when it sufficiently reduces the largest
+    merit function among the latest ``nonmonotone_memory`` accepted
+    iterates (evaluated with the current penalty), rather than the
+    merit function at the current iterate, see [4]_. Hence the merit
+    function may temporarily increase and some of the steps rejected
+    by the monotone test are accepted. Most of the rejections are
+    caused by inaccurate quadratic models rather than by the
+    curvature of the constraints (the Maratos effect), so the savings
+    in function evaluations are usually small. By default
+    ``nonmonotone_memory=1`` and the merit function decreases
+    monotonically.
+
     References
     ----------
     .. [1] Lalee, Marucha, Jorge Nocedal, and Todd Plantenga. "On the
@@ -46,6 +168,9 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
            programming." SIAM Journal on Optimization 9.4 (1999): 877-900.
     .. [3] Nocedal, Jorge, and Stephen J. Wright. "Numerical optimization"
            Second Edition (2006).
+    .. [4] Toint, Philippe L. "Non-monotone trust-region algorithms for
+           nonlinear optimization subject to convex constraints."
+           Mathematical Programming 77.3 (1997): 69-94.
     """
     PENALTY_FACTOR = 0.3  # Rho from formula (3.51), reference [2]_, p.891.
     LARGE_REDUCTION_RATIO = 0.9
@@ -60,6 +185,25 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
     BOX_FACTOR = 0.5
 
     n, = np.shape(x0)  # Number of parameters
+    if tangential_solver == 'cg':
+        tangential_qp = projected_cg
+    elif tangential_solver == 'gltr':
+        tangential_qp = projected_gltr
+    else:
+        raise ValueError("Unknown tangential solver: "
+                         "{0}.".format(tangential_solver))
+    if nonmonotone_memory < 1:
+        raise ValueError("``nonmonotone_memory`` should be positive.")
+    # Precision of the tangential step computation
+    if dtype is None or np.dtype(dtype) == np.float64:
+        dtype = None
+        cg_dtype = np.float64
+    else:
+        cg_dtype = np.dtype(dtype)
+        precision_tol = np.sqrt(np.finfo(dtype).eps)
+
+    def cast(M):
+        return M if dtype is None else _cast_operator(M, dtype)
 
     # Set default lower and upper bounds.
     if trust_lb is None:
@@ -77,8 +221,20 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
     b = constr0
     A = jac0
     S = scaling(x)
+    # Buffers for the second-order correction step and
+    # for the scaled steps ``S.dot(d)``.
+    soc_step = np.empty_like(x)
+    scaled_step = np.empty_like(x)
+    # Objective and constraint violation of the latest accepted
+    # iterates, for the nonmonotone acceptance test.
+    merit_history = deque([(f, norm(b))], maxlen=nonmonotone_memory)
     # Get projections
-    Z, LS, Y = projections(A, factorization_method)
+    projector = ReusableProjections(factorization_method,
+                                    factorization_reuse_tol,
+                                    profiler=profiler)
+    with profiler.timer("factorization"):
+        Z, LS, Y = projector(A)
+    Z_cg, Y_cg = cast(Z), cast(Y)
     # Compute least-square lagrange multipliers
     v = -LS.dot(c)
 
@@ -94,26 +250,52 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
     state.jac = A
     state.trust_radius = trust_radius
     state.penalty = penalty
+    # The counts of the previous calls (by `tr_interior_point`).
+    nfactor0, nreused0 = state.nfactor, state.nfactor_reused
+    state.nfactor = nfactor0 + projector.nfactor
+    state.nfactor_reused = nreused0 + projector.nreused
     if return_all:
-        state.allvecs += [np.copy(x)]
-        state.allmult += [np.copy(v)]
+        state.allvecs.append(x)
+        state.allmult.append(v)
 
     compute_hess = True
+    x_hess = v_hess = None
+    n_reused = 0
     while not stop_criteria(state):
+        # Switch to double precision close to the solution
+        if dtype is not None and state.optimality < precision_tol:
+            dtype = None
+            cg_dtype = np.float64
+            Z_cg, Y_cg = Z, Y
+            if x_hess is not None:
+                # Also when the Hessian is reused below.
+                H_cg = H
         # Compute Lagrangian Hessian
         if compute_hess:
-            H = lagr_hess(x, v)
-            state.nhev += 1
+            if (x_hess is None
+                    or n_reused + 1 >= hessian_refresh_every
+                    or norm(x - x_hess) > hessian_refresh_xtol
+                    or norm(v - v_hess) > hessian_refresh_vtol):
+                H = lagr_hess(x, v)
+                state.nhev += 1
+                H_cg = cast(H)
+                x_hess, v_hess = x, v
+                n_reused = 0
+            else:
+                # Reuse the previous Hessian
+                n_reused += 1
+                state.nhev_skipped += 1
 
         # Normal Step - `dn`
         # minimize 1/2*||A dn + b||^2
         # subject to:
         # ||dn|| <= TR_FACTOR * trust_radius
         # BOX_FACTOR * lb <= dn <= BOX_FACTOR * ub.
-        dn = modified_dogleg(A, Y, b,
-                             TR_FACTOR*trust_radius,
-                             BOX_FACTOR*trust_lb,
-                             BOX_FACTOR*trust_ub)
+        with profiler.timer("normal_step"):
+            dn = modified_dogleg(A, Y, b,
+                                 TR_FACTOR*trust_radius,
+                                 BOX_FACTOR*trust_lb,
+                                 BOX_FACTOR*trust_ub)
 
         # Tangential Step - `dn`
         # Solve the QP problem:
@@ -123,13 +305,19 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
         # ||dt|| <= sqrt(trust_radius**2 - ||dn||**2)
         # lb - dn <= dt <= ub - dn
         c_t = H.dot(dn) + c
-        b_t = np.zeros_like(b)
+        b_t = np.zeros_like(b, dtype=cg_dtype)
         trust_radius_t = np.sqrt(trust_radius**2 - np.linalg.norm(dn)**2)
         lb_t = trust_lb - dn
         ub_t = trust_ub - dn
-        dt, info_cg = projected_cg(H, c_t, Z, Y, b_t,
-                                   trust_radius_t,
-                                   lb_t, ub_t)
+        with profiler.timer("tangential_step"):
+            dt, info_cg = tangential_qp(H_cg,
+                                        c_t.astype(cg_dtype, copy=False),
+                                        Z_cg, Y_cg, b_t,
+                                        trust_radius_t,
+                                        lb_t.astype(cg_dtype, copy=False),
+                                        ub_t.astype(cg_dtype, copy=False),
+                                        deadline=deadline)
+        dt = dt.astype(np.float64, copy=False)
 
         # Compute update (normal + tangential steps).
         d = dn + dt
@@ -152,45 +340,59 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
         # reference [2]_, p.891.
         predicted_reduction = -quadratic_model + penalty*vpred
 
-        # Compute merit function at current point
-        merit_function = f + penalty*norm(b)
-        # Evaluate function and constraints at trial point
-        x_next = x + S.dot(d)
-        f_next, b_next = fun_and_constr(x_next)
-        # Increment funcion evaluation counter
-        state.nfev += 1
-        state.ncev += 1
-        # Compute merit function at trial point
-        merit_function_next = f_next + penalty*norm(b_next)
+        with profiler.timer("merit"):
+            # Compute merit function at current point
+            merit_function = f + penalty*norm(b)
+            # Compute reference merit function, reference [4]_. It is
+            # the merit function at the current point (and the
+            # predicted reduction is unchanged) when
+            # ``nonmonotone_memory == 1``.
+            merit_reference = max(f_k + penalty*norm_b_k
+                                  for f_k, norm_b_k in merit_history)
+            predicted_reduction_reference \
+                = merit_reference - merit_function + predicted_reduction
+            # Evaluate function and constraints at trial point
+            x_next = x + _scale(S, d, scaled_step)
+            f_next, b_next = fun_and_constr(x_next)
+            # Increment funcion evaluation counter
+            state.nfev += 1
+            state.ncev += 1
+            # Compute merit function at trial point
+            merit_function_next = f_next + penalty*norm(b_next)
         # Compute actual reduction according to formula (3.54),
         # reference [2]_, p.892.
-        actual_reduction = merit_function - merit_function_next
+        actual_reduction = merit_reference - merit_function_next
         # Compute reduction ratio
-        reduction_ratio = actual_reduction / predicted_reduction
+        reduction_ratio = actual_reduction / predicted_reduction_reference
 
         # Second order correction (SOC), reference [2]_, p.892.
         if reduction_ratio < SUFFICIENT_REDUCTION_RATIO and \
            norm(dn) <= SOC_THRESHOLD * norm(dt):
-            # Compute second order correction
-            y = -Y.dot(b_next)
-            # Make sure increment is inside box constraints
-            _, t, intersect = box_intersections(d, y, trust_lb, trust_ub)
-            # Compute tentative point
-            x_soc = x + S.dot(d + t*y)
-            f_soc, b_soc = fun_and_constr(x_soc)
-            # Increment funcion evaluation counter
-            state.nfev += 1
-            state.ncev += 1
-            # Recompute actual reduction
-            merit_function_soc = f_soc + penalty*norm(b_soc)
-            actual_reduction_soc = merit_function - merit_function_soc
-            # Recompute reduction ratio
-            reduction_ratio_soc = actual_reduction_soc / predicted_reduction
-            if intersect and reduction_ratio_soc >= SUFFICIENT_REDUCTION_RATIO:
-                x_next = x_soc
-                f_next = f_soc
-                b_next = b_soc
-                reduction_ratio = reduction_ratio_soc
+            with profiler.timer("soc"):
+                # Compute second order correction
+                y = -Y.dot(b_next)
+                # Make sure increment is inside box constraints
+                _, t, intersect = box_intersections(d, y, trust_lb, trust_ub)
+                # Compute tentative point
+                np.multiply(y, t, out=soc_step)
+                soc_step += d
+                x_soc = x + _scale(S, soc_step, scaled_step)
+                f_soc, b_soc = fun_and_constr(x_soc)
+                # Increment funcion evaluation counter
+                state.nfev += 1
+                state.ncev += 1
+                # Recompute actual reduction
+                merit_function_soc = f_soc + penalty*norm(b_soc)
+                actual_reduction_soc = merit_reference - merit_function_soc
+                # Recompute reduction ratio
+                reduction_ratio_soc \
+                    = actual_reduction_soc / predicted_reduction_reference
+                if intersect and \
+                   reduction_ratio_soc >= SUFFICIENT_REDUCTION_RATIO:
+                    x_next = x_soc
+                    f_next = f_soc
+                    b_next = b_soc
+                    reduction_ratio = reduction_ratio_soc
 
         # Readjust trust region step, formula (3.55), reference [2]_, p.892.
         if reduction_ratio >= LARGE_REDUCTION_RATIO:
@@ -216,13 +418,16 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
         if reduction_ratio >= SUFFICIENT_REDUCTION_RATIO:
             x = x_next
             f, b = f_next, b_next
+            merit_history.append((f, norm(b)))
             c, A = grad_and_jac(x)
             S = scaling(x)
             # Increment funcion evaluation counter
             state.ngev += 1
             state.njev += 1
             # Get projections
-            Z, LS, Y = projections(A)
+            with profiler.timer("factorization"):
+                Z, LS, Y = projector(A)
+            Z_cg, Y_cg = cast(Z), cast(Y)
             # Compute least-square lagrange multipliers
             v = -LS.dot(c)
             # Set Flag
@@ -245,8 +450,10 @@ def equality_constrained_sqp(fun_and_constr, grad_and_jac, lagr_hess,
         state.penalty = penalty
         state.cg_niter += info_cg["niter"]
         state.cg_info = info_cg
+        state.nfactor = nfactor0 + projector.nfactor
+        state.nfactor_reused = nreused0 + projector.nreused
         if return_all:
-            state.allvecs.append(np.copy(x))
-            state.allmult.append(np.copy(v))
+            state.allvecs.append(x)
+            state.allmult.append(v)
 
     return state
@@ -0,0 +1,102 @@
+"""Opt-in instrumentation of the solver phases."""
+
+from __future__ import division, print_function, absolute_import
+from timeit import default_timer
+
+__all__ = [
+    'SolverProfiler',
+    'NullProfiler',
+    'NULL_PROFILER'
+]
+
+
+class _Timer:
+    """Context manager adding the elapsed wall time to a profiler entry."""
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add_time(self.name, default_timer() - self.start)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class SolverProfiler:
+    """Record wall time and counters of the solver phases.
+
+    Times are inclusive: the time spent in a phase includes the time
+    spent in any phase nested inside it (e.g., the time of the merit
+    function evaluation includes the time spent on user functions).
+    """
+    def __init__(self):
+        self.time = {}
+        self.count = {}
+
+    def timer(self, name):
+        """Return a context manager that times the phase ``name``."""
+        return _Timer(self, name)
+
+    def add_time(self, name, elapsed):
+        self.time[name] = self.time.get(name, 0.0) + elapsed
+
+    def add(self, name, value=1):
+        """Increment the counter ``name`` by ``value``."""
+        self.count[name] = self.count.get(name, 0) + value
+
+    def wrap(self, name, function):
+        """Return ``function`` timed and counted under ``name``."""
+        if function is None:
+            return None
+
+        def timed_function(*args, **kwargs):
+            self.add(name)
+            start = default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add_time(name, default_timer() - start)
+        return timed_function
+
+    def report(self):
+        """Return the recorded profile as a dictionary.
+
+        The dictionary contains ``time``, a dictionary with the wall time
+        (in seconds) spent in each phase, and ``count``, a dictionary with
+        the counters.
+        """
+        return {'time': dict(self.time), 'count': dict(self.count)}
+
+
+class NullProfiler:
+    """Profiler that does nothing. Used when instrumentation is disabled."""
+    _timer = _NullTimer()
+
+    def timer(self, name):
+        return self._timer
+
+    def add_time(self, name, elapsed):
+        pass
+
+    def add(self, name, value=1):
+        pass
+
+    def wrap(self, name, function):
+        return function
+
+    def report(self):
+        return {'time': {}, 'count': {}}
+
+
+NULL_PROFILER = NullProfiler()
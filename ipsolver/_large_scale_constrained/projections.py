@@ -2,24 +2,56 @@
 
 from __future__ import division, print_function, absolute_import
 from scipy.sparse import (bmat, csc_matrix, eye, issparse)
-from scipy.sparse.linalg import LinearOperator
-import scipy.linalg
-import scipy.sparse.linalg
-try:
-    from sksparse.cholmod import cholesky_AAt
-    sksparse_available = True
-except ImportError:
-    import warnings
-    sksparse_available = False
 import numpy as np
 from warnings import warn
+from .profiling import NULL_PROFILER
 
 __all__ = [
     'orthogonality',
     'projections',
+    'plan_factorization',
+    'ReusableProjections',
 ]
 
 
+SPARSE_METHODS = ("NormalEquation", "AugmentedSystem")
+DENSE_METHODS = ("QRFactorization", "SVDFactorization")
+# Cost of a floating point operation of the sparse factorizations
+# relative to the dense ones, which run at the speed of the level 3
+# BLAS, used by `plan_factorization`.
+SPARSE_FLOP_COST = 10
+# Bytes per nonzero of a sparse matrix: the value and its row index.
+SPARSE_ENTRY_BYTES = 12
+# Density of ``A A.T`` above which the fill-in of its factorization
+# is assumed to make the factor dense.
+DENSE_FACTOR_DENSITY = 0.1
+
+
+# ``sksparse.cholmod.cholesky_AAt``, imported by `_cholesky_AAt`
+# the first time the 'NormalEquation' approach is requested.
+_cholmod = {}
+
+
+def _cholesky_AAt():
+    """Return ``cholesky_AAt`` from scikit-sparse or None if unavailable."""
+    if "cholesky_AAt" not in _cholmod:
+        try:
+            from sksparse.cholmod import cholesky_AAt
+        except ImportError:
+            cholesky_AAt = None
+        _cholmod["cholesky_AAt"] = cholesky_AAt
+    return _cholmod["cholesky_AAt"]
+
+
+def frobenius_norm(A):
+    """Frobenius norm of a (possibly sparse) matrix."""
+    if issparse(A):
+        import scipy.sparse.linalg  # imported on first use
+        return scipy.sparse.linalg.norm(A, ord='fro')
+    else:
+        return np.linalg.norm(A, ord='fro')
+
+
 def orthogonality(A, g):
     """Measure orthogonality between a vector and the null space of a matrix.
 
@@ -40,10 +72,7 @@ def orthogonality(A, g):
     # Compute vector norms
     norm_g = np.linalg.norm(g)
     # Compute Frobenius norm of the matrix A
-    if issparse(A):
-        norm_A = scipy.sparse.linalg.norm(A, ord='fro')
-    else:
-        norm_A = np.linalg.norm(A, ord='fro')
+    norm_A = frobenius_norm(A)
 
     # Check if norms are zero
     if norm_g == 0 or norm_A == 0:
@@ -55,11 +84,12 @@ def orthogonality(A, g):
     return orth
 
 
-def normal_equation_projections(A, m, n, orth_tol, max_refin, tol):
+def normal_equation_projections(A, m, n, orth_tol, max_refin, tol,
+                                profiler=NULL_PROFILER):
     """Return linear operators for matrix A using ``NormalEquation`` approach.
     """
     # Cholesky factorization
-    factor = cholesky_AAt(A)
+    factor = _cholesky_AAt()(A)
 
     # z = x - A.T inv(A A.T) A x
     def null_space(x):
@@ -76,6 +106,7 @@ def normal_equation_projections(A, m, n, orth_tol, max_refin, tol):
             v = factor(A.dot(z))
             z = z - A.T.dot(v)
             k += 1
+        profiler.add("refinement_steps", k)
 
         return z
 
@@ -87,10 +118,15 @@ def normal_equation_projections(A, m, n, orth_tol, max_refin, tol):
     def row_space(x):
         return A.T.dot(factor(x))
 
-    return null_space, least_squares, row_space
+    # z = inv(A A.T) x
+    def normal_solve(x):
+        return factor(x)
 
+    return null_space, least_squares, row_space, normal_solve
 
-def augmented_system_projections(A, m, n, orth_tol, max_refin, tol):
+
+def augmented_system_projections(A, m, n, orth_tol, max_refin, tol,
+                                 profiler=NULL_PROFILER):
     """Return linear operators for matrix A - ``AugmentedSystem``."""
     # Form augmented system
     K = csc_matrix(bmat([[eye(n), A.T], [A, None]]))
@@ -98,6 +134,7 @@ def augmented_system_projections(A, m, n, orth_tol, max_refin, tol):
     # TODO: Use a symmetric indefinite factorization
     #       to solve the system twice as fast (because
     #       of the symmetry).
+    import scipy.sparse.linalg  # SuperLU wrappers, imported on first use
     try:
         solve = scipy.sparse.linalg.factorized(K)
     except RuntimeError:
@@ -105,7 +142,7 @@ def augmented_system_projections(A, m, n, orth_tol, max_refin, tol):
              "perform the factorizations.")
         return svd_factorization_projections(A.toarray(),
                                              m, n, orth_tol,
-                                             max_refin, tol)
+                                             max_refin, tol, profiler)
 
     # z = x - A.T inv(A A.T) A x
     # is computed solving the extended system:
@@ -137,6 +174,7 @@ def augmented_system_projections(A, m, n, orth_tol, max_refin, tol):
             lu_sol += lu_update
             z = lu_sol[:n]
             k += 1
+        profiler.add("refinement_steps", k)
 
         # return z = x - A.T inv(A A.T) A x
         return z
@@ -169,13 +207,24 @@ def augmented_system_projections(A, m, n, orth_tol, max_refin, tol):
         # return z = A.T inv(A A.T) x
         return lu_sol[:n]
 
-    return null_space, least_squares, row_space
+    # z = inv(A A.T) x
+    # is computed solving the extended system:
+    # [I A.T] * [aux] = [0]
+    # [A  O ]   [-z ]   [x]
+    def normal_solve(x):
+        v = np.hstack([np.zeros(n), x])
+        lu_sol = solve(v)
+        return -lu_sol[n:m+n]
+
+    return null_space, least_squares, row_space, normal_solve
 
 
-def qr_factorization_projections(A, m, n, orth_tol, max_refin, tol):
+def qr_factorization_projections(A, m, n, orth_tol, max_refin, tol,
+                                 profiler=NULL_PROFILER):
     """Return linear operators for matrix A using ``QRFactorization`` approach.
     """
     # QRFactorization
+    import scipy.linalg  # LAPACK wrappers, imported on first use
     Q, R, P = scipy.linalg.qr(A.T, pivoting=True, mode='economic')
 
     if np.linalg.norm(R[-1, :], np.inf) < tol:
@@ -184,7 +233,7 @@ def qr_factorization_projections(A, m, n, orth_tol, max_refin, tol):
         return svd_factorization_projections(A, m, n,
                                              orth_tol,
                                              max_refin,
-                                             tol)
+                                             tol, profiler)
 
     # z = x - A.T inv(A A.T) A x
     def null_space(x):
@@ -208,6 +257,7 @@ def qr_factorization_projections(A, m, n, orth_tol, max_refin, tol):
             # z_next = z - A.T v
             z = z - A.T.dot(v)
             k += 1
+        profiler.add("refinement_steps", k)
 
         return z
 
@@ -230,13 +280,25 @@ def qr_factorization_projections(A, m, n, orth_tol, max_refin, tol):
         z = Q.dot(aux2)
         return z
 
-    return null_space, least_squares, row_space
+    # z = P inv(R) inv(R.T) P.T x
+    def normal_solve(x):
+        aux1 = scipy.linalg.solve_triangular(R, x[P],
+                                             lower=False,
+                                             trans='T')
+        aux2 = scipy.linalg.solve_triangular(R, aux1, lower=False)
+        z = np.zeros(m)
+        z[P] = aux2
+        return z
+
+    return null_space, least_squares, row_space, normal_solve
 
 
-def svd_factorization_projections(A, m, n, orth_tol, max_refin, tol):
+def svd_factorization_projections(A, m, n, orth_tol, max_refin, tol,
+                                  profiler=NULL_PROFILER):
     """Return linear operators for matrix A using ``SVDFactorization`` approach.
     """
     # SVD Factorization
+    import scipy.linalg  # LAPACK wrappers, imported on first use
     U, s, Vt = scipy.linalg.svd(A, full_matrices=False)
 
     # Remove dimensions related with very small singular values
@@ -265,6 +327,7 @@ def svd_factorization_projections(A, m, n, orth_tol, max_refin, tol):
             # z_next = z - A.T v
             z = z - A.T.dot(v)
             k += 1
+        profiler.add("refinement_steps", k)
 
         return z
 
@@ -284,10 +347,18 @@ def svd_factorization_projections(A, m, n, orth_tol, max_refin, tol):
         z = Vt.T.dot(aux2)
         return z
 
-    return null_space, least_squares, row_space
+    # z = U 1/s**2 U.T x
+    def normal_solve(x):
+        aux1 = U.T.dot(x)
+        aux2 = 1/s**2*aux1
+        z = U.dot(aux2)
+        return z
+
+    return null_space, least_squares, row_space, normal_solve
 
 
-def projections(A, method=None, orth_tol=1e-12, max_refin=3, tol=1e-15):
+def projections(A, method=None, orth_tol=1e-12, max_refin=3, tol=1e-15,
+                profiler=NULL_PROFILER):
     """Return three linear operators related with a given matrix A.
 
     Parameters
@@ -323,6 +394,9 @@ def projections(A, method=None, orth_tol=1e-12, max_refin=3, tol=1e-15):
         Maximum number of iterative refinements
     tol : float, optional
         Tolerance for singular values
+    profiler : SolverProfiler, optional
+        When given, count the applications of each operator and the
+        number of iterative refinement steps.
 
     Returns
     -------
@@ -362,45 +436,368 @@ def projections(A, method=None, orth_tol=1e-12, max_refin=3, tol=1e-15):
         SIAM Journal on Scientific Computing 23.4 (2001): 1376-1395.
     """
     m, n = np.shape(A)
+    null_space, least_squares, row_space, _ \
+        = _factorize(A, method, orth_tol, max_refin, tol, profiler)
+    return _operators(m, n, null_space, least_squares, row_space, profiler)
+
+
+def _factorize(A, method, orth_tol, max_refin, tol, profiler):
+    """Factorize ``A`` and return the functions computing the projections
+    and ``normal_solve(x) = inv(A A.T) x``."""
+    m, n = np.shape(A)
 
     # The factorization of an empty matrix
     # only works for the sparse representation.
+    # The projections are trivial in this case,
+    # so the requested method is irrelevant.
     if m*n == 0:
         A = csc_matrix(A)
+        method = None
 
     # Check Argument
     if issparse(A):
         if method is None:
             method = "AugmentedSystem"
-        if method not in ("NormalEquation", "AugmentedSystem"):
+        if method not in SPARSE_METHODS:
             raise ValueError("Method not allowed for sparse matrix.")
-        if method == "NormalEquation" and not sksparse_available:
-            warnings.warn(("Only accepts 'NormalEquation' option when"
-                           " scikit-sparse is available. Using "
-                           "'AugmentedSystem' option instead."),
-                          ImportWarning)
+        if method == "NormalEquation" and _cholesky_AAt() is None:
+            warn(("Only accepts 'NormalEquation' option when"
+                  " scikit-sparse is available. Using "
+                  "'AugmentedSystem' option instead."),
+                 ImportWarning)
             method = 'AugmentedSystem'
     else:
         if method is None:
             method = "QRFactorization"
-        if method not in ("QRFactorization", "SVDFactorization"):
+        if method not in DENSE_METHODS:
             raise ValueError("Method not allowed for dense array.")
 
     if method == 'NormalEquation':
-        null_space, least_squares, row_space \
-            = normal_equation_projections(A, m, n, orth_tol, max_refin, tol)
+        null_space, least_squares, row_space, normal_solve \
+            = normal_equation_projections(A, m, n, orth_tol, max_refin, tol,
+                                          profiler)
     elif method == 'AugmentedSystem':
-        null_space, least_squares, row_space \
-            = augmented_system_projections(A, m, n, orth_tol, max_refin, tol)
+        null_space, least_squares, row_space, normal_solve \
+            = augmented_system_projections(A, m, n, orth_tol, max_refin, tol,
+                                           profiler)
     elif method == "QRFactorization":
-        null_space, least_squares, row_space \
-            = qr_factorization_projections(A, m, n, orth_tol, max_refin, tol)
+        null_space, least_squares, row_space, normal_solve \
+            = qr_factorization_projections(A, m, n, orth_tol, max_refin, tol,
+                                           profiler)
     elif method == "SVDFactorization":
-        null_space, least_squares, row_space \
-            = svd_factorization_projections(A, m, n, orth_tol, max_refin, tol)
+        null_space, least_squares, row_space, normal_solve \
+            = svd_factorization_projections(A, m, n, orth_tol, max_refin, tol,
+                                            profiler)
+    profiler.add("factorizations")
+
+    return null_space, least_squares, row_space, normal_solve
 
-    Z = LinearOperator((n, n), null_space)
-    LS = LinearOperator((m, n), least_squares)
-    Y = LinearOperator((n, m), row_space)
+
+def _operators(m, n, null_space, least_squares, row_space, profiler):
+    """Wrap the projection functions into linear operators."""
+    from scipy.sparse.linalg import LinearOperator  # imported on first use
+    # The dtype is given explicitly to avoid ``LinearOperator``
+    # probing the operators with a dummy matrix-vector product.
+    Z = LinearOperator((n, n), profiler.wrap("Z", null_space), dtype=float)
+    LS = LinearOperator((m, n), profiler.wrap("LS", least_squares),
+                        dtype=float)
+    Y = LinearOperator((n, m), profiler.wrap("Y", row_space), dtype=float)
 
     return Z, LS, Y
+
+
+def _factorization_estimates(m, n, column_nnz):
+    """Estimated flops and bytes of memory of each factorization method
+    for a matrix of shape (m, n) with ``column_nnz`` nonzeros per column.
+    """
+    nnz = np.sum(column_nnz, dtype=float)
+    k = min(m, n)
+    # Each column of ``A`` contributes the square of its nonzeros to
+    # the products forming ``A A.T``, which bounds its nonzeros. Those
+    # of its Cholesky factor are estimated assuming the fill-in of the
+    # factorization, with a fill-reducing ordering, doubles the lower
+    # triangle, unless ``A A.T`` is too dense for that.
+    AAt_flops = np.sum(np.square(column_nnz, dtype=float))
+    nnz_AAt = min(m*m, AAt_flops)
+    if nnz_AAt > DENSE_FACTOR_DENSITY*m*m:
+        nnz_factor = m*(m+1)/2
+    else:
+        nnz_factor = min(m*(m+1)/2, nnz_AAt + m)
+    # Flops of the Cholesky factorization, for nonzeros evenly
+    # distributed among the columns of the factor.
+    cholesky_flops = nnz_factor**2/max(m, 1)
+    return {
+        "QRFactorization": (2*m*n*k - 2/3*k**3,
+                            8*(m*n + n*k + k*m)),
+        "SVDFactorization": (4*m*n*k + 8*k**3,
+                             8*(m*n + m*k + k*n + k)),
+        # The LU factorization of ``[I, A.T; A, 0]`` eliminates the
+        # identity block, leaving the (negated) matrix ``A A.T``.
+        "AugmentedSystem": (SPARSE_FLOP_COST*(AAt_flops + 2*cholesky_flops),
+                            SPARSE_ENTRY_BYTES*(3*n + 4*nnz
+                                                + 2*nnz_factor)),
+        "NormalEquation": (SPARSE_FLOP_COST*(AAt_flops + cholesky_flops),
+                           SPARSE_ENTRY_BYTES*(nnz + nnz_AAt
+                                               + nnz_factor)),
+    }
+
+
+def plan_factorization(A, n_slack=0, sparse=None, method=None):
+    """Choose the representation and the factorization method of a matrix.
+
+    The cost of factorizing ``A`` by each method of `projections` is
+    estimated from its shape and from the number of nonzeros of its
+    columns, and the cheapest one is chosen. The dense methods are
+    charged the flops of the LAPACK factorizations. The sparse methods
+    are charged the flops of the Cholesky factorization of ``A A.T``,
+    whose fill-in is estimated from the nonzeros of ``A``, and each of
+    their flops costs as much as ``SPARSE_FLOP_COST`` dense ones. A
+    matrix with more rows than columns, whose rows are linearly
+    dependent, is factorized using the SVD.
+
+    Parameters
+    ----------
+    A : sparse matrix (or ndarray), shape (m, n)
+        Matrix to be factorized. Only its nonzero pattern is used.
+    n_slack : int, optional
+        Plan for the matrix ``[A, [0; I]]``, with ``n_slack`` additional
+        columns having a single nonzero in the last ``n_slack`` rows,
+        e.g., the Jacobian of the barrier subproblems of
+        `tr_interior_point`, without assembling it. Default is 0.
+    sparse : {bool, None}, optional
+        Only consider the sparse (if True) or the dense (if False)
+        methods. By default consider both.
+    method : string, optional
+        Factorization method. When given, it is not chosen but
+        its cost is still estimated. As in `projections`,
+        'AugmentedSystem' is planned instead of 'NormalEquation'
+        when scikit-sparse is not available.
+
+    Returns
+    -------
+    plan : dict
+        With the keys:
+
+            - 'sparse': whether the matrix should be represented
+              as a sparse matrix.
+            - 'method': the factorization method.
+            - 'shape', 'nnz': shape and nonzeros of the matrix.
+            - 'flops', 'memory': estimated flops and bytes of memory
+              of the factorization using ``method``.
+            - 'estimates': the estimated flops and bytes of memory
+              of each method.
+    """
+    m, n = np.shape(A)
+    if issparse(A):
+        column_nnz = np.diff(csc_matrix(A).indptr)
+    else:
+        column_nnz = np.count_nonzero(A, axis=0)
+    if n_slack > 0:
+        column_nnz = np.hstack((column_nnz, np.ones(n_slack, dtype=int)))
+        n += n_slack
+
+    if method is not None:
+        if method not in SPARSE_METHODS + DENSE_METHODS:
+            raise ValueError("Unknown factorization method "
+                             "'{0}'.".format(method))
+        if sparse is True and method in DENSE_METHODS:
+            raise ValueError("Method not allowed for sparse matrix.")
+        if sparse is False and method in SPARSE_METHODS:
+            raise ValueError("Method not allowed for dense array.")
+        if method == "NormalEquation" and _cholesky_AAt() is None:
+            method = "AugmentedSystem"
+        candidates = [method]
+    elif m*n == 0:
+        # As in `projections`, empty matrices are always sparse.
+        candidates = ["AugmentedSystem"]
+    else:
+        candidates = []
+        if not sparse:
+            if m <= n:
+                candidates.append("QRFactorization")
+            else:
+                candidates.append("SVDFactorization")
+        if sparse or (sparse is None and m <= n):
+            candidates.append("AugmentedSystem")
+            if _cholesky_AAt() is not None:
+                candidates.append("NormalEquation")
+
+    estimates = _factorization_estimates(m, n, column_nnz)
+    method = min(candidates, key=lambda name: estimates[name][0])
+    flops, memory = estimates[method]
+    return {"sparse": method in SPARSE_METHODS,
+            "method": method,
+            "shape": (m, n),
+            "nnz": int(np.sum(column_nnz)),
+            "flops": flops,
+            "memory": memory,
+            "estimates": estimates}
+
+
+class ReusableProjections:
+    """Projections of a sequence of slowly varying matrices.
+
+    Calling an instance with a matrix ``A`` returns the same linear
+    operators ``Z, LS, Y`` as ``projections(A, method, ...)``. The
+    factorization of the latest factorized matrix ``A0`` is reused
+    as long as::
+
+        norm(A - A0, 'fro') <= reuse_tol*norm(A0, 'fro')
+
+    When ``A`` is equal to ``A0`` the previous operators are returned.
+    Otherwise the systems with matrix ``A A.T`` required by the
+    operators are solved by iterative refinement, using the
+    factorization of ``A0`` as an approximation of ``inv(A A.T)``.
+    When the refinement fails to converge in ``max_reuse_refin``
+    steps ``A`` is factorized immediately and the system is solved
+    again with its own factorization, which is then reused for the
+    next matrices.
+
+    Parameters
+    ----------
+    method : string, optional
+        Factorization method, as in `projections`.
+    reuse_tol : float, optional
+        Maximum relative change of the matrix for which the
+        factorization is reused. By default is 0, i.e., every matrix
+        is factorized, and neither kept nor compared with ``A0``.
+    orth_tol, max_refin, tol : float, optional
+        Same as in `projections`. The refinement stops once the
+        relative residual of the systems is below ``orth_tol``.
+    max_reuse_refin : int, optional
+        Maximum number of refinement steps for the systems solved
+        with the factorization of a different matrix.
+    profiler : SolverProfiler, optional
+        As in `projections`. The reused factorizations are counted
+        under ``'reused_factorizations'``.
+
+    Attributes
+    ----------
+    nfactor : int
+        Number of factorizations.
+    nreused : int
+        Number of calls that reused a factorization.
+    """
+    def __init__(self, method=None, reuse_tol=0, orth_tol=1e-12,
+                 max_refin=3, tol=1e-15, max_reuse_refin=10,
+                 profiler=NULL_PROFILER):
+        self.method = method
+        self.reuse_tol = reuse_tol
+        self.orth_tol = orth_tol
+        self.max_refin = max_refin
+        self.tol = tol
+        self.max_reuse_refin = max_reuse_refin
+        self.profiler = profiler
+        self.nfactor = 0
+        self.nreused = 0
+        self.A0 = None
+        self.stale = True
+
+    def _reusable(self, A):
+        """Relative change from ``A0`` if it is small enough, else None."""
+        A0 = self.A0
+        if (self.reuse_tol == 0 or self.stale
+                or np.shape(A) != np.shape(A0)
+                or issparse(A) != issparse(A0)):
+            return None
+        if A is A0:
+            return 0
+        change = frobenius_norm(A - A0)
+        if change == 0:
+            return 0
+        if change <= self.reuse_tol*self.norm_A0:
+            return change
+        return None
+
+    def _factorize(self, A):
+        """Factorize ``A``, which becomes ``A0``."""
+        m, n = np.shape(A)
+        if self.reuse_tol > 0 and not issparse(A):
+            # Kept for the comparisons with the next matrices,
+            # which may be written to the same array.
+            A = np.array(A)
+        null_space, least_squares, row_space, self.normal_solve0 \
+            = _factorize(A, self.method, self.orth_tol,
+                         self.max_refin, self.tol, self.profiler)
+        self.nfactor += 1
+        if self.reuse_tol > 0:
+            self.A0 = A
+            self.norm_A0 = frobenius_norm(A)
+        self.stale = False
+        self.operators = _operators(m, n, null_space, least_squares,
+                                    row_space, self.profiler)
+
+    def __call__(self, A):
+        m, n = np.shape(A)
+        change = self._reusable(A)
+        if change is None:
+            self._factorize(A)
+            return self.operators
+
+        self.nreused += 1
+        self.profiler.add("reused_factorizations")
+        if change == 0:
+            return self.operators
+        null_space, least_squares, row_space \
+            = self._refined_projections(A, m, n)
+        return _operators(m, n, null_space, least_squares, row_space,
+                          self.profiler)
+
+    def _refined_projections(self, A, m, n):
+        """Projection functions for ``A`` using the factorization of ``A0``.
+        """
+        normal_solve0 = self.normal_solve0
+        profiler = self.profiler
+        # Factorization of ``A`` itself, once the refinement failed.
+        refactorized = []
+
+        # z = inv(A A.T) x, solved by iterative refinement
+        # using inv(A0 A0.T) as an approximate inverse.
+        def normal_solve(x):
+            if refactorized:
+                return refactorized[0](x)
+            z = normal_solve0(x)
+            norm_x = np.linalg.norm(x)
+            norm_r_prev = np.inf
+            k = 0
+            while True:
+                r = x - A.dot(A.T.dot(z))
+                norm_r = np.linalg.norm(r)
+                if norm_r <= self.orth_tol*norm_x:
+                    break
+                if k >= self.max_reuse_refin or norm_r >= norm_r_prev:
+                    # Factorize ``A`` and solve the system again
+                    profiler.add("refinement_steps", k)
+                    self._factorize(A)
+                    refactorized.append(self.normal_solve0)
+                    return self.normal_solve0(x)
+                z = z + normal_solve0(r)
+                norm_r_prev = norm_r
+                k += 1
+            profiler.add("refinement_steps", k)
+            return z
+
+        # z = x - A.T inv(A A.T) A x
+        def null_space(x):
+            z = x - A.T.dot(normal_solve(A.dot(x)))
+
+            # Iterative refinement to improve roundoff
+            # errors described in [2]_, algorithm 5.1.
+            k = 0
+            while orthogonality(A, z) > self.orth_tol:
+                if k >= self.max_refin:
+                    break
+                z = z - A.T.dot(normal_solve(A.dot(z)))
+                k += 1
+
+            return z
+
+        # z = inv(A A.T) A x
+        def least_squares(x):
+            return normal_solve(A.dot(x))
+
+        # z = A.T inv(A A.T) x
+        def row_space(x):
+            return A.T.dot(normal_solve(x))
+
+        return null_space, least_squares, row_space
@@ -1,8 +1,9 @@
 """Equality-constrained quadratic programming solvers."""
 
 from __future__ import division, print_function, absolute_import
-from scipy.sparse import (linalg, bmat, csc_matrix)
+from scipy.sparse import (bmat, csc_matrix)
 from math import copysign
+from timeit import default_timer
 import numpy as np
 from numpy.linalg import norm
 
@@ -11,9 +12,11 @@ __all__ = [
     'sphere_intersections',
     'box_intersections',
     'box_sphere_intersections',
+    'segments_box_sphere_intersections',
     'inside_box_boundaries',
     'modified_dogleg',
-    'projected_cg'
+    'projected_cg',
+    'projected_gltr'
 ]
 
 
@@ -55,7 +58,8 @@ def eqp_kktfact(H, c, A, b):
     # TODO: Use a symmetric indefinite factorization
     #       to solve the system twice as fast (because
     #       of the symmetry).
-    lu = linalg.splu(kkt_matrix)
+    from scipy.sparse.linalg import splu  # imported on first use
+    lu = splu(kkt_matrix)
     kkt_sol = lu.solve(kkt_vec)
     x = kkt_sol[:n]
     lagrange_multipliers = -kkt_sol[n:n+m]
@@ -303,14 +307,98 @@ def box_sphere_intersections(z, d, lb, ub, trust_radius,
         return ta, tb, intersect
 
 
+def segments_box_sphere_intersections(z, d, lb, ub, trust_radius,
+                                      entire_line=False):
+    """Find the intersections between several segments and box/sphere.
+
+    Vectorized counterpart of `box_sphere_intersections`, finding in
+    a single pass over ``lb`` and ``ub`` the intersections between
+    the segments (or lines) ``x(t) = z[i] + t*d[i]``, the rectangular
+    box ``lb <= x <= ub`` and the ball ``||x|| <= trust_radius``.
+
+    Parameters
+    ----------
+    z : array_like, shape (k, n)
+        Initial points, one per row.
+    d : array_like, shape (k, n)
+        Directions, one per row.
+    lb : array_like, shape (n,)
+        Lower bounds to each one of the components of ``x``.
+    ub : array_like, shape (n, )
+        Upper bounds to each one of the components of ``x``.
+    trust_radius : float
+        Ball radius.
+    entire_line : bool, optional
+        When ``True`` find the intersections of the lines
+        ``x(t) = z[i] + t*d[i]`` (``t`` can assume any value). When
+        ``False`` of the segments for ``0 <= t <= 1``.
+
+    Returns
+    -------
+    ta, tb : ndarray, shape (k,)
+        The line/segment ``x(t) = z[i] + t*d[i]`` is inside the
+        rectangular box and inside the ball for ``ta[i] <= t <= tb[i]``.
+    intersect : ndarray of bool, shape (k,)
+        Whether there is an intersection between each line (or segment)
+        and both constraints.
+    """
+    z = np.atleast_2d(z)
+    d = np.atleast_2d(d)
+    nonzero_d = d != 0
+    null = ~nonzero_d.any(axis=1)
+
+    # Box: intersection of the intervals (t_lb[i, j], t_ub[i, j]).
+    # The coordinates for which ``d`` is zero impose no restriction,
+    # unless their bounds are violated.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_lb = (lb - z) / d
+        t_ub = (ub - z) / d
+    ta_b = np.where(nonzero_d, np.minimum(t_lb, t_ub), -np.inf).max(axis=1)
+    tb_b = np.where(nonzero_d, np.maximum(t_lb, t_ub), np.inf).min(axis=1)
+    outside = (~nonzero_d & ((z < lb) | (z > ub))).any(axis=1)
+    intersect_b = (ta_b <= tb_b) & ~outside
+
+    # Sphere: roots of ``a t**2 + b t + c``, computed as
+    # in `sphere_intersections` for smaller roundoff errors.
+    if np.isinf(trust_radius):
+        ta_s = np.full(len(d), -np.inf if entire_line else 0.0)
+        tb_s = np.full(len(d), np.inf if entire_line else 1.0)
+        intersect_s = np.ones(len(d), bool)
+    else:
+        a = np.einsum('ij,ij->i', d, d)
+        b = 2*np.einsum('ij,ij->i', z, d)
+        c = np.einsum('ij,ij->i', z, z) - trust_radius**2
+        discriminant = b*b - 4*a*c
+        intersect_s = discriminant >= 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = b + np.copysign(np.sqrt(np.maximum(discriminant, 0)), b)
+            t1 = -aux / (2*a)
+            # ``aux`` is only zero for the double root ``t = 0``.
+            t2 = np.where(aux == 0, t1, -2*c / aux)
+        ta_s = np.where(intersect_s, np.minimum(t1, t2), 0)
+        tb_s = np.where(intersect_s, np.maximum(t1, t2), 0)
+
+    if not entire_line:
+        # Restrict the intersection intervals between 0 and 1.
+        outside_b = (tb_b < 0) | (ta_b > 1)
+        intersect_b &= ~outside_b
+        ta_b = np.where(outside_b, 0, np.maximum(ta_b, 0))
+        tb_b = np.where(outside_b, 0, np.minimum(tb_b, 1))
+        outside_s = (tb_s < 0) | (ta_s > 1)
+        intersect_s &= ~outside_s
+        ta_s = np.where(outside_s, 0, np.maximum(ta_s, 0))
+        tb_s = np.where(outside_s, 0, np.minimum(tb_s, 1))
+
+    ta = np.where(null, 0, np.maximum(ta_b, ta_s))
+    tb = np.where(null, 0, np.minimum(tb_b, tb_s))
+    intersect = intersect_b & intersect_s & (ta <= tb) & ~null
+    return ta, tb, intersect
+
+
 def inside_box_boundaries(x, lb, ub):
     """Check if lb <= x <= ub."""
     return (lb <= x).all() and (x <= ub).all()
 
-def reinforce_box_boundaries(x, lb, ub):
-    """Return clipped value of x"""
-    return np.minimum(np.maximum(x, lb), ub)
-
 
 def reinforce_box_boundaries(x, lb, ub):
     """Return clipped value of x"""
@@ -377,37 +465,32 @@ def modified_dogleg(A, Y, b, trust_radius, lb, ub):
     # Compute cauchy point
     # `cauchy_point = g.T g / (g.T A.T A g)``.
     A_g = A.dot(g)
-    cauchy_point = -np.dot(g, g) / np.dot(A_g, A_g) * g
-    # Origin
-    origin_point = np.zeros_like(cauchy_point)
-
-    # Check the segment between cauchy_point and newton_point
-    # for a possible solution.
-    z = cauchy_point
-    p = newton_point - cauchy_point
-    _, alpha, intersect = box_sphere_intersections(z, p, lb, ub,
-                                                   trust_radius)
-    if intersect:
-        x1 = z + alpha*p
+    cauchy_step = -np.dot(g, g) / np.dot(A_g, A_g)
+    cauchy_point = cauchy_step * g
+
+    # Check, in a single pass, the segments between cauchy_point and
+    # newton_point, between the origin and cauchy_point and between
+    # the origin and newton_point for possible solutions.
+    z = np.zeros((3, len(newton_point)))
+    z[0] = cauchy_point
+    p = np.vstack((newton_point - cauchy_point, cauchy_point, newton_point))
+    _, alpha, intersect = segments_box_sphere_intersections(z, p, lb, ub,
+                                                            trust_radius)
+    # The products of ``A`` with the candidate solutions
+    # are obtained from the ones already computed.
+    A_newton = A.dot(newton_point)
+    A_cauchy = cauchy_step * A_g
+    if intersect[0]:
+        x1 = cauchy_point + alpha[0]*p[0]
+        A_x1 = A_cauchy + alpha[0]*(A_newton - A_cauchy)
     else:
-        # Check the segment between the origin and cauchy_point
-        # for a possible solution.
-        z = origin_point
-        p = cauchy_point
-        _, alpha, _ = box_sphere_intersections(z, p, lb, ub,
-                                               trust_radius)
-        x1 = z + alpha*p
-
-    # Check the segment between origin and newton_point
-    # for a possible solution.
-    z = origin_point
-    p = newton_point
-    _, alpha, _ = box_sphere_intersections(z, p, lb, ub,
-                                           trust_radius)
-    x2 = z + alpha*p
+        x1 = alpha[1]*cauchy_point
+        A_x1 = alpha[1]*A_cauchy
+    x2 = alpha[2]*newton_point
+    A_x2 = alpha[2]*A_newton
 
     # Return the best solution among x1 and x2.
-    if norm(A.dot(x1) + b) < norm(A.dot(x2) + b):
+    if norm(A_x1 + b) < norm(A_x2 + b):
         return x1
     else:
         return x2
@@ -416,7 +499,7 @@ def modified_dogleg(A, Y, b, trust_radius, lb, ub):
 def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
                  lb=None, ub=None, tol=None,
                  max_iter=None, max_infeasible_iter=None,
-                 return_all=False):
+                 return_all=False, deadline=None):
     """Solve EQP problem with projected CG method.
 
     Solve equality-constrained quadratic programming problem
@@ -459,6 +542,9 @@ def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
         By default uses ``max_infeasible_iter = n-m``.
     return_all : bool, optional
         When ``true`` return the list of all vectors through the iterations.
+    deadline : float, optional
+        Time, as given by ``timeit.default_timer()``, after which the
+        iterations are interrupted. By default there is no time limit.
 
     Returns
     -------
@@ -472,7 +558,8 @@ def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
                 1. Iteration limit was reached;
                 2. Reached the trust-region boundary;
                 3. Negative curvature detected;
-                4. Tolerance was satisfied.
+                4. Tolerance was satisfied;
+                5. Time limit was reached.
             - allvecs : List containing all intermediary vectors (optional).
             - hits_boundary : True if the proposed step is on the boundary
               of the trust region.
@@ -551,6 +638,10 @@ def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
         if rt_g < tol:
             stop_cond = 4
             break
+        # Stop criteria - Time limit
+        if deadline is not None and default_timer() > deadline:
+            stop_cond = 5
+            break
         k += 1
         # Compute curvature
         pt_H_p = H_p.dot(p)
@@ -562,8 +653,9 @@ def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
                                      "problems.")
             else:
                 # Find intersection with constraints
-                _, alpha, intersect = box_sphere_intersections(
+                _, alpha, intersect = segments_box_sphere_intersections(
                     x, p, lb, ub, trust_radius, entire_line=True)
+                alpha, intersect = alpha[0], intersect[0]
                 # Update solution
                 if intersect:
                     x = x + alpha*p
@@ -582,8 +674,9 @@ def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
         # Stop criteria - Hits boundary
         if np.linalg.norm(x_next) >= trust_radius:
             # Find intersection with box constraints
-            _, theta, intersect = box_sphere_intersections(x, alpha*p, lb, ub,
-                                                           trust_radius)
+            _, theta, intersect = segments_box_sphere_intersections(
+                x, alpha*p, lb, ub, trust_radius)
+            theta, intersect = theta[0], intersect[0]
             # Update solution
             if intersect:
                 x = x + theta*alpha*p
@@ -602,8 +695,9 @@ def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
             counter += 1
         # Whenever outside box constraints keep looking for intersections.
         if counter > 0:
-            _, theta, intersect = box_sphere_intersections(x, alpha*p, lb, ub,
-                                                           trust_radius)
+            _, theta, intersect = segments_box_sphere_intersections(
+                x, alpha*p, lb, ub, trust_radius)
+            theta, intersect = theta[0], intersect[0]
             if intersect:
                 last_feasible_x = x + theta*alpha*p
                 # Reinforce variables are inside box constraints.
@@ -641,3 +735,200 @@ def projected_cg(H, c, Z, Y, b, trust_radius=np.inf,
     if return_all:
         info['allvecs'] = allvecs
     return x, info
+
+
+def tridiagonal_trust_region(alpha, beta, gamma, trust_radius):
+    """Solve trust-region subproblem with tridiagonal matrix.
+
+    Solve ``min 1/2 h.T T h + gamma h[0]`` subject to
+    ``||h|| <= trust_radius``, where ``T`` is the symmetric tridiagonal
+    matrix with diagonal ``alpha`` and off-diagonal ``beta``, using
+    the eigendecomposition of ``T`` and Newton iterations on the
+    secular equation ``1/||h(lambda)|| = 1/trust_radius``,
+    safeguarded by bisection, as described in [1]_, p. 84.
+
+    Returns
+    -------
+    h : ndarray, shape (k,)
+        Solution of the subproblem.
+    on_boundary : bool
+        True if ``||h|| = trust_radius``.
+
+    References
+    ----------
+    .. [1] Nocedal, Jorge, and Stephen J. Wright. "Numerical optimization"
+           Second Edition (2006).
+    """
+    TOL = 1e-10
+    MAX_ITER = 100
+    from scipy.linalg import eigh_tridiagonal  # imported on first use
+    theta, V = eigh_tridiagonal(alpha, beta)
+    g = gamma*V[0]
+    theta_min = theta[0]
+
+    def step(lam):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = -g/(theta + lam)
+        return w
+
+    # Interior solution
+    if theta_min > 0:
+        w = step(0)
+        if norm(w) <= trust_radius:
+            return V.dot(w), False
+
+    # Solution on the boundary: lambda in the interval (lo, hi].
+    lo = max(0, -theta_min)
+    hi = lo + norm(g)/trust_radius
+    singular = theta + lo <= TOL*max(1, abs(theta_min))
+    # Hard case: ``g`` (almost) orthogonal to the eigenvectors of
+    # the smallest eigenvalue and the remaining components inside
+    # the trust region. Complete the step with that eigenvector.
+    if np.all(np.abs(g[singular]) <= TOL*norm(g)) and theta_min <= 0:
+        w = np.where(singular, 0, step(lo))
+        norm_w = norm(w)
+        if norm_w <= trust_radius:
+            tau = np.sqrt(trust_radius**2 - norm_w**2)
+            w[0] = tau
+            return V.dot(w), True
+
+    lam = hi
+    for _ in range(MAX_ITER):
+        w = step(lam)
+        norm_w = norm(w)
+        if abs(norm_w - trust_radius) <= TOL*trust_radius:
+            break
+        if norm_w > trust_radius:
+            lo = lam
+        else:
+            hi = lam
+        # Newton step on ``1/||w(lambda)|| - 1/trust_radius = 0``
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dw = np.dot(w, w/(theta + lam))
+            lam_next = lam + (norm_w/trust_radius - 1)*norm_w**2/dw
+        if not lo < lam_next < hi:
+            lam_next = (lo + hi)/2
+        lam = lam_next
+    return V.dot(w), True
+
+
+def projected_gltr(H, c, Z, Y, b, trust_radius=np.inf,
+                   lb=None, ub=None, tol=None, max_iter=None,
+                   deadline=None):
+    """Solve EQP problem with the projected generalized Lanczos method.
+
+    Solve the same problem as `projected_cg`:
+    ``min 1/2 x.T H x + x.t c``  subject to ``A x + b = 0`` and,
+    possibly, to trust region constraints ``||x|| < trust_radius``
+    and box constraints ``lb <= x <= ub``, with the same parameters
+    and return values.
+
+    Unlike `projected_cg`, it does not stop when negative curvature
+    is detected or when the trust-region boundary is reached. It
+    minimizes the quadratic model over the growing Krylov subspaces
+    generated by projected Lanczos iterations, solving a tridiagonal
+    trust-region subproblem at each iteration, as described in [1]_.
+    The Lanczos vectors are stored and reorthogonalized, so it uses
+    ``O(niter*n)`` memory. Box constraints are not considered by the
+    Lanczos iterations: when the solution violates them, the best
+    (regarding the quadratic model) among this solution truncated
+    to the box and the solution of `projected_cg` is returned.
+
+    References
+    ----------
+    .. [1] Gould, Nicholas IM, Stefano Lucidi, Massimo Roma, and
+           Philippe L. Toint. "Solving the trust-region subproblem
+           using the Lanczos method." SIAM Journal on Optimization
+           9.2 (1999): 504-525.
+    """
+    CLOSE_TO_ZERO = 1e-25
+
+    n, = np.shape(c)  # Number of parameters
+    m, = np.shape(b)  # Number of constraints
+
+    # Minimum norm solution of ``A x + b = 0``. It is orthogonal
+    # to the null space of ``A``, hence the steps ``w`` on the null
+    # space are restricted to ``||w|| <= radius``.
+    x0 = Y.dot(-b)
+    tr_distance = trust_radius - norm(x0)
+    if tr_distance < 0:
+        raise ValueError("Trust region problem does not have a solution.")
+    elif tr_distance < CLOSE_TO_ZERO:
+        info = {'niter': 0, 'stop_cond': 2, 'hits_boundary': True}
+        return x0, info
+    radius = np.sqrt(trust_radius**2 - norm(x0)**2)
+
+    g = Z.dot(H.dot(x0) + c)
+    gamma = norm(g)
+    # Set default tolerance, as in ``projected_cg``
+    if tol is None:
+        tol = max(min(0.01 * gamma, 0.1 * gamma**2), CLOSE_TO_ZERO)
+    # Set default lower and upper bounds
+    if lb is None:
+        lb = np.full(n, -np.inf)
+    if ub is None:
+        ub = np.full(n, np.inf)
+    # Set maximum iterations
+    if max_iter is None:
+        max_iter = n-m
+    max_iter = min(max_iter, n-m)
+
+    x = x0
+    stop_cond = 1
+    hits_boundary = False
+    k = 0
+    if gamma**2 < tol:
+        stop_cond = 4
+    else:
+        lanczos = [g/gamma]
+        alpha = []
+        beta = []
+        for i in range(max_iter):
+            # Stop criteria - Time limit
+            if deadline is not None and default_timer() > deadline:
+                stop_cond = 5
+                break
+            k += 1
+            q = lanczos[-1]
+            H_q = H.dot(q)
+            alpha.append(q.dot(H_q))
+            # Next Lanczos vector, projected into the null space
+            # and reorthogonalized against the previous ones.
+            v = Z.dot(H_q)
+            for q_j in lanczos:
+                v = v - q_j.dot(v)*q_j
+            beta_next = norm(v)
+            # Minimize the model on the current Krylov subspace
+            h, hits_boundary = tridiagonal_trust_region(
+                np.array(alpha), np.array(beta), gamma, radius)
+            # Stop criteria - Tolerance : the norm of the gradient
+            # of the Lagrangian of the subproblem is small.
+            if (beta_next*h[-1])**2 < tol or beta_next < CLOSE_TO_ZERO:
+                stop_cond = 2 if hits_boundary else 4
+                break
+            beta.append(beta_next)
+            lanczos.append(v/beta_next)
+        if k > 0:
+            x = x0 + np.dot(h, np.array(lanczos[:len(h)]))
+
+    info = {'niter': k, 'stop_cond': stop_cond,
+            'hits_boundary': hits_boundary}
+    if not inside_box_boundaries(x, lb, ub):
+        # Truncate the step to the box and compare
+        # with the solution of the projected CG.
+        _, t, intersect = segments_box_sphere_intersections(
+            x0, x - x0, lb, ub, trust_radius)
+        x_box = x0 + t[0]*(x - x0) if intersect[0] else x0
+        x_cg, info_cg = projected_cg(H, c, Z, Y, b, trust_radius,
+                                     lb, ub, deadline=deadline)
+
+        def model(x):
+            return 1/2*x.dot(H.dot(x)) + c.dot(x)
+        if model(x_cg) < model(x_box):
+            x = x_cg
+            info = dict(info_cg)
+        else:
+            x = x_box
+            info['hits_boundary'] = True
+        info['niter'] = k + info_cg['niter']
+    return x, info
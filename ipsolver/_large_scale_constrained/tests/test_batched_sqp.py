@@ -0,0 +1,124 @@
+import numpy as np
+from ipsolver._large_scale_constrained.batched_sqp \
+    import (BatchedProjections,
+            batched_sphere_intersections,
+            batched_modified_dogleg,
+            batched_projected_cg)
+from ipsolver._large_scale_constrained.qp_subproblem \
+    import (sphere_intersections,
+            modified_dogleg,
+            projected_cg)
+from ipsolver._large_scale_constrained.projections \
+    import projections
+from numpy.testing import (TestCase, assert_array_almost_equal,
+                           assert_array_equal, assert_equal, assert_)
+
+
+def random_problems(n_batch, m, n, random_state=0):
+    rng = np.random.RandomState(random_state)
+    A = rng.normal(size=(n_batch, m, n))
+    b = rng.normal(size=(n_batch, m))
+    c = rng.normal(size=(n_batch, n))
+    M = rng.normal(size=(n_batch, n, n))
+    H = np.einsum('kij,kil->kjl', M, M) + np.eye(n)
+    return A, b, c, H
+
+
+class TestBatchedProjections(TestCase):
+
+    def test_compare_with_projections(self):
+        A, b, c, _ = random_problems(5, 3, 7)
+        proj = BatchedProjections(A)
+        for k in range(5):
+            Z, LS, Y = projections(A[k])
+            assert_array_almost_equal(proj.null_space(c)[k], Z.dot(c[k]))
+            assert_array_almost_equal(proj.least_squares(c)[k],
+                                      LS.dot(c[k]))
+            assert_array_almost_equal(proj.row_space(b)[k], Y.dot(b[k]))
+
+    def test_take_and_update(self):
+        A, b, c, _ = random_problems(4, 2, 5)
+        proj = BatchedProjections(A)
+        A_new, _, _, _ = random_problems(4, 2, 5, random_state=1)
+        proj.update([1, 3], A_new[[1, 3]])
+        A[[1, 3]] = A_new[[1, 3]]
+        assert_array_almost_equal(proj.take([1, 3]).row_space(b[[1, 3]]),
+                                  BatchedProjections(A[[1, 3]])
+                                  .row_space(b[[1, 3]]))
+
+    def test_unconstrained(self):
+        c = np.ones((3, 4))
+        proj = BatchedProjections(np.empty((3, 0, 4)))
+        assert_array_equal(proj.null_space(c), c)
+        assert_equal(proj.least_squares(c).shape, (3, 0))
+        assert_array_equal(proj.row_space(np.empty((3, 0))), np.zeros((3, 4)))
+
+
+class TestBatchedSphereIntersections(TestCase):
+
+    def test_compare_with_sphere_intersections(self):
+        z = np.array([[0, 0], [2, 0], [2, 0], [2, 0], [0, 0]], dtype=float)
+        d = np.array([[1, 0], [0, 1], [1, 0], [-1, 0], [0, 0]], dtype=float)
+        trust_radius = np.array([0.5, 1, 1, 1.5, 1])
+        for entire_line in (False, True):
+            ta, tb, intersect = batched_sphere_intersections(
+                z, d, trust_radius, entire_line)
+            for k in range(len(z)):
+                ta_k, tb_k, intersect_k = sphere_intersections(
+                    z[k], d[k], trust_radius[k], entire_line)
+                assert_equal(intersect[k], intersect_k)
+                if intersect_k:
+                    assert_array_almost_equal([ta[k], tb[k]], [ta_k, tb_k])
+
+
+class TestBatchedModifiedDogleg(TestCase):
+
+    def test_compare_with_modified_dogleg(self):
+        A, b, _, _ = random_problems(6, 2, 4)
+        proj = BatchedProjections(A)
+        trust_radius = np.array([0.01, 0.1, 0.5, 1, 2, 100])
+        x = batched_modified_dogleg(A, proj, b, trust_radius)
+        for k in range(len(A)):
+            _, _, Y = projections(A[k])
+            x_k = modified_dogleg(A[k], Y, b[k], trust_radius[k],
+                                  np.full(4, -np.inf), np.full(4, np.inf))
+            assert_array_almost_equal(x[k], x_k)
+
+
+class TestBatchedProjectedCG(TestCase):
+
+    def test_compare_with_projected_cg(self):
+        A, b, c, H = random_problems(6, 2, 6)
+        H[2] = -H[2]  # Negative curvature
+        proj = BatchedProjections(A)
+        b = 0.01*b
+        trust_radius = np.array([0.1, 0.5, 1, 2, 10, 1000])
+        x, info = batched_projected_cg(H, c, proj, b, trust_radius)
+        for k in range(len(A)):
+            Z, _, Y = projections(A[k])
+            x_k, info_k = projected_cg(H[k], c[k], Z, Y, b[k],
+                                       trust_radius[k])
+            assert_array_almost_equal(x[k], x_k)
+            assert_equal(info["niter"][k], info_k["niter"])
+            assert_equal(info["stop_cond"][k], info_k["stop_cond"])
+            assert_equal(info["hits_boundary"][k], info_k["hits_boundary"])
+        assert_(not info["infeasible"].any())
+
+    def test_infeasible_problem(self):
+        A, b, c, H = random_problems(3, 2, 6)
+        proj = BatchedProjections(A)
+        trust_radius = np.full(3, 1000.)
+        x_ref, info_ref = batched_projected_cg(H, c, proj, b, trust_radius)
+        # The constraints of the second problem cannot be satisfied
+        # inside its trust region.
+        trust_radius[1] = 0.5*np.linalg.norm(proj.row_space(-b)[1])
+        x, info = batched_projected_cg(H, c, proj, b, trust_radius)
+        assert_array_equal(info["infeasible"], [False, True, False])
+        assert_equal(info["stop_cond"][1], 0)
+        assert_equal(info["niter"][1], 0)
+        assert_array_almost_equal(x[1], proj.row_space(-b)[1])
+        # The other problems are not affected.
+        for k in (0, 2):
+            assert_array_almost_equal(x[k], x_ref[k])
+            assert_equal(info["niter"][k], info_ref["niter"][k])
+            assert_equal(info["stop_cond"][k], info_ref["stop_cond"][k])
@@ -1,9 +1,11 @@
 from __future__ import division, print_function, absolute_import
 import numpy as np
 import scipy.linalg
-from scipy.sparse import csc_matrix
+from scipy.sparse import csc_matrix, diags
+from ipsolver._large_scale_constrained import projections as _projections
 from ipsolver._large_scale_constrained.projections \
-    import projections, orthogonality
+    import (projections, orthogonality, ReusableProjections,
+            plan_factorization)
 from numpy.testing import (TestCase, assert_array_almost_equal,
                            assert_array_equal, assert_array_less,
                            assert_raises, assert_equal, assert_,
@@ -174,6 +176,184 @@ class TestProjections(TestCase):
                 assert_equal(np.linalg.matrix_rank(A),
                              np.linalg.matrix_rank(A_ext))
 
+    def test_empty_matrix(self):
+        A = np.empty((0, 4))
+        z = np.array([1, 2, 3, 4])
+        for method in available_dense_methods + available_sparse_methods:
+            Z, LS, Y = projections(A, method)
+            assert_array_equal(Z.dot(z), z)
+            assert_equal(LS.dot(z).shape, (0,))
+            assert_array_equal(Y.dot(np.empty(0)), np.zeros(4))
+
+
+class TestReusableProjections(TestCase):
+
+    def test_perturbed_matrix(self):
+        A_dense = np.array([[1, 2, 3, 4, 0, 5, 0, 7],
+                            [0, 8, 7, 0, 1, 5, 9, 0],
+                            [1, 0, 0, 0, 0, 1, 2, 3]], dtype=float)
+        E = 1e-3*np.array([[1, 0, 0, 1, 0, 0, 1, 0],
+                           [0, 1, 0, 0, 1, 0, 0, 1],
+                           [1, 0, 1, 0, 1, 0, 1, 0]])
+        z = np.array([1.12, 10, 0, 0, 100000, 6, 0.7, 8])
+        w = np.array([1, 2, 3])
+        for method, to_matrix in ([(m, csc_matrix)
+                                   for m in available_sparse_methods]
+                                  + [(m, np.asarray)
+                                     for m in available_dense_methods]):
+            projector = ReusableProjections(method, reuse_tol=0.01)
+            projector(to_matrix(A_dense))
+            A = to_matrix(A_dense + E)
+            Z, LS, Y = projector(A)
+            assert_equal(projector.nfactor, 1)
+            assert_equal(projector.nreused, 1)
+            Z_ref, LS_ref, Y_ref = projections(A, method)
+            assert_allclose(Z.dot(z), Z_ref.dot(z), atol=1e-7)
+            assert_allclose(LS.dot(z), LS_ref.dot(z), rtol=1e-9)
+            assert_allclose(Y.dot(w), Y_ref.dot(w), rtol=1e-9)
+            # Unchanged matrix: the operators are reused
+            projector(to_matrix(A_dense + E))
+            assert_equal(projector.nreused, 2)
+            # Large change: factorized again
+            projector(to_matrix(2*A_dense))
+            assert_equal(projector.nfactor, 2)
+
+    def test_refinement_failure(self):
+        A_dense = np.array([[1, 2, 3, 4, 0, 5, 0, 7],
+                            [0, 8, 7, 0, 1, 5, 9, 0],
+                            [1, 0, 0, 0, 0, 1, 2, 3]], dtype=float)
+        E = 0.5*np.array([[1, 0, 0, 1, 0, 0, 1, 0],
+                          [0, 1, 0, 0, 1, 0, 0, 1],
+                          [1, 0, 1, 0, 1, 0, 1, 0]])
+        z = np.array([1.12, 10, 0, 0, 100000, 6, 0.7, 8])
+        for method, to_matrix in ([(m, csc_matrix)
+                                   for m in available_sparse_methods]
+                                  + [(m, np.asarray)
+                                     for m in available_dense_methods]):
+            projector = ReusableProjections(method, reuse_tol=1,
+                                            max_reuse_refin=1)
+            projector(to_matrix(A_dense))
+            A = to_matrix(A_dense + E)
+            Z, LS, Y = projector(A)
+            assert_equal(projector.nfactor, 1)
+            # The refinement fails: ``A`` is factorized immediately
+            Z_ref, LS_ref, Y_ref = projections(A, method)
+            assert_allclose(Z.dot(z), Z_ref.dot(z), atol=1e-7)
+            assert_equal(projector.nfactor, 2)
+            assert_allclose(LS.dot(z), LS_ref.dot(z), rtol=1e-9)
+            # and reused for the next matrices
+            assert_(projector(to_matrix(A_dense + E)) is projector.operators)
+            assert_equal(projector.nfactor, 2)
+
+    def test_default_reuse_tol(self):
+        A = np.array([[1, 2, 3, 4, 0, 5, 0, 7],
+                      [0, 8, 7, 0, 1, 5, 9, 0]], dtype=float)
+        frobenius_norm = _projections.frobenius_norm
+        try:
+            # Nothing is compared with the previous matrix.
+            _projections.frobenius_norm = None
+            projector = ReusableProjections()
+            projector(A)
+            projector(A.copy())
+        finally:
+            _projections.frobenius_norm = frobenius_norm
+        assert_equal(projector.nfactor, 2)
+        assert_equal(projector.nreused, 0)
+        # and no copy is kept
+        assert_(projector.A0 is None)
+
+    def test_matrix_modified_in_place(self):
+        A = np.array([[1, 2, 3, 4, 0, 5, 0, 7],
+                      [0, 8, 7, 0, 1, 5, 9, 0]], dtype=float)
+        projector = ReusableProjections(reuse_tol=0.01)
+        projector(A)
+        A[0, 0] = 2
+        Z, _, _ = projector(A)
+        assert_equal(projector.nfactor, 2)
+        Z_ref, _, _ = projections(A)
+        z = np.arange(8.0)
+        assert_allclose(Z.dot(z), Z_ref.dot(z), atol=1e-12)
+
+
+class TestPlanFactorization(TestCase):
+
+    def test_small_matrix(self):
+        A = csc_matrix([[1, 2, 3, 4, 0, 5, 0, 7],
+                        [0, 8, 7, 0, 1, 5, 9, 0],
+                        [1, 0, 0, 0, 0, 1, 2, 3]])
+        plan = plan_factorization(A)
+        assert_equal(plan["method"], "QRFactorization")
+        assert_equal(plan["sparse"], False)
+        assert_equal(plan["shape"], (3, 8))
+        assert_equal(plan["nnz"], 15)
+        assert_equal(plan["flops"], plan["estimates"]["QRFactorization"][0])
+        assert_equal(plan["memory"],
+                     plan["estimates"]["QRFactorization"][1])
+        # Slack variables
+        plan = plan_factorization(A, n_slack=2)
+        assert_equal(plan["shape"], (3, 10))
+        assert_equal(plan["nnz"], 17)
+
+    def test_large_sparse_matrix(self):
+        n = 2000
+        A = diags([1, -2, 1], [0, 1, 2], shape=(n//2, n))
+        for B in (A, A.toarray()):
+            plan = plan_factorization(B)
+            assert_equal(plan["method"], "AugmentedSystem")
+            assert_equal(plan["sparse"], True)
+            assert_array_less(plan["memory"],
+                              plan["estimates"]["QRFactorization"][1])
+        # Dense matrix of the same size
+        plan = plan_factorization(np.ones((n//2, n)))
+        assert_equal(plan["method"], "QRFactorization")
+
+    def test_more_rows_than_columns(self):
+        A = np.ones((4, 3))
+        assert_equal(plan_factorization(A)["method"], "SVDFactorization")
+        assert_equal(plan_factorization(A, sparse=True)["method"],
+                     "AugmentedSystem")
+
+    def test_normal_equation(self):
+        A = diags([1, -2, 1], [0, 1, 2], shape=(1000, 2000))
+        cholmod = dict(_projections._cholmod)
+        try:
+            _projections._cholmod["cholesky_AAt"] = object()
+            plan = plan_factorization(A)
+        finally:
+            _projections._cholmod.clear()
+            _projections._cholmod.update(cholmod)
+        assert_equal(plan["method"], "NormalEquation")
+
+    def test_normal_equation_unavailable(self):
+        A = diags([1, -2, 1], [0, 1, 2], shape=(1000, 2000))
+        cholmod = dict(_projections._cholmod)
+        try:
+            # As if scikit-sparse was not installed
+            _projections._cholmod["cholesky_AAt"] = None
+            plans = [plan_factorization(A),
+                     plan_factorization(A, method="NormalEquation")]
+        finally:
+            _projections._cholmod.clear()
+            _projections._cholmod.update(cholmod)
+        for plan in plans:
+            assert_equal(plan["method"], "AugmentedSystem")
+            assert_equal(plan["flops"],
+                         plan["estimates"]["AugmentedSystem"][0])
+
+    def test_override(self):
+        A = np.array([[1, 2, 3, 4, 0, 5, 0, 7],
+                      [0, 8, 7, 0, 1, 5, 9, 0]])
+        plan = plan_factorization(A, sparse=True)
+        assert_equal(plan["method"], "AugmentedSystem")
+        plan = plan_factorization(A, method="SVDFactorization")
+        assert_equal(plan["method"], "SVDFactorization")
+        assert_equal(plan["sparse"], False)
+        assert_raises(ValueError, plan_factorization, A, sparse=False,
+                      method="AugmentedSystem")
+        assert_raises(ValueError, plan_factorization, A, sparse=True,
+                      method="QRFactorization")
+        assert_raises(ValueError, plan_factorization, A, method="LU")
+
 
 class TestOrthogonality(TestCase):
 
@@ -3,12 +3,17 @@ from scipy.sparse import csc_matrix
 from ipsolver._large_scale_constrained.qp_subproblem \
     import (eqp_kktfact,
             projected_cg,
+            projected_gltr,
+            tridiagonal_trust_region,
             box_intersections,
             sphere_intersections,
             box_sphere_intersections,
+            segments_box_sphere_intersections,
             modified_dogleg)
 from ipsolver._large_scale_constrained.projections \
     import projections
+from ipsolver._large_scale_constrained.equality_constrained_sqp \
+    import _cast_operator
 from numpy.testing import (TestCase, assert_array_almost_equal,
                            assert_array_equal, assert_array_less,
                            assert_equal, assert_,
@@ -347,6 +352,32 @@ class TestBoxSphereBoundariesIntersections(TestCase):
         assert_equal(intersect, False)
 
 
+class TestSegmentsBoxSphereIntersections(TestCase):
+
+    def test_compare_with_box_sphere_intersections(self):
+        z = np.array([[1, 1], [1, 1], [1, 1], [3, 0], [0, 0], [0.5, 2]])
+        d = np.array([[-2, 2], [-1, 1], [-4, 4], [0, 1], [0, 0], [1, -1]])
+        lb = np.array([-1, -3])
+        ub = np.array([1, 3])
+        for trust_radius in (2, 10, np.inf):
+            for entire_line in (False, True):
+                ta, tb, intersect = segments_box_sphere_intersections(
+                    z, d, lb, ub, trust_radius, entire_line)
+                for i in range(len(z)):
+                    ta_i, tb_i, intersect_i = box_sphere_intersections(
+                        z[i], d[i], lb, ub, trust_radius, entire_line)
+                    assert_equal(intersect[i], intersect_i)
+                    if intersect_i:
+                        assert_array_almost_equal([ta[i], tb[i]],
+                                                  [ta_i, tb_i])
+
+    def test_tangent_to_sphere(self):
+        ta, tb, intersect = segments_box_sphere_intersections(
+            [[0, 1]], [[1, 0]], [-2, -2], [2, 2], 1)
+        assert_array_equal(intersect, [True])
+        assert_array_almost_equal([ta[0], tb[0]], [0, 0])
+
+
 class TestModifiedDogleg(TestCase):
 
     def test_cauchypoint_equalsto_newtonpoint(self):
@@ -457,6 +488,23 @@ class TestProjectCG(TestCase):
         assert_equal(info["hits_boundary"], False)
         assert_array_almost_equal(x, x_kkt)
 
+    def test_single_precision(self):
+        H = csc_matrix([[6, 2, 1, 3],
+                        [2, 5, 2, 4],
+                        [1, 2, 4, 5],
+                        [3, 4, 5, 7]], dtype=float)
+        A = csc_matrix([[1, 0, 1, 0],
+                        [0, 1, 1, 1]], dtype=float)
+        c = np.array([-2, -3, -3, 1], dtype=np.float32)
+        b = -np.array([3, 0], dtype=np.float32)
+        Z, _, Y = projections(A)
+        x, info = projected_cg(_cast_operator(H, np.float32), c,
+                               _cast_operator(Z, np.float32),
+                               _cast_operator(Y, np.float32), b)
+        x_kkt, _ = eqp_kktfact(H, c, A, b)
+        assert_equal(x.dtype, np.float32)
+        assert_allclose(x, x_kkt, rtol=1e-5)
+
     def test_trust_region_infeasible(self):
         H = csc_matrix([[6, 2, 1, 3],
                         [2, 5, 2, 4],
@@ -647,3 +695,127 @@ class TestProjectCG(TestCase):
         assert_equal(info["stop_cond"], 3)
         assert_equal(info["hits_boundary"], True)
         assert_array_almost_equal(x[2], 100)
+
+    def test_deadline(self):
+        H = csc_matrix([[6, 2, 1, 3],
+                        [2, 5, 2, 4],
+                        [1, 2, 4, 5],
+                        [3, 4, 5, 7]])
+        A = csc_matrix([[1, 0, 1, 0],
+                        [0, 1, 1, 1]])
+        c = np.array([-2, -3, -3, 1])
+        b = -np.array([3, 0])
+        Z, _, Y = projections(A)
+        x, info = projected_cg(H, c, Z, Y, b, tol=0, deadline=0)
+        assert_equal(info["stop_cond"], 5)
+        assert_equal(info["niter"], 0)
+        # The initial point is feasible
+        assert_array_almost_equal(A.dot(x), -b)
+
+
+class TestProjectedGLTR(TestCase):
+
+    def test_compare_with_direct_fact(self):
+        H = csc_matrix([[6, 2, 1, 3],
+                        [2, 5, 2, 4],
+                        [1, 2, 4, 5],
+                        [3, 4, 5, 7]])
+        A = csc_matrix([[1, 0, 1, 0],
+                        [0, 1, 1, 1]])
+        c = np.array([-2, -3, -3, 1])
+        b = -np.array([3, 0])
+        Z, _, Y = projections(A)
+        x, info = projected_gltr(H, c, Z, Y, b, tol=0)
+        x_kkt, _ = eqp_kktfact(H, c, A, b)
+        assert_equal(info["hits_boundary"], False)
+        assert_array_almost_equal(x, x_kkt)
+
+    def test_negative_curvature(self):
+        H = csc_matrix([[1, 2, 1, 3],
+                        [2, 0, 2, 4],
+                        [1, 2, 0, 2],
+                        [3, 4, 2, 0]])
+        A = csc_matrix([[1, 0, 1, 0],
+                        [0, 1, 0, 1]])
+        c = np.array([-2, -3, -3, 1])
+        b = -np.array([3, 0])
+        Z, _, Y = projections(A)
+        trust_radius = 10
+        x, info = projected_gltr(H, c, Z, Y, b,
+                                 tol=0,
+                                 trust_radius=trust_radius)
+        x_cg, _ = projected_cg(H, c, Z, Y, b,
+                               trust_radius=trust_radius)
+        assert_equal(info["hits_boundary"], True)
+        assert_array_almost_equal(np.linalg.norm(x), trust_radius)
+        assert_array_almost_equal(A.dot(x), -b)
+        # Optimality conditions on the null space of ``A``: the
+        # reduced Hessian shifted by the multiplier ``lambda`` of
+        # the trust-region constraint is positive semidefinite and
+        # ``(Z.T H Z + lambda I) w = - Z.T (H x + c)`` holds for
+        # ``x = x0 + Z w``.
+        N = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]])/np.sqrt(2)
+        x0 = Y.dot(-b)
+        w = N.T.dot(x - x0)
+        H_reduced = N.T.dot(H.dot(N))
+        g_reduced = N.T.dot(H.dot(x0) + c)
+        lagr_mult = -w.dot(H_reduced.dot(w) + g_reduced)/w.dot(w)
+        assert_array_almost_equal(H_reduced.dot(w) + lagr_mult*w,
+                                  -g_reduced)
+        assert_(np.all(np.linalg.eigvalsh(H_reduced)
+                       + lagr_mult >= -1e-8))
+
+        def model(x):
+            return 1/2*x.dot(H.dot(x)) + c.dot(x)
+        assert_(model(x) <= model(x_cg))
+
+    def test_active_box_constraints(self):
+        H = csc_matrix([[1, 2, 1, 3],
+                        [2, 0, 2, 4],
+                        [1, 2, 0, 2],
+                        [3, 4, 2, 0]])
+        A = csc_matrix([[1, 0, 1, 0],
+                        [0, 1, 0, 1]])
+        c = np.array([-2, -3, -3, 1])
+        b = -np.array([3, 0])
+        Z, _, Y = projections(A)
+        trust_radius = 1000
+        ub = [np.inf, np.inf, 100, np.inf]
+        x, info = projected_gltr(H, c, Z, Y, b,
+                                 tol=0,
+                                 ub=ub,
+                                 trust_radius=trust_radius)
+        x_cg, _ = projected_cg(H, c, Z, Y, b, tol=0, ub=ub,
+                               trust_radius=trust_radius)
+        assert_equal(info["hits_boundary"], True)
+        assert_array_less(x, np.array(ub) + 1e-8)
+        assert_array_almost_equal(A.dot(x), -b)
+
+        def model(x):
+            return 1/2*x.dot(H.dot(x)) + c.dot(x)
+        assert_(model(x) <= model(x_cg))
+
+    def test_deadline(self):
+        H = csc_matrix([[6, 2, 1, 3],
+                        [2, 5, 2, 4],
+                        [1, 2, 4, 5],
+                        [3, 4, 5, 7]])
+        A = csc_matrix([[1, 0, 1, 0],
+                        [0, 1, 1, 1]])
+        c = np.array([-2, -3, -3, 1])
+        b = -np.array([3, 0])
+        Z, _, Y = projections(A)
+        x, info = projected_gltr(H, c, Z, Y, b, tol=0, deadline=0)
+        assert_equal(info["stop_cond"], 5)
+        assert_equal(info["niter"], 0)
+        assert_array_almost_equal(A.dot(x), -b)
+
+    def test_tridiagonal_hard_case(self):
+        # The gradient is orthogonal to the eigenvector
+        # of the negative eigenvalue.
+        alpha = np.array([1., -2.])
+        beta = np.array([0.])
+        h, on_boundary = tridiagonal_trust_region(alpha, beta, 1., 3.)
+        assert_equal(on_boundary, True)
+        assert_array_almost_equal(np.linalg.norm(h), 3)
+        assert_array_almost_equal(h[0], -1/3)
@@ -0,0 +1,59 @@
+import numpy as np
+from scipy.sparse.linalg import aslinearoperator
+from ipsolver._large_scale_constrained.equality_constrained_sqp \
+    import (IdentityScaling,
+            DiagonalScaling,
+            default_scaling,
+            _scale)
+from ipsolver._large_scale_constrained.tr_interior_point \
+    import BarrierSubproblem
+from numpy.testing import (TestCase, assert_array_equal, assert_equal,
+                           assert_)
+
+
+class TestScaling(TestCase):
+
+    def test_identity_scaling(self):
+        d = np.array([1., 2., 3.])
+        S = default_scaling(d)
+        assert_(isinstance(S, IdentityScaling))
+        assert_equal(S.shape, (3, 3))
+        assert_(S.dot(d) is d)
+        assert_(S.dot(d, out=np.empty(3)) is d)
+
+    def test_diagonal_scaling(self):
+        diagonal = np.array([1., 2., 3.])
+        S = DiagonalScaling(diagonal)
+        assert_equal(S.shape, (3, 3))
+        assert_array_equal(S.dot(np.ones(3)), [1, 2, 3])
+        # The diagonal is not copied
+        diagonal[0] = 5
+        assert_array_equal(S.dot(np.ones(3)), [5, 2, 3])
+        # The product is stored in ``out`` when it is given
+        out = np.empty(3)
+        assert_(S.dot(np.ones(3), out=out) is out)
+        assert_array_equal(out, [5, 2, 3])
+
+    def test_scale(self):
+        d = np.array([1., 2., 3.])
+        out = np.empty(3)
+        S = DiagonalScaling(np.array([2., 2., 2.]))
+        assert_(_scale(S, d, out) is out)
+        assert_array_equal(out, [2, 4, 6])
+        # Operators without ``out`` allocate the product.
+        for S in (aslinearoperator(2*np.eye(3)), 2*np.eye(3)):
+            assert_array_equal(_scale(S, d, out), [2, 4, 6])
+
+    def test_barrier_subproblem_scaling(self):
+        x0 = np.array([1., 2.])
+        s0 = np.array([3., 4.])
+        subprob = BarrierSubproblem(
+            x0, s0, None, None, None, 2, 2, 0, None, None, 0.1, 0.1,
+            np.zeros(2, bool), None, 1e-8, 1.0, np.zeros(2), -s0,
+            np.eye(2), np.empty(0), np.empty((0, 2)))
+        S = subprob.scaling(np.hstack((x0, s0)))
+        assert_array_equal(S.dot(np.ones(4)), [1, 1, 3, 4])
+        # The same object is updated in place
+        S_next = subprob.scaling(np.array([1., 2., 5., 6.]))
+        assert_(S_next is S)
+        assert_array_equal(S.dot(np.ones(4)), [1, 1, 5, 6])
@@ -0,0 +1,67 @@
+import sys
+import numpy as np
+from ipsolver import minimize_constrained
+from ipsolver._large_scale_constrained.tr_interior_point \
+    import BarrierSubproblem
+from ipsolver.tests.test_minimized_constrained import HyperbolicIneq
+from numpy.testing import (TestCase, assert_array_equal, assert_equal,
+                           assert_)
+
+
+class TestBarrierSubproblem(TestCase):
+
+    def test_dense_jacobian(self):
+        x0 = np.array([1., 2., 3.])
+        s0 = np.array([3., 4.])
+        J_ineq0 = np.array([[1., 2., 3.], [4., 5., 6.]])
+        J_eq0 = np.array([[7., 8., 9.]])
+        subprob = BarrierSubproblem(
+            x0, s0, None, None, None, 3, 2, 1, None, None, 0.1, 0.1,
+            np.zeros(2, bool), None, 1e-8, 1.0, np.zeros(3), -s0,
+            J_ineq0, np.zeros(1), J_eq0)
+        assert_array_equal(subprob.jac0, [[7, 8, 9, 0, 0],
+                                          [1, 2, 3, 3, 0],
+                                          [4, 5, 6, 0, 4]])
+        J = subprob._compute_jacobian(2*J_eq0, 2*J_ineq0, 2*s0)
+        assert_array_equal(J, [[14, 16, 18, 0, 0],
+                               [2, 4, 6, 6, 0],
+                               [8, 10, 12, 0, 8]])
+        # The previous jacobian is kept until the next but one call.
+        assert_array_equal(subprob.jac0[:, 3:], [[0, 0], [3, 0], [0, 4]])
+        J_next = subprob._compute_jacobian(J_eq0, J_ineq0, s0)
+        assert_(J_next is subprob.jac0)
+        assert_array_equal(J, [[14, 16, 18, 0, 0],
+                               [2, 4, 6, 6, 0],
+                               [8, 10, 12, 0, 8]])
+        assert_equal(J_next.flags.c_contiguous, True)
+
+
+class TestTrInteriorPoint(TestCase):
+
+    def test_barrier_problems_initial_values(self):
+        # Each barrier problem starts from the barrier function
+        # evaluated with its own barrier parameter.
+        module = sys.modules[
+            "ipsolver._large_scale_constrained.tr_interior_point"]
+        equality_constrained_sqp = module.equality_constrained_sqp
+        barrier_parameters = []
+
+        def checked_sqp(fun_and_constr, grad_and_jac, lagr_hess, z,
+                        fun0, grad0, constr0, jac0, stop_criteria, state,
+                        *args):
+            barrier_parameters.append(state.barrier_parameter)
+            f, b = fun_and_constr(z)
+            assert_equal(fun0, f)
+            assert_array_equal(constr0, b)
+            return equality_constrained_sqp(
+                fun_and_constr, grad_and_jac, lagr_hess, z, fun0, grad0,
+                constr0, jac0, stop_criteria, state, *args)
+
+        prob = HyperbolicIneq()
+        try:
+            module.equality_constrained_sqp = checked_sqp
+            minimize_constrained(prob.fun, prob.x0, prob.grad, prob.hess,
+                                 prob.constr)
+        finally:
+            module.equality_constrained_sqp = equality_constrained_sqp
+        assert_(len(set(barrier_parameters)) > 1)
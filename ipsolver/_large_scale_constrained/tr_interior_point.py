@@ -15,8 +15,9 @@ References
 from __future__ import division, print_function, absolute_import
 import scipy.sparse as spc
 import numpy as np
-from .equality_constrained_sqp import equality_constrained_sqp
-from scipy.sparse.linalg import LinearOperator
+from .equality_constrained_sqp import (equality_constrained_sqp,
+                                       DiagonalScaling)
+from .profiling import NULL_PROFILER
 
 __all__ = ['tr_interior_point']
 
@@ -50,6 +51,10 @@ class BarrierSubproblem:
         self.enforce_feasibility = enforce_feasibility
         self.global_stop_criteria = global_stop_criteria
         self.xtol = xtol
+        # Scaling matrix, updated in place by ``scaling``.
+        self._scaling = DiagonalScaling(np.ones(n_vars + n_ineq))
+        # Buffers for the dense Jacobian, allocated on first use.
+        self._dense_jacobians = None
         self.fun0 = self._compute_function(fun0, constr_ineq0, s0)
         self.grad0 = self._compute_gradient(grad0)
         self.constr0 = self._compute_constr(constr_ineq0, constr_eq0, s0)
@@ -90,7 +95,8 @@ class BarrierSubproblem:
         # to guarantee constraints from `enforce_feasibility`
         # stay feasible along iterations.
         s[self.enforce_feasibility] = -c_ineq[self.enforce_feasibility]
-        log_s = [np.log(s_i) if s_i > 0 else -np.inf for s_i in s]
+        log_s = np.full_like(s, -np.inf)
+        np.log(s, out=log_s, where=s > 0)
         # Compute barrier objective function
         return f - self.barrier_parameter*np.sum(log_s)
 
@@ -100,19 +106,14 @@ class BarrierSubproblem:
                           c_ineq + s))
 
     def scaling(self, z):
-        """Returns scaling vector.
+        """Returns scaling matrix.
         Given by:
-            scaling = [ones(n_vars), s]
+            scaling = diag([ones(n_vars), s])
+        The same `DiagonalScaling` object is updated and returned
+        at every call.
         """
-        s = self.get_slack(z)
-        diag_elements = np.hstack((np.ones(self.n_vars), s))
-
-        # Diagonal Matrix
-        def matvec(vec):
-            return diag_elements*vec
-        return LinearOperator((self.n_vars+self.n_ineq,
-                               self.n_vars+self.n_ineq),
-                              matvec)
+        self._scaling.diagonal[self.n_vars:] = self.get_slack(z)
+        return self._scaling
 
     def gradient_and_jacobian(self, z):
         """Returns scaled gradient.
@@ -151,16 +152,30 @@ class BarrierSubproblem:
                 J_ineq = spc.csr_matrix(J_ineq)
                 return self._assemble_sparse_jacobian(J_eq, J_ineq, s)
             else:
-                S = np.diag(s)
-                zeros = np.zeros((self.n_eq, self.n_ineq))
-                # Convert to matrix
-                if spc.issparse(J_ineq):
-                    J_ineq = J_ineq.toarray()
-                if spc.issparse(J_eq):
-                    J_eq = J_eq.toarray()
-                # Concatenate matrices
-                return np.asarray(np.bmat([[J_eq, zeros],
-                                           [J_ineq, S]]))
+                return self._assemble_dense_jacobian(J_eq, J_ineq, s)
+
+    def _assemble_dense_jacobian(self, J_eq, J_ineq, s):
+        """Assemble dense jacobian given its components.
+
+        Given ``J_eq``, ``J_ineq`` and ``s`` returns:
+            jacobian = [ J_eq,     0     ]
+                       [ J_ineq, diag(s) ]
+
+        The jacobian is written to one of two preallocated buffers,
+        used alternately, and only the blocks ``J_eq``, ``J_ineq`` and
+        the diagonal ``s`` are updated. Hence the returned array is
+        overwritten by the next but one call.
+        """
+        n_vars, n_ineq, n_eq = self.n_vars, self.n_ineq, self.n_eq
+        if self._dense_jacobians is None:
+            shape = (n_eq + n_ineq, n_vars + n_ineq)
+            self._dense_jacobians = [np.zeros(shape), np.zeros(shape)]
+        J = self._dense_jacobians[0]
+        self._dense_jacobians.reverse()
+        J[:n_eq, :n_vars] = J_eq
+        J[n_eq:, :n_vars] = J_ineq
+        np.fill_diagonal(J[n_eq:, n_vars:], s)
+        return J
 
     def _assemble_sparse_jacobian(self, J_eq, J_ineq, s):
         """Assemble sparse jacobian given its components.
@@ -221,6 +236,7 @@ class BarrierSubproblem:
 
     def lagrangian_hessian(self, z, v):
         """Returns scaled Lagrangian Hessian"""
+        from scipy.sparse.linalg import LinearOperator  # imported on first use
         # Compute Hessian in relation to x and s
         Hx = self.lagrangian_hessian_x(z, v)
         if self.n_ineq > 0:
@@ -238,7 +254,7 @@ class BarrierSubproblem:
                 return Hx.dot(vec_x)
         return LinearOperator((self.n_vars+self.n_ineq,
                                self.n_vars+self.n_ineq),
-                              matvec)
+                              matvec, dtype=float)
 
     def stop_criteria(self, state):
         """Stop criteria to the barrier problem.
@@ -261,7 +277,17 @@ def tr_interior_point(fun, grad, lagr_hess, n_vars, n_ineq, n_eq,
                       initial_penalty=1.0,
                       initial_trust_radius=1.0,
                       return_all=False,
-                      factorization_method=None):
+                      factorization_method=None,
+                      profiler=NULL_PROFILER,
+                      deadline=None,
+                      hessian_refresh_every=1,
+                      hessian_refresh_xtol=np.inf,
+                      hessian_refresh_vtol=np.inf,
+                      factorization_reuse_tol=0,
+                      dtype=None,
+                      tangential_solver='cg',
+                      nonmonotone_memory=1,
+                      resume=None):
     """Trust-region interior points method.
 
     Solve problem:
@@ -269,6 +295,14 @@ def tr_interior_point(fun, grad, lagr_hess, n_vars, n_ineq, n_eq,
         subject to: constr_ineq(x) <= 0
                     constr_eq(x) = 0
     using trust-region interior point method described in [1]_.
+    The SQP iterations of each barrier problem start from the values
+    of the barrier function, and of its gradient, computed with the
+    barrier parameter of that problem.
+
+    When ``resume`` is given, an interrupted execution is continued
+    from the slack variables ``resume['s']`` and the values of
+    ``'barrier_parameter'``, ``'tolerance'``, ``'trust_radius'`` and
+    ``'penalty'`` it contains, instead of the initial ones.
     """
     # BOUNDARY_PARAMETER controls the decrease on the slack
     # variables. Represents ``tau`` from [1]_ p.885, formula (3.18).
@@ -290,8 +324,15 @@ def tr_interior_point(fun, grad, lagr_hess, n_vars, n_ineq, n_eq,
     state.penalty = initial_penalty
     state.optimality = np.inf
     state.constr_violation = np.inf
+    penalty = initial_penalty
     # Define initial value for the slack variables
     s0 = np.maximum(-1.5*constr_ineq0, np.ones(n_ineq))
+    if resume is not None:
+        state.barrier_parameter = resume["barrier_parameter"]
+        state.tolerance = resume["tolerance"]
+        state.trust_radius = resume["trust_radius"]
+        penalty = resume["penalty"]
+        s0 = resume["s"]
     # Define barrier subproblem
     subprob = BarrierSubproblem(
         x0, s0, fun, grad, lagr_hess, n_vars, n_ineq, n_eq, constr, jac,
@@ -319,9 +360,15 @@ def tr_interior_point(fun, grad, lagr_hess, n_vars, n_ineq, n_eq,
             # to update this parameters.
             state.barrier_parameter *= BARRIER_DECAY_RATIO
             state.tolerance *= BARRIER_DECAY_RATIO
-        first_barrier_prob = False
         # Update Barrier Problem
         subprob.update(state.barrier_parameter, state.tolerance)
+        if not first_barrier_prob:
+            # Compute initial values for the new barrier problem,
+            # with the updated barrier parameter.
+            fun0_subprob, constr0_subprob \
+                = subprob.function_and_constraints(z)
+            grad0_subprob, jac0_subprob = subprob.gradient_and_jacobian(z)
+        first_barrier_prob = False
         # Solve SQP subproblem
         state = equality_constrained_sqp(
             subprob.function_and_constraints,
@@ -329,27 +376,26 @@ def tr_interior_point(fun, grad, lagr_hess, n_vars, n_ineq, n_eq,
             subprob.lagrangian_hessian,
             z, fun0_subprob, grad0_subprob,
             constr0_subprob, jac0_subprob, subprob.stop_criteria,
-            state, trust_lb, trust_ub, initial_penalty,
+            state, trust_lb, trust_ub, penalty,
             state.trust_radius, subprob.scaling, return_all,
-            factorization_method)
+            factorization_method, profiler, deadline,
+            hessian_refresh_every, hessian_refresh_xtol,
+            hessian_refresh_vtol, factorization_reuse_tol, dtype,
+            tangential_solver, nonmonotone_memory)
         z = state.x
+        penalty = initial_penalty
         if stop_criteria(state):
             break
-        # Compute initial values for next iteration
-        fun0_subprob, constr0_subprob = subprob.function_and_constraints(z)
-        grad0_subprob, jac0_subprob = subprob.gradient_and_jacobian(z)
 
     # Get x and s
     state.x = subprob.get_variables(z)
     state.s = subprob.get_slack(z)
-    # Return all
+    # Return all. Slicing the array of iterates returns
+    # views, so no additional copy is made.
     if return_all:
-        allvecs = []
-        allslack = []
-        for z in state.allvecs:
-            allvecs += [subprob.get_variables(z)]
-            allslack += [subprob.get_slack(z)]
-        state.allvecs = allvecs
-        state.allslack = allslack
+        allvecs = state.allvecs.to_array()
+        state.allvecs = allvecs[:, :subprob.n_vars]
+        state.allslack = allvecs[:, subprob.n_vars:]
+        state.allmult = state.allmult.to_array()
 
     return state
@@ -0,0 +1,68 @@
+"""Caching of function evaluations."""
+
+from __future__ import division, print_function, absolute_import
+from collections import OrderedDict
+import numpy as np
+
+__all__ = ['LRUMemoize', 'MemoizeJac', 'DEFAULT_CACHE_SIZE', 'point_key']
+
+
+# Enough for the current point, the trial point and the second
+# order correction point of an iteration.
+DEFAULT_CACHE_SIZE = 4
+
+
+def point_key(x):
+    """Key identifying ``x``: its raw bytes (hashed by the dictionary)."""
+    x = np.asarray(x)
+    return x.dtype.char, x.shape, np.ascontiguousarray(x).tobytes()
+
+
+class LRUMemoize:
+    """Cache the latest evaluations of a function.
+
+    The values of ``function`` at the ``maxsize`` most recently used
+    points are stored, so evaluating the function again at any of
+    those points does not call ``function``. The cached values are
+    returned without being copied.
+    """
+    def __init__(self, function, maxsize=DEFAULT_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("``maxsize`` should be positive.")
+        self.function = function
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, x):
+        key = point_key(x)
+        try:
+            # Reinsert to mark it as the most recently used.
+            value = self.cache.pop(key)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            value = self.function(x)
+            if len(self.cache) >= self.maxsize:
+                self.cache.popitem(last=False)
+        self.cache[key] = value
+        return value
+
+
+class MemoizeJac:
+    """Split a function returning ``(value, derivative)`` in two.
+
+    ``fun(x)`` and ``fun.derivative(x)`` return the value and the
+    derivative computed by a single call to the original function,
+    which is only repeated for points not among the ``maxsize``
+    most recently used.
+    """
+    def __init__(self, fun, maxsize=DEFAULT_CACHE_SIZE):
+        self.fun = LRUMemoize(fun, maxsize)
+
+    def __call__(self, x):
+        return self.fun(x)[0]
+
+    def derivative(self, x):
+        return self.fun(x)[1]
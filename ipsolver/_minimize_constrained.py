@@ -2,102 +2,103 @@ from __future__ import division, print_function, absolute_import
 import numpy as np
 from ._constraints import (NonlinearConstraint,
                            LinearConstraint,
-                           BoxConstraint)
+                           BoxConstraint,
+                           initialize_constraint)
 from ._canonical_constraint import (lagrangian_hessian,
                                     to_canonical,
-                                    empty_canonical_constraint)
+                                    empty_canonical_constraint,
+                                    convert_jacobian)
 from ._large_scale_constrained import (tr_interior_point,
                                        equality_constrained_sqp)
+from ._large_scale_constrained.projections import plan_factorization
+from ._large_scale_constrained.profiling import (SolverProfiler,
+                                                 NULL_PROFILER)
+from ._recorders import (PrintRecorder, IterateHistory,
+                         SQP_FIELDS, IP_FIELDS)
 from warnings import warn
-from copy import deepcopy
-from scipy.sparse.linalg import LinearOperator
+from timeit import default_timer
 import scipy.sparse as spc
+import sys
 import time
-from scipy.optimize import OptimizeResult
+try:
+    import resource
+except ImportError:
+    resource = None
 from ._numdiff import approx_derivative
+from ._memoize import LRUMemoize, MemoizeJac, DEFAULT_CACHE_SIZE
+from ._checkpoint import save_checkpoint, load_checkpoint, COUNTERS
 
 
 TERMINATION_MESSAGES = {
     0: "The maximum number of function evaluations is exceeded.",
     1: "`gtol` termination condition is satisfied.",
     2: "`xtol` termination condition is satisfied.",
-    3: "`callback` function requested termination"
+    3: "`callback` function requested termination",
+    4: "The time limit `max_time` is reached.",
+    5: "The maximum number of function evaluations `max_nfev` is reached.",
+    6: "The maximum number of Jacobian evaluations `max_njev` is reached.",
+    7: "The memory budget `max_memory` is reached."
 }
 
 
-class Memoize:
-    "Memoize decorator, used to avoid repeated calls to the same function."
-    def __init__(self, x0, f0):
-        self._x = x0
-        self._f = f0
-
-    def __call__(self, function):
-        def new_function(x):
-            if not np.array_equal(x, self._x):
-                self._x = x
-                self._f = function(x)
-            return self._f
-        return new_function
-
-
-class sqp_printer:
-    @staticmethod
-    def print_header():
-        print("|{0:^7}|{1:^7}|{2:^7}|{3:^10}|{4:^10}|{5:^10}|{6:^10}|"
-              .format("niter", "f evals", "CG iter", "tr radius", "penalty",
-                      "opt", "c viol"))
-        s = "-"*6 + ":"
-        s2 = ":" + "-"*8 + ":"
-        print("|{0:^7}|{1:^7}|{2:^7}|{3:^10}|{4:^10}|{5:^10}|{6:^10}|"
-              .format(s, s, s, s2, s2, s2, s2))
-
-    @staticmethod
-    def print_problem_iter(niter, nfev, cg_niter, tr_radius,
-                           penalty, opt, c_viol):
-        print("|{0:>7}|{1:>7}|{2:>7}| {3:^1.2e} | {4:^1.2e} |"
-              " {5:^1.2e} | {6:^1.2e} |"
-              .format(niter, nfev, cg_niter, tr_radius, penalty,
-                      opt, c_viol))
-
-    @staticmethod
-    def print_footer():
-        print("")
-        print((7*3 + 10*4 + 8)*"-")
-        print("")
-
-
-class ip_printer:
-    @staticmethod
-    def print_header():
-        print("|{0:^7}|{1:^7}|{2:^7}|{3:^13}|{4:^10}|{5:^10}|{6:^10}|{7:^10}|"
-              .format("niter", "f evals", "CG iter", "barrier param",
-                      "tr radius", "penalty", "opt", "c viol"))
-        s = "-"*6 + ":"
-        s2 = ":" + "-"*11 + ":"
-        s3 = ":" + "-"*8 + ":"
-        print("|{0:^7}|{1:^7}|{2:^7}|{3:^13}|{4:^10}|{5:^10}|{6:^10}|{7:^10}|"
-              .format(s, s, s, s2, s3, s3, s3, s3))
-
-    @staticmethod
-    def print_problem_iter(niter, nfev, cg_niter, barrier_parameter, tr_radius,
-                           penalty, opt, c_viol):
-        print("|{0:>7}|{1:>7}|{2:>7}|   {3:^1.2e}  | "
-              "{4:^1.2e} | {5:^1.2e} | {6:^1.2e} | {7:^1.2e} |"
-              .format(niter, nfev, cg_niter, barrier_parameter,
-                      tr_radius, penalty, opt, c_viol))
-
-    @staticmethod
-    def print_footer():
-        print("")
-        print((7*3 + 13 + 10*4 + 9)*"-")
-        print("")
+def memory_usage():
+    """Return the peak memory (resident set size) used by the
+    process in bytes or None if it cannot be determined."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes on Linux.
+    return usage if sys.platform == 'darwin' else 1024*usage
+
+
+class BestIterate:
+    """Keep a copy of the best iterate found along the iterations.
+
+    An iterate is better than other if it has a smaller constraint
+    violation or, when both constraint violations are smaller than
+    ``tol``, if it has a smaller objective function.
+    """
+    def __init__(self, tol, n_vars=None):
+        self.tol = tol
+        self.n_vars = n_vars
+        self.key = None
+
+    def update(self, state):
+        if self.n_vars is None:
+            f = state.fun
+        else:
+            # Recover the objective function from the barrier function.
+            s = state.x[self.n_vars:]
+            f = state.fun + state.barrier_parameter*np.sum(np.log(s))
+        key = (max(state.constr_violation, self.tol), f)
+        if self.key is None or key < self.key:
+            self.key = key
+            self.x = np.copy(state.x)
+            self.v = np.copy(state.v)
+            self.fun = state.fun
+            self.optimality = state.optimality
+            self.constr_violation = state.constr_violation
+
+    def restore(self, result):
+        if self.key is None:
+            return
+        if self.n_vars is None:
+            result.x = self.x
+        else:
+            result.x = self.x[:self.n_vars]
+            result.s = self.x[self.n_vars:]
+        result.v = self.v
+        result.fun = self.fun
+        result.optimality = self.optimality
+        result.constr_violation = self.constr_violation
 
 
 def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
                          method=None, xtol=1e-8, gtol=1e-8,
                          sparse_jacobian=None, options={},
                          callback=None, max_iter=1000,
-                         verbose=0):
+                         verbose=0, recorder=None, resume_from=None,
+                         hessp=None):
     """Minimize scalar function subject to constraints.
 
     Parameters
@@ -111,12 +112,19 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
     x0 : ndarray, shape (n,)
         Initial guess. Array of real elements of size (n,),
         where ``n`` is the number of independent variables.
-    grad : callable
+    grad : {callable, True}
         Gradient of the objective function:
 
             grad(x) -> array_like, shape (n,)
 
-        where x is an array with shape (n,).
+        where x is an array with shape (n,). If True, ``fun`` is
+        assumed to return both the objective function and the gradient:
+
+            fun(x) -> float, array_like, shape (n,)
+
+        which is cheaper when they share intermediate computations.
+        The last evaluation is cached, so the gradient at a point
+        accepted by the algorithm does not require a new call to ``fun``.
     hess : {callable, '2-point', '3-point', 'cs', None}, optional
         Method for computing the Hessian matrix. The keywords
         select a finite difference scheme for numerical
@@ -163,9 +171,13 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
     sparse_jacobian : {bool, None}
         The algorithm uses a sparse representation of the Jacobian if True
         and a dense representation if False. When sparse_jacobian is None
-        the algorithm uses the more convenient option, using a sparse
-        representation if at least one of the constraint Jacobians are sparse
-        and a dense representation when they are all dense arrays.
+        the representation follows from the option ``factorization_method``
+        and, when it is not given either, both are chosen by estimating
+        the cost of each factorization method from the shape and the
+        number of nonzeros of the Jacobian at ``x0``. Large Jacobians with
+        few nonzeros per column are then sparse and the others dense.
+        The choice and its estimated memory are returned in the field
+        ``factorization_plan`` and displayed when ``verbose=2``.
     options : dict, optional
         A dictionary of solver options. Available options include:
 
@@ -184,8 +196,24 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
                 'tr_interior_point' method. By defaut uses 0.1,
                 as suggested in [1]_ immediatly after algorithm III, p. 19.
             return_all : bool, optional
-                When True return the list of all vectors
-                through the iterations.
+                When True return all vectors through the
+                iterations. They are stored in preallocated
+                arrays, see the fields ``allvecs``, ``allslack``
+                and ``allmult``.
+            history_size : int, optional
+                When ``return_all`` is True, keep only the
+                vectors of the latest ``history_size`` iterations.
+                By default all of them are kept.
+            history_every : int, optional
+                When ``return_all`` is True, keep only the vectors
+                of one every ``history_every`` iterations.
+                By default is 1.
+            history_file : str, optional
+                When ``return_all`` is True, store the vectors in
+                memory-mapped files named ``history_file + '.allvecs'``
+                and ``history_file + '.allmult'`` rather than in
+                memory. Appropriate for runs that would not fit in
+                memory.
             factorization_method : string, optional
                 Method used for factorizing the jacobian matrix.
                 Should be one of:
@@ -213,16 +241,124 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
 
                 The factorization methods 'NormalEquation' and
                 'AugmentedSystem' should be used only when
-                ``sparse_jacobian=True``. They usually provide
-                similar results. The methods 'QRFactorization'
+                ``sparse_jacobian`` is True or None. They usually
+                provide similar results. The methods 'QRFactorization'
                 and 'SVDFactorization' should be used when
-                ``sparse_jacobian=False``. By default uses
-                'QRFactorization' for  dense matrices.
+                ``sparse_jacobian`` is False or None. By default the
+                method with the smallest estimated cost is used, see
+                ``sparse_jacobian``: 'SVDFactorization' when there
+                are more constraints than variables, 'NormalEquation'
+                or 'AugmentedSystem' for large sparse Jacobians and
+                'QRFactorization' otherwise.
                 The 'SVDFactorization' method can cope
                 with Jacobian matrices with deficient row
                 rank and will be used whenever other
                 factorization methods fails (which may
                 imply the conversion to a dense format).
+            factorization_reuse_tol : float, optional
+                Reuse the factorization of the constraint Jacobian
+                while its relative change (in the Frobenius norm)
+                since the latest factorization does not exceed
+                ``factorization_reuse_tol``. The projections are then
+                computed by iterative refinement, which is cheaper
+                than a new factorization for mildly nonlinear
+                constraints. A tiny value (e.g., 1e-12) only reuses
+                the factorization of unchanged Jacobians, e.g., of
+                linear constraints. By default is 0, i.e., the
+                Jacobian is factorized at every iteration, without
+                being compared with the previous one.
+            dtype : data-type, optional
+                Precision of the projected CG iterations computing the
+                tangential step, e.g., ``np.float32``. Single precision
+                halves the memory traffic of the CG iterations for very
+                large problems. The factorizations, projections, normal
+                step and merit function tests remain in double
+                precision, and so does the tangential step once the
+                optimality drops below ``sqrt(np.finfo(dtype).eps)``,
+                in order to reach full accuracy. By default uses
+                double precision throughout.
+            tangential_solver : {'cg', 'gltr'}, optional
+                Method used to compute the tangential step:
+
+                - 'cg': Projected conjugate gradient (Steihaug's
+                   method), which stops on the trust-region boundary
+                   when a direction of negative curvature is found.
+                - 'gltr': Projected generalized Lanczos trust-region
+                   method, which continues past negative curvature
+                   and returns a nearly optimal step on the
+                   trust-region boundary. It may reduce the number of
+                   iterations on nonconvex problems, at the price of
+                   storing the Lanczos vectors.
+
+                By default uses 'cg'.
+            nonmonotone_memory : int, optional
+                Accept the trial points that sufficiently reduce the
+                largest merit function among the latest
+                ``nonmonotone_memory`` accepted iterates, instead of
+                the merit function at the current iterate. Allowing
+                the merit function to increase temporarily accepts
+                some of the steps the monotone test would reject,
+                although the savings are usually small. Small
+                values (e.g., 2 or 3) are recommended. By default
+                is 1, i.e., the merit function decreases at every
+                iteration.
+            hessian_refresh_every : int, optional
+                Evaluate the Lagrangian Hessian at least once every
+                ``hessian_refresh_every`` accepted steps, reusing the
+                previous one otherwise. Useful when the Hessian is
+                expensive to evaluate. By default is 1, i.e., the
+                Hessian is evaluated after every accepted step.
+            hessian_refresh_xtol : float, optional
+                Evaluate the Lagrangian Hessian whenever the norm of
+                the change of ``x`` since its latest evaluation
+                exceeds ``hessian_refresh_xtol``, regardless of
+                ``hessian_refresh_every``. By default is infinity.
+            hessian_refresh_vtol : float, optional
+                Same as ``hessian_refresh_xtol``, but for the change
+                of the Lagrange multipliers. By default is infinity.
+            cache_size : int, optional
+                Number of points at which the latest evaluations of
+                the objective function, gradient, constraints and
+                Jacobian matrices are kept, so they are never evaluated
+                twice at the same point (e.g., after a rejected second
+                order correction or by the finite difference Hessian
+                approximation). When 0 the evaluations are not cached.
+                By default is 4.
+            max_time : float, optional
+                Time limit in seconds. Checked after each
+                iteration and during the CG iterations.
+                By default there is no time limit.
+            max_nfev : int, optional
+                Maximum number of objective function evaluations.
+                The algorithm terminates after the iteration in
+                which the number of evaluations reaches
+                ``max_nfev``. By default there is no limit.
+            max_njev : int, optional
+                Maximum number of constraint Jacobian evaluations.
+                The algorithm terminates after the iteration in
+                which the number of evaluations reaches
+                ``max_njev``. By default there is no limit.
+            max_memory : float, optional
+                Approximate memory budget in bytes. The algorithm
+                terminates when the peak memory used by the process
+                exceeds ``max_memory``. Requires the module `resource`
+                (not available on Windows). By default there is
+                no memory budget.
+            profile : bool, optional
+                When True record the wall time spent on each
+                phase of the algorithm and the number of times
+                the projection operators are applied. The
+                recorded values are returned in the field
+                ``profile``. By default is False.
+            checkpoint_file : str, optional
+                Periodically save the state of the algorithm
+                to the file ``checkpoint_file`` (in the NumPy
+                ``.npz`` format), from which an interrupted
+                execution can be resumed, see ``resume_from``.
+                By default no checkpoint is saved.
+            checkpoint_every : int, optional
+                Save a checkpoint once every ``checkpoint_every``
+                iterations. By default is 1.
 
     callback : callable, optional
         Called after each iteration:
@@ -231,7 +367,12 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
 
         If callback returns True the algorithm execution is terminated.
         ``state`` is an `OptimizeResult` object, with the same fields
-        as the ones from the return.
+        as the ones from the return. The arrays of ``state`` may be
+        reused by the algorithm: in particular, for the
+        'tr_interior_point' method with dense Jacobians, ``state.jac``
+        is one of two buffers written alternately, so it is overwritten
+        after two more Jacobian evaluations. Copy the fields to keep
+        them beyond the call.
     max_iter : int, optional
         Maximum number of algorithm iterations. By default ``max_iter=1000``
     verbose : {0, 1, 2}, optional
@@ -241,6 +382,50 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
             * 1 : display a termination report.
             * 2 : display progress during iterations.
 
+    recorder : {IterationRecorder, list of IterationRecorder, None}
+        Recorders receiving the state of the algorithm at each
+        iteration. Available recorders are:
+
+            - `ArrayRecorder` : keeps the records in memory
+              in one array per field.
+            - `CSVRecorder` : writes the records to a CSV file.
+            - `JSONLinesRecorder` : writes the records to a file
+              in the JSON lines format.
+            - `LoggingRecorder` : emits the records as `logging`
+              messages.
+
+        The recorded fields are ``niter``, ``nfev``, ``cg_niter``,
+        ``trust_radius``, ``penalty``, ``optimality`` and
+        ``constr_violation``, plus ``barrier_parameter`` for
+        the 'tr_interior_point' method. By default no recorder is used.
+    resume_from : str, optional
+        Checkpoint file, saved using the option ``checkpoint_file``,
+        from which to continue an interrupted execution. The problem
+        and the options should be the same as in the interrupted
+        execution; ``x0`` is ignored. The iterates, multipliers,
+        trust radius, penalty, barrier parameter and counters are
+        restored, so with the default options the algorithm continues
+        exactly as it would have without the interruption. The fields
+        ``allvecs``, ``allslack`` and ``allmult`` only contain the
+        iterates after the resumption. When the options
+        ``hessian_refresh_every`` or ``factorization_reuse_tol`` are
+        used, the Lagrangian Hessian and the factorization are
+        computed again at the resumed iterate. The merit values used
+        by the option ``nonmonotone_memory`` are not saved either, so
+        when it is greater than 1 the nonmonotone test restarts from
+        the resumed iterate and the execution may differ from the
+        uninterrupted one.
+    hessp : callable, optional
+        Product of the Hessian matrix of the objective function
+        with an arbitrary vector:
+
+            hessp(x, p) -> array_like, shape (n,)
+
+        where x and p are arrays with shape (n,). When given, the
+        Hessian matrix is never formed, ``hessp`` is called once
+        for every product required by the algorithm, and ``hess``
+        is ignored.
+
     Returns
     -------
     `OptimizeResult` with the following fields defined:
@@ -263,6 +448,17 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
         Lagrangian Hessian is evaluated the objective function
         Hessian and the constraints Hessians are evaluated
         one time each.
+    nhev_skipped : int
+        Number of accepted steps after which the previous Lagrangian
+        Hessian was reused rather than evaluated, according to the
+        options ``hessian_refresh_every``, ``hessian_refresh_xtol``
+        and ``hessian_refresh_vtol``.
+    nfactor : int
+        Total number of factorizations of the constraint Jacobian.
+    nfactor_reused : int
+        Number of times the latest factorization was reused rather
+        than computing a new one, according to the option
+        ``factorization_reuse_tol``.
     ncev : int
         Total number of constraint evaluations. The same couter
         is used for equality and inequality constraints, because
@@ -283,13 +479,41 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
                 1. Iteration limit was reached;
                 2. Reached the trust-region boundary;
                 3. Negative curvature detected;
-                4. Tolerance was satisfied.
+                4. Tolerance was satisfied;
+                5. Time limit was reached.
 
             - 'hits_boundary' : True if the proposed step is on the boundary
               of the trust region.
 
     execution_time : float
         Total execution time.
+    allvecs : ndarray, shape (n_records, n)
+        Only present when the option ``return_all`` is True. The iterates
+        ``x``, one per row, in chronological order.
+    allslack : ndarray, shape (n_records, n_ineq)
+        Only present when the option ``return_all`` is True and
+        the method is 'tr_interior_point'. The slack variables
+        at each iterate.
+    allmult : ndarray, shape (n_records, n_ineq + n_eq)
+        Only present when the option ``return_all`` is True. Estimated
+        Lagrange multipliers at each iterate.
+    profile : Dict
+        Only present when the option ``profile`` is True. Dictionary
+        containing:
+
+            - 'time' : Dictionary with the wall time (in seconds)
+              spent on each phase. The phases are: 'fun', 'grad',
+              'constr', 'jac' and 'hess' (user functions); 'factorization'
+              (computation of the projections); 'normal_step'
+              (``modified_dogleg``); 'tangential_step' (``projected_cg``);
+              'merit' (evaluation of the merit function at trial points)
+              and 'soc' (second order corrections). Times are inclusive,
+              e.g. 'merit' includes the time spent on 'fun' and 'constr'.
+            - 'count' : Dictionary with the number of calls to each user
+              function, the number of applications of the projection
+              operators ('Z', 'LS' and 'Y'), the number of 'factorizations'
+              and of iterative 'refinement_steps'.
+
     trust_radius : float
         Trust radius at the last iteration.
     penalty : float
@@ -300,18 +524,45 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
     barrier_parameter : float
         Barrier parameter at the last iteration. Exclusive for
         'tr_interior_point'.
-    status : {0, 1, 2, 3}
+    status : {0, 1, 2, 3, 4, 5, 6, 7}
         Termination status:
 
             * 0 : The maximum number of function evaluations is exceeded.
             * 1 : `gtol` termination condition is satisfied.
             * 2 : `xtol` termination condition is satisfied.
             * 3 : `callback` function requested termination.
+            * 4 : The time limit ``max_time`` is reached.
+            * 5 : The maximum number of function evaluations
+              ``max_nfev`` is reached.
+            * 6 : The maximum number of Jacobian evaluations
+              ``max_njev`` is reached.
+            * 7 : The memory budget ``max_memory`` is reached.
+
+        When the status is 4, 5, 6 or 7 the fields ``x``, ``s``,
+        ``v``, ``fun``, ``optimality`` and ``constr_violation``
+        refer to the best iterate found so far: the one with the
+        smallest objective function among the iterates with
+        constraint violation smaller than ``gtol`` or, if there is
+        none, the one with the smallest constraint violation.
 
     message : str
         Termination message.
     method : {'equality_constrained_sqp', 'tr_interior_point'}
         Optimization method used.
+    factorization_plan : Dict
+        Representation and factorization method of the Jacobian
+        matrix, see ``sparse_jacobian``. Dictionary containing:
+
+            - 'sparse' : True if the Jacobian is sparse.
+            - 'method' : The ``factorization_method``.
+            - 'shape', 'nnz' : Shape and number of nonzeros of the
+              factorized matrix at ``x0`` (including the slack
+              variables for the 'tr_interior_point' method).
+            - 'flops', 'memory' : Estimated flops and bytes of memory
+              of one factorization.
+            - 'estimates' : Dictionary with the estimated flops and
+              bytes of memory of each factorization method.
+
     constr_violation : float
         Constraint violation at last iteration.
     optimality : float
@@ -336,7 +587,7 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
         matrix of the equality constraint evaluated at the solution and
         for the tr_interior_point' method his is scaled augmented Jacobian
         matrix, defined as ``\hat(A)`` in equation (19.36), reference [2]_,
-        p. 581.
+        p. 581. See ``callback`` about its lifetime during the iterations.
 
     Notes
     -----
@@ -370,7 +621,60 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
            constrained optimization." SIAM Journal on
            Optimization 8.3 (1998): 682-706.
     """
+    # Options that are not passed to the solvers
+    options = dict(options)
+    history_size = options.pop("history_size", None)
+    history_every = options.pop("history_every", 1)
+    history_file = options.pop("history_file", None)
+    max_time = options.pop("max_time", None)
+    max_nfev = options.pop("max_nfev", None)
+    max_njev = options.pop("max_njev", None)
+    max_memory = options.pop("max_memory", None)
+    if max_memory is not None and resource is None:
+        warn("The option ``max_memory`` requires the module "
+             "`resource` and will be ignored.")
+        max_memory = None
+    checkpoint_file = options.pop("checkpoint_file", None)
+    checkpoint_every = options.pop("checkpoint_every", 1)
+    if options.pop("profile", False):
+        profiler = SolverProfiler()
+    else:
+        profiler = NULL_PROFILER
+    cache_size = options.pop("cache_size", DEFAULT_CACHE_SIZE)
+
+    def memoize(function):
+        if cache_size > 0:
+            return LRUMemoize(function, cache_size)
+        return function
+
+    if grad is True:
+        fun = MemoizeJac(profiler.wrap("fun", fun), max(cache_size, 1))
+        grad = fun.derivative
+    else:
+        fun = memoize(profiler.wrap("fun", fun))
+        grad = memoize(profiler.wrap("grad", grad))
+    if hessp is not None:
+        hessp = profiler.wrap("hess", hessp)
+    elif callable(hess):
+        hess = profiler.wrap("hess", hess)
+
     # Initial value
+    if resume_from is not None:
+        checkpoint = load_checkpoint(resume_from)
+        if method is None:
+            method = checkpoint["method"]
+        elif method != checkpoint["method"]:
+            raise ValueError("The checkpoint was saved by the method "
+                             "'{0}'.".format(checkpoint["method"]))
+        if np.size(checkpoint["x"]) != np.size(x0):
+            raise ValueError("The checkpoint does not match the number "
+                             "of variables of the problem.")
+        x0 = checkpoint["x"]
+        if method == 'equality_constrained_sqp':
+            options["initial_trust_radius"] = checkpoint["trust_radius"]
+            options["initial_penalty"] = checkpoint["penalty"]
+        else:
+            options["resume"] = checkpoint
     x0 = np.atleast_1d(x0).astype(float)
     n_vars = np.size(x0)
 
@@ -379,20 +683,18 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
     g0 = np.atleast_1d(grad(x0))
 
     # Define Gradient
-    if hess in ('2-point', '3-point', 'cs'):
-        # Need to memoize gradient wrapper in order
-        # to avoid repeated calls that occur
-        # when using finite differences.
-        @Memoize(x0, g0)
-        def grad_wrapped(x):
-            return np.atleast_1d(grad(x))
-
-    else:
-        def grad_wrapped(x):
-            return np.atleast_1d(grad(x))
+    def grad_wrapped(x):
+        return np.atleast_1d(grad(x))
 
     # Check Hessian
-    if callable(hess):
+    from scipy.sparse.linalg import LinearOperator  # imported on first use
+    if hessp is not None:
+        def hess_wrapped(x):
+            def matvec(p):
+                return np.asarray(hessp(x, p), dtype=float).reshape(-1)
+            return LinearOperator((n_vars, n_vars), matvec, dtype=float)
+
+    elif callable(hess):
         H0 = hess(x0)
 
         if spc.issparse(H0):
@@ -426,47 +728,120 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
                                 LinearConstraint,
                                 BoxConstraint)):
         constraints = [constraints]
-    # Copy, evaluate and initialize constraints
-    copied_constraints = [deepcopy(constr) for constr in constraints]
-    for constr in copied_constraints:
-        x0 = constr.evaluate_and_initialize(x0, sparse_jacobian)
+    # Evaluate and initialize (copies of the) constraints
+    initialized_constraints = []
+    for constr in constraints:
+        constr, x0 = initialize_constraint(constr, x0, sparse_jacobian)
+        initialized_constraints.append(constr)
     # Concatenate constraints
-    if len(copied_constraints) == 0:
+    if len(initialized_constraints) == 0:
         constr = empty_canonical_constraint(x0, n_vars, sparse_jacobian)
     else:
-        constr = to_canonical(copied_constraints)
+        constr = to_canonical(initialized_constraints)
+
+    # Choose appropriate method
+    if method is None:
+        if constr.n_ineq == 0:
+            method = 'equality_constrained_sqp'
+        else:
+            method = 'tr_interior_point'
+
+    # Choose the representation of the Jacobian and the method
+    # factorizing it, unless both are given.
+    if method == 'tr_interior_point':
+        # The barrier subproblems have Jacobian [J_eq, 0; J_ineq, S].
+        if spc.issparse(constr.J_eq0):
+            J0 = spc.vstack((constr.J_eq0, constr.J_ineq0))
+        else:
+            J0 = np.vstack((constr.J_eq0, constr.J_ineq0))
+        n_slack = constr.n_ineq
+    else:
+        J0 = constr.J_eq0
+        n_slack = 0
+    plan = plan_factorization(J0, n_slack, sparse_jacobian,
+                              options.get("factorization_method"))
+    if plan["sparse"] != spc.issparse(constr.J_eq0):
+        constr = convert_jacobian(constr, plan["sparse"])
+    options["factorization_method"] = plan["method"]
+    if verbose >= 2:
+        print("Factorization: '{0}' of a {1} {2}x{3} Jacobian with {4} "
+              "nonzeros, estimated memory: {5:.3g} MB."
+              .format(plan["method"],
+                      "sparse" if plan["sparse"] else "dense",
+                      plan["shape"][0], plan["shape"][1], plan["nnz"],
+                      plan["memory"]/2**20))
+
+    constr.constr = memoize(profiler.wrap("constr", constr.constr))
+    constr.jac = memoize(profiler.wrap("jac", constr.jac))
 
     # Generate Lagrangian hess function
     lagr_hess = lagrangian_hessian(constr, hess_wrapped)
 
-    # Construct OptimizeResult
+    # Construct OptimizeResult. SciPy's optimize module is slow
+    # to import, hence it is only imported once it is needed.
+    from scipy.optimize import OptimizeResult
     state = OptimizeResult(niter=0, nfev=1, ngev=1,
-                           ncev=1, njev=1, nhev=0,
+                           ncev=1, njev=1, nhev=0, nhev_skipped=0,
+                           nfactor=0, nfactor_reused=0,
                            cg_niter=0, cg_info={})
+    if resume_from is not None:
+        for name in COUNTERS:
+            state[name] = checkpoint[name]
+        # The iteration at which the checkpoint was saved is
+        # counted again when the solver starts.
+        state.niter -= 1
     # Store values
     return_all = options.get("return_all", False)
     if return_all:
-        state.allvecs = []
-        state.allmult = []
+        state.allvecs = IterateHistory(
+            history_size, history_every,
+            None if history_file is None else history_file + ".allvecs")
+        state.allmult = IterateHistory(
+            history_size, history_every,
+            None if history_file is None else history_file + ".allmult")
+
+    # Iteration recorders
+    if recorder is None:
+        recorders = []
+    elif isinstance(recorder, (list, tuple)):
+        recorders = list(recorder)
+    else:
+        recorders = [recorder]
+    if verbose >= 2:
+        recorders.append(PrintRecorder())
 
-    # Choose appropriate method
-    if method is None:
-        if constr.n_ineq == 0:
-            method = 'equality_constrained_sqp'
-        else:
-            method = 'tr_interior_point'
+    # Budget limits
+    if method == 'equality_constrained_sqp':
+        best_iterate = BestIterate(gtol)
+    else:
+        best_iterate = BestIterate(gtol, n_vars)
+    limited = (max_time is not None or max_nfev is not None
+               or max_njev is not None or max_memory is not None)
+    deadline = None
+
+    def budget_status(state):
+        if limited:
+            best_iterate.update(state)
+        if deadline is not None and default_timer() > deadline:
+            return 4
+        elif max_nfev is not None and state.nfev >= max_nfev:
+            return 5
+        elif max_njev is not None and state.njev >= max_njev:
+            return 6
+        elif max_memory is not None and memory_usage() > max_memory:
+            return 7
+        return None
+
+    def write_checkpoint(state):
+        if (checkpoint_file is not None
+                and state.niter % checkpoint_every == 0):
+            save_checkpoint(checkpoint_file, state, method, n_vars)
 
     # Define stop criteria
     if method == 'equality_constrained_sqp':
         def stop_criteria(state):
-            if verbose >= 2:
-                sqp_printer.print_problem_iter(state.niter,
-                                               state.nfev,
-                                               state.cg_niter,
-                                               state.trust_radius,
-                                               state.penalty,
-                                               state.optimality,
-                                               state.constr_violation)
+            for rec in recorders:
+                rec.record(state)
             state.status = None
             if (callback is not None) and callback(state):
                 state.status = 3
@@ -476,19 +851,15 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
                 state.status = 2
             elif state.niter > max_iter:
                 state.status = 0
-            return state.status in (0, 1, 2, 3)
+            else:
+                state.status = budget_status(state)
+            write_checkpoint(state)
+            return state.status is not None
     elif method == 'tr_interior_point':
         def stop_criteria(state):
             barrier_tol = options.get("barrier_tol", 1e-8)
-            if verbose >= 2:
-                ip_printer.print_problem_iter(state.niter,
-                                              state.nfev,
-                                              state.cg_niter,
-                                              state.barrier_parameter,
-                                              state.trust_radius,
-                                              state.penalty,
-                                              state.optimality,
-                                              state.constr_violation)
+            for rec in recorders:
+                rec.record(state)
             state.status = None
             if (callback is not None) and callback(state):
                 state.status = 3
@@ -499,61 +870,73 @@ def minimize_constrained(fun, x0, grad, hess='2-point', constraints=(),
                 state.status = 2
             elif state.niter > max_iter:
                 state.status = 0
-            return state.status in (0, 1, 2, 3)
+            else:
+                state.status = budget_status(state)
+            write_checkpoint(state)
+            return state.status is not None
 
-    if verbose >= 2:
-        if method == 'equality_constrained_sqp':
-            sqp_printer.print_header()
-        if method == 'tr_interior_point':
-            ip_printer.print_header()
+    fields = SQP_FIELDS if method == 'equality_constrained_sqp' else IP_FIELDS
+    for rec in recorders:
+        rec.start(method, fields)
 
     start_time = time.time()
-    # Call inferior function to do the optimization
-    if method == 'equality_constrained_sqp':
-        if constr.n_ineq > 0:
-            raise ValueError("'equality_constrained_sqp' does not "
-                             "support inequality constraints.")
-
-        def fun_and_constr(x):
-            f = fun(x)
-            _, c_eq = constr.constr(x)
-            return f, c_eq
-
-        def grad_and_jac(x):
-            g = grad_wrapped(x)
-            _, J_eq = constr.jac(x)
-            return g, J_eq
-
-        result = equality_constrained_sqp(
-            fun_and_constr, grad_and_jac, lagr_hess,
-            x0, f0, g0, constr.c_eq0, constr.J_eq0,
-            stop_criteria, state, **options)
-
-    elif method == 'tr_interior_point':
-        if constr.n_ineq == 0:
-            warn("The problem only has equality constraints. "
-                 "The solver 'equality_constrained_sqp' is a "
-                 "better choice for those situations.")
-        result = tr_interior_point(
-            fun, grad_wrapped, lagr_hess,
-            n_vars, constr.n_ineq, constr.n_eq,
-            constr.constr, constr.jac,
-            x0, f0, g0, constr.c_ineq0, constr.J_ineq0,
-            constr.c_eq0, constr.J_eq0, stop_criteria,
-            constr.enforce_feasibility,
-            xtol, state, **options)
-    else:
-        raise ValueError("Unknown optimization ``method``.")
+    if max_time is not None:
+        deadline = default_timer() + max_time
+    try:
+        # Call inferior function to do the optimization
+        if method == 'equality_constrained_sqp':
+            if constr.n_ineq > 0:
+                raise ValueError("'equality_constrained_sqp' does not "
+                                 "support inequality constraints.")
+
+            def fun_and_constr(x):
+                f = fun(x)
+                _, c_eq = constr.constr(x)
+                return f, c_eq
+
+            def grad_and_jac(x):
+                g = grad_wrapped(x)
+                _, J_eq = constr.jac(x)
+                return g, J_eq
+
+            result = equality_constrained_sqp(
+                fun_and_constr, grad_and_jac, lagr_hess,
+                x0, f0, g0, constr.c_eq0, constr.J_eq0,
+                stop_criteria, state, profiler=profiler,
+                deadline=deadline, **options)
+            if return_all:
+                result.allvecs = result.allvecs.to_array()
+                result.allmult = result.allmult.to_array()
+
+        elif method == 'tr_interior_point':
+            if constr.n_ineq == 0:
+                warn("The problem only has equality constraints. "
+                     "The solver 'equality_constrained_sqp' is a "
+                     "better choice for those situations.")
+            result = tr_interior_point(
+                fun, grad_wrapped, lagr_hess,
+                n_vars, constr.n_ineq, constr.n_eq,
+                constr.constr, constr.jac,
+                x0, f0, g0, constr.c_ineq0, constr.J_ineq0,
+                constr.c_eq0, constr.J_eq0, stop_criteria,
+                constr.enforce_feasibility,
+                xtol, state, profiler=profiler,
+                deadline=deadline, **options)
+        else:
+            raise ValueError("Unknown optimization ``method``.")
+    finally:
+        for rec in recorders:
+            rec.close()
 
     result.execution_time = time.time() - start_time
+    if profiler is not NULL_PROFILER:
+        result.profile = profiler.report()
+    if result.status in (4, 5, 6, 7):
+        best_iterate.restore(result)
     result.method = method
+    result.factorization_plan = plan
     result.message = TERMINATION_MESSAGES[result.status]
 
-    if verbose >= 2:
-        if method == 'equality_constrained_sqp':
-            sqp_printer.print_footer()
-        if method == 'tr_interior_point':
-            ip_printer.print_footer()
     if verbose >= 1:
         print(result.message)
         print("Number of iteractions: {0}, function evaluations: {1}, "
@@ -0,0 +1,215 @@
+"""Asynchronous interface to `minimize_constrained`.
+
+The solver itself runs in a worker thread of an executor given by the
+caller, which it occupies until it finishes. The coroutine callables
+provided by the user are scheduled back on the event loop that awaits
+the solver, so a single loop can drive many solves at the same time
+and keep many evaluations in flight.
+"""
+
+from __future__ import division, print_function, absolute_import
+import asyncio
+import inspect
+import numpy as np
+from ._constraints import NonlinearConstraint, LinearConstraint, BoxConstraint
+from ._memoize import point_key
+from ._minimize_constrained import minimize_constrained
+
+__all__ = ['minimize_constrained_async']
+
+
+FINITE_DIFFERENCES = ('2-point', '3-point', 'cs')
+
+
+def _is_async(function):
+    return (inspect.iscoroutinefunction(function)
+            or inspect.iscoroutinefunction(getattr(function, "__call__",
+                                                   None)))
+
+
+class _BridgedFunction:
+    """Coroutine function called from the solver thread.
+
+    Its ``map`` method evaluates it at many points concurrently, with
+    a single ``asyncio.gather``, and is used by `approx_derivative` for
+    the perturbed points of the finite differences.
+    """
+    def __init__(self, bridge, function, call=None):
+        self.bridge = bridge
+        self.function = function
+        self.call = call
+
+    def __call__(self, *args):
+        if self.call is not None:
+            return self.call(*args)
+        return self.bridge.run(self.function(*args))
+
+    async def gather(self, points, args, kwargs):
+        return await asyncio.gather(*[self.function(x, *args, **kwargs)
+                                      for x in points])
+
+    def map(self, points, *args, **kwargs):
+        """Values at all the ``points``, evaluated concurrently."""
+        return self.bridge.run(self.gather(points, args, kwargs))
+
+
+class _EvaluationGroup:
+    """Coroutine callables always evaluated at the same points.
+
+    The first time one of them is needed at a new point all of them
+    are evaluated there concurrently, with ``asyncio.gather``, and the
+    values are kept until a different point is requested.
+    """
+    def __init__(self, bridge):
+        self.bridge = bridge
+        self.functions = []
+        self.key = None
+        self.values = None
+
+    def add(self, function):
+        self.functions.append(function)
+        index = len(self.functions) - 1
+
+        def call(x):
+            return self.evaluate(x)[index]
+        return _BridgedFunction(self.bridge, function, call)
+
+    async def gather(self, x):
+        return await asyncio.gather(*[function(x)
+                                      for function in self.functions])
+
+    def evaluate(self, x):
+        key = point_key(x)
+        if key != self.key:
+            # The solver may modify ``x`` while the coroutines run.
+            x = np.array(x)
+            self.values = self.bridge.run(self.gather(x))
+            self.key = key
+        return self.values
+
+
+class _Bridge:
+    """Run coroutines on ``loop`` from the solver thread."""
+    def __init__(self, loop):
+        self.loop = loop
+        self.cancelled = False
+
+    def run(self, coroutine):
+        if self.cancelled:
+            coroutine.close()
+            raise asyncio.CancelledError()
+        return asyncio.run_coroutine_threadsafe(coroutine,
+                                                self.loop).result()
+
+    def wrap(self, function):
+        if not _is_async(function):
+            return function
+        return _BridgedFunction(self, function)
+
+
+def _derivative_kind(hess):
+    # Finite-difference Hessians evaluate the derivatives at the
+    # same perturbed points when they use the same scheme.
+    if isinstance(hess, str) and hess in FINITE_DIFFERENCES:
+        return hess
+    return None
+
+
+async def minimize_constrained_async(fun, x0, grad, hess='2-point',
+                                     constraints=(), *, executor,
+                                     **kwargs):
+    """Minimize scalar function subject to constraints, asynchronously.
+
+    Coroutine version of `minimize_constrained`. Any of ``fun``,
+    ``grad``, ``hess``, ``hessp`` and the ``fun``, ``jac``, ``hess``
+    and ``hessp`` of the `NonlinearConstraint` objects may be coroutine
+    functions (``async def``), the others are called as usual.
+
+    The independent evaluations are issued concurrently:
+
+        - the objective function and all the constraints at every
+          trial point (including the second-order correction point);
+        - the gradient and all the constraint Jacobians at every
+          accepted point, and at the perturbed points of the
+          finite-difference Hessian approximations whenever the
+          objective and the constraints use the same scheme.
+
+    Parameters
+    ----------
+    fun, x0, grad, hess, constraints
+        Same as in `minimize_constrained`.
+    executor : `concurrent.futures.Executor`
+        Executor running the solver. Each solve holds one of its
+        workers until it finishes, so it should have at least as many
+        workers as the solves running at the same time, e.g., a
+        ``ThreadPoolExecutor(max_workers=n_solves)``. Otherwise the
+        remaining solves wait for a free worker.
+    **kwargs
+        Remaining arguments of `minimize_constrained`.
+
+    Returns
+    -------
+    `OptimizeResult` returned by `minimize_constrained`.
+
+    Notes
+    -----
+    The solver is not a coroutine itself: it runs in a thread of
+    ``executor`` and blocks that thread while it waits for the
+    evaluations it needs. Only the evaluations run on the event loop,
+    hence the coroutines should not block it.
+    When the task awaiting the result is cancelled the solver stops
+    at its next evaluation.
+
+    The coroutine functions reach the solver as callables with a
+    ``map`` method, with which `approx_derivative` evaluates all the
+    perturbed points of a finite-difference derivative concurrently.
+    The finite-difference Hessians of the solver are linear operators,
+    whose products are requested one at a time by the CG iterations,
+    so their perturbed points are evaluated one after the other.
+    """
+    bridge = _Bridge(asyncio.get_running_loop())
+    values = _EvaluationGroup(bridge)
+    derivatives = {}
+
+    def add_derivative(function, hess):
+        kind = _derivative_kind(hess)
+        if kind not in derivatives:
+            derivatives[kind] = _EvaluationGroup(bridge)
+        return derivatives[kind].add(function)
+
+    if _is_async(fun):
+        fun = values.add(fun)
+    if _is_async(grad):
+        grad = add_derivative(grad, hess)
+    hess = bridge.wrap(hess)
+    if "hessp" in kwargs:
+        kwargs["hessp"] = bridge.wrap(kwargs["hessp"])
+
+    if isinstance(constraints, (NonlinearConstraint,
+                                LinearConstraint,
+                                BoxConstraint)):
+        constraints = [constraints]
+    wrapped_constraints = []
+    for constr in constraints:
+        if isinstance(constr, NonlinearConstraint):
+            constr_fun = constr._fun
+            if _is_async(constr_fun):
+                constr_fun = values.add(constr_fun)
+            jac = constr._jac
+            if _is_async(jac):
+                jac = add_derivative(jac, constr._hess)
+            constr = NonlinearConstraint(constr_fun, constr.kind, jac,
+                                         bridge.wrap(constr._hess),
+                                         constr.enforce_feasibility,
+                                         bridge.wrap(constr._hessp))
+        wrapped_constraints.append(constr)
+
+    def solve():
+        return minimize_constrained(fun, x0, grad, hess,
+                                    wrapped_constraints, **kwargs)
+
+    try:
+        return await bridge.loop.run_in_executor(executor, solve)
+    except asyncio.CancelledError:
+        bridge.cancelled = True
+        raise
@@ -0,0 +1,163 @@
+from __future__ import division, print_function, absolute_import
+import numpy as np
+import time
+from ._large_scale_constrained.batched_sqp import (
+    batched_equality_constrained_sqp)
+
+__all__ = ['minimize_constrained_batch']
+
+
+def minimize_constrained_batch(fun, x0, grad, hess=None, constr=None,
+                               jac=None, constr_hess=None, xtol=1e-8,
+                               gtol=1e-8, options={}, max_iter=1000):
+    """Minimize a batch of small equality-constrained problems in lockstep.
+
+    Solve ``k`` structurally identical problems:
+
+        minimize fun(x[k])
+        subject to: constr(x[k]) = 0
+
+    advancing all of them simultaneously with the 'equality_constrained_sqp'
+    method. Every callable is evaluated on stacked arrays, one row per
+    problem, so the per-iteration Python overhead is shared among the
+    whole batch. Intended for many (thousands) of small dense problems.
+
+    Parameters
+    ----------
+    fun : callable
+        The objective function to be minimized:
+
+            fun(x) -> array_like, shape (k,)
+
+        where x is an array with shape (k, n). Only the rows of the
+        problems still being iterated are passed, hence ``k`` can be
+        smaller than the batch size.
+    x0 : ndarray, shape (k, n)
+        Initial guess for each problem of the batch.
+    grad : callable
+        Gradient of the objective function:
+
+            grad(x) -> array_like, shape (k, n)
+
+    hess : {callable, None}, optional
+        Hessian of the objective function:
+
+            hess(x) -> array_like, shape (k, n, n)
+
+        When None it considers the Hessian is filled with zeros.
+    constr : {callable, None}, optional
+        Equality constraints ``constr(x) = 0``:
+
+            constr(x) -> array_like, shape (k, m)
+
+        When None the problems are unconstrained.
+    jac : {callable, None}
+        Jacobian matrix of the constraints. Required if ``constr``
+        is given:
+
+            jac(x) -> array_like, shape (k, m, n)
+
+    constr_hess : {callable, None}, optional
+        Hessian matrix of `dot(constr, v)`:
+
+            constr_hess(x, v) -> array_like, shape (k, n, n)
+
+        where v is an array with shape (k, m). When None it considers
+        the Hessian is filled with zeros.
+    xtol : float, optional
+        Tolerance for termination by the trust-region radius.
+        Default is 1e-8.
+    gtol : float, optional
+        Tolerance for termination by the norm of the Lagrangian gradient
+        and by the constraint violation. Default is 1e-8.
+    options : dict, optional
+        A dictionary of solver options. Available options include:
+
+            initial_trust_radius: float
+                Initial trust-region radius. By defaut uses 1.0.
+            initial_penalty : float
+                Initial penalty for merit function. By defaut uses 1.0.
+
+    max_iter : int, optional
+        Maximum number of algorithm iterations for each problem.
+        By default ``max_iter=1000``.
+
+    Returns
+    -------
+    `OptimizeResult` with the same fields of `minimize_constrained`
+    for the 'equality_constrained_sqp' method, stacked along the first
+    dimension (``x`` has shape (k, n), ``niter`` and ``status`` have
+    shape (k,), ...). ``message`` is a list with one message per
+    problem and ``cg_stop_cond`` contains the reason for termination
+    of the latest CG iteration of each problem.
+
+    Notes
+    -----
+    The projections are computed using the SVD factorization of the
+    stacked Jacobian matrices and, unlike `minimize_constrained`, no
+    finite-difference Hessian approximation is available.
+    """
+    x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+    n_batch, n_vars = np.shape(x0)
+
+    def fun_and_constr(x):
+        f = np.atleast_1d(np.asarray(fun(x), dtype=float))
+        if constr is None:
+            return f, np.empty((len(x), 0))
+        return f, np.asarray(constr(x), dtype=float).reshape(len(x), -1)
+
+    def grad_and_jac(x):
+        g = np.asarray(grad(x), dtype=float).reshape(len(x), n_vars)
+        if constr is None:
+            return g, np.empty((len(x), 0, n_vars))
+        J = np.asarray(jac(x), dtype=float).reshape(len(x), -1, n_vars)
+        return g, J
+
+    def lagr_hess(x, v):
+        H = np.zeros((len(x), n_vars, n_vars))
+        if hess is not None:
+            H += np.asarray(hess(x), dtype=float)
+        if constr_hess is not None and np.size(v) > 0:
+            H += np.asarray(constr_hess(x, v), dtype=float)
+        return H
+
+    if constr is not None and jac is None:
+        raise ValueError("``jac`` is required when ``constr`` is given.")
+
+    # Evaluate initial point
+    f0, c0 = fun_and_constr(x0)
+    g0, J0 = grad_and_jac(x0)
+
+    # Construct OptimizeResult. SciPy's optimize module is slow
+    # to import, hence it is only imported once it is needed, as
+    # is `minimize_constrained` for its termination messages.
+    from scipy.optimize import OptimizeResult
+    from ._minimize_constrained import TERMINATION_MESSAGES
+    def counter(value):
+        return np.full(n_batch, value, dtype=int)
+    state = OptimizeResult(niter=counter(0), nfev=counter(1),
+                           ngev=counter(1), ncev=counter(1),
+                           njev=counter(1), nhev=counter(0),
+                           cg_niter=counter(0), cg_stop_cond=counter(0),
+                           status=counter(-1))
+
+    def stop_criteria(state):
+        status = np.full(n_batch, -1, dtype=int)
+        # Conditions are set in reverse order of precedence.
+        status[state.niter > max_iter] = 0
+        status[state.trust_radius < xtol] = 2
+        status[(state.optimality < gtol)
+               & (state.constr_violation < gtol)] = 1
+        # Stopped problems keep their termination status.
+        stopped = state.status >= 0
+        state.status = np.where(stopped, state.status, status)
+        return state.status >= 0
+
+    start_time = time.time()
+    result = batched_equality_constrained_sqp(
+        fun_and_constr, grad_and_jac, lagr_hess, x0, f0, g0, c0, J0,
+        stop_criteria, state, **options)
+    result.execution_time = time.time() - start_time
+    result.method = 'equality_constrained_sqp'
+    result.message = [TERMINATION_MESSAGES[s] for s in result.status]
+    return result
@@ -5,9 +5,7 @@ from __future__ import division
 import numpy as np
 from numpy.linalg import norm
 
-from scipy.sparse.linalg import LinearOperator
 from scipy.sparse import issparse, csc_matrix, csr_matrix, coo_matrix, find
-from scipy.optimize._group_columns import group_dense, group_sparse
 
 EPS = np.finfo(np.float64).eps
 
@@ -165,6 +163,7 @@ def group_columns(A, order=0):
 
     A = A[:, order]
 
+    from scipy.optimize._group_columns import group_dense, group_sparse
     if issparse(A):
         groups = group_sparse(m, n, A.indices, A.indptr)
     else:
@@ -191,6 +190,10 @@ def approx_derivative(fun, x0, method='3-point', rel_step=None, f0=None,
         Function of which to estimate the derivatives. The argument x
         passed to this function is ndarray of shape (n,) (never a scalar
         even if n=1). It must return 1-d array_like of shape (m,) or a scalar.
+        If `fun` has a ``map`` method, ``fun.map(points, *args, **kwargs)``
+        should return the list of values at all the ``points`` and is used
+        to evaluate all the perturbed points at once (e.g. in parallel)
+        when `as_linear_operator` is False.
     x0 : array_like of shape (n,) or float
         Point at which to estimate the derivatives. Float will be converted
         to a 1-d array.
@@ -344,13 +347,16 @@ def approx_derivative(fun, x0, method='3-point', rel_step=None, f0=None,
         raise ValueError("Bounds not supported when "
                          "`as_linear_operator` is True.")
 
-    def fun_wrapped(x):
-        f = np.atleast_1d(fun(x, *args, **kwargs))
+    def check_value(f):
+        f = np.atleast_1d(f)
         if f.ndim > 1:
             raise RuntimeError("`fun` return value has "
                                "more than 1 dimension.")
         return f
 
+    def fun_wrapped(x):
+        return check_value(fun(x, *args, **kwargs))
+
     if f0 is None:
         f0 = fun_wrapped(x0)
     else:
@@ -380,8 +386,9 @@ def approx_derivative(fun, x0, method='3-point', rel_step=None, f0=None,
             use_one_sided = False
 
         if sparsity is None:
-            return _dense_difference(fun_wrapped, x0, f0, h,
-                                     use_one_sided, method)
+            def difference(fun):
+                return _dense_difference(fun, x0, f0, h,
+                                         use_one_sided, method)
         else:
             if not issparse(sparsity) and len(sparsity) == 2:
                 structure, groups = sparsity
@@ -395,9 +402,36 @@ def approx_derivative(fun, x0, method='3-point', rel_step=None, f0=None,
                 structure = np.atleast_2d(structure)
 
             groups = np.atleast_1d(groups)
-            return _sparse_difference(fun_wrapped, x0, f0, h,
-                                      use_one_sided, structure,
-                                      groups, method)
+
+            def difference(fun):
+                return _sparse_difference(fun, x0, f0, h,
+                                          use_one_sided, structure,
+                                          groups, method)
+
+        if hasattr(fun, "map"):
+            def fun_map(points):
+                return [check_value(f)
+                        for f in fun.map(points, *args, **kwargs)]
+            return _batch_difference(difference, fun_map, f0)
+        return difference(fun_wrapped)
+
+
+def _batch_difference(difference, fun_map, f0):
+    """Compute ``difference(fun)`` evaluating all the points requested
+    by it with a single call to ``fun_map(points)``.
+
+    The points are found by running ``difference`` with a function that
+    only records them, which is cheap compared with the evaluations.
+    """
+    points = []
+
+    def record(x):
+        points.append(x)
+        return f0
+
+    difference(record)
+    values = iter(fun_map(points))
+    return difference(lambda x: next(values))
 
 
 def _linear_operator_difference(fun, x0, f0, h, method):
@@ -438,7 +472,10 @@ def _linear_operator_difference(fun, x0, f0, h, method):
     else:
         raise RuntimeError("Never be here.")
 
-    return LinearOperator((m, n), matvec)
+    # Given, so the LinearOperator does not call ``matvec`` to find it.
+    dtype = float if method == 'cs' else np.result_type(f0, float)
+    from scipy.sparse.linalg import LinearOperator  # imported on first use
+    return LinearOperator((m, n), matvec, dtype=dtype)
 
 
 def _dense_difference(fun, x0, f0, h, use_one_sided, method):
@@ -572,6 +609,10 @@ def check_derivative(fun, jac, x0, bounds=(-np.inf, np.inf), args=(),
         Function of which to estimate the derivatives. The argument x
         passed to this function is ndarray of shape (n,) (never a scalar
         even if n=1). It must return 1-d array_like of shape (m,) or a scalar.
+        If `fun` has a ``map`` method, ``fun.map(points, *args, **kwargs)``
+        should return the list of values at all the ``points`` and is used
+        to evaluate all the perturbed points at once (e.g. in parallel)
+        when `as_linear_operator` is False.
     jac : callable
         Function which computes Jacobian matrix of `fun`. It must work with
         argument x the same way as `fun`. The return value must be array_like
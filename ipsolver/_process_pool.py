@@ -0,0 +1,383 @@
+"""Evaluation of functions in a pool of worker processes.
+
+The functions registered in a `ProcessPool` run in persistent
+subprocesses, so a model that crashes, leaks or holds the GIL does not
+take the solver down with it. The arrays (and the arrays of sparse
+matrices) going to and coming from the workers are written to
+``multiprocessing.shared_memory`` blocks, owned by the parent process,
+instead of being pickled through the pipes, which only carry a short
+description of the message.
+"""
+
+from __future__ import division, print_function, absolute_import
+from collections import deque
+import multiprocessing
+from multiprocessing import connection, resource_tracker
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    raise ImportError("ProcessPool requires Python 3.8 or newer "
+                      "(multiprocessing.shared_memory).")
+import traceback
+from timeit import default_timer
+import numpy as np
+import scipy.sparse as spc
+
+__all__ = ['ProcessPool']
+
+
+# Arrays are stored in the shared memory at offsets multiple of it.
+ALIGNMENT = 64
+# Seconds between checks of whether a busy worker is still alive.
+POLL_INTERVAL = 0.05
+
+
+def _encode(obj, arrays):
+    """Description of ``obj`` with its arrays replaced by their
+    indices in the list ``arrays``, to which they are appended."""
+    if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+        arrays.append(obj)
+        return ("array", len(arrays) - 1)
+    elif spc.issparse(obj):
+        obj = spc.csr_matrix(obj)
+        return ("csr", obj.shape, _encode(obj.data, arrays),
+                _encode(obj.indices, arrays), _encode(obj.indptr, arrays))
+    elif isinstance(obj, (tuple, list)):
+        return (type(obj).__name__, [_encode(item, arrays) for item in obj])
+    elif isinstance(obj, dict):
+        return ("dict", [(key, _encode(value, arrays))
+                         for key, value in obj.items()])
+    else:
+        return ("object", obj)
+
+
+def _decode(description, arrays):
+    """Inverse of `_encode`."""
+    kind = description[0]
+    if kind == "array":
+        return arrays[description[1]]
+    elif kind == "csr":
+        shape, data, indices, indptr = description[1:]
+        return spc.csr_matrix((_decode(data, arrays),
+                               _decode(indices, arrays),
+                               _decode(indptr, arrays)), shape=shape)
+    elif kind == "tuple":
+        return tuple(_decode(item, arrays) for item in description[1])
+    elif kind == "list":
+        return [_decode(item, arrays) for item in description[1]]
+    elif kind == "dict":
+        return {key: _decode(value, arrays)
+                for key, value in description[1]}
+    else:
+        return description[1]
+
+
+def _layout(arrays):
+    """Dtype, shape and offset of each array, stored one after the
+    other, and the number of bytes needed."""
+    layout = []
+    size = 0
+    for a in arrays:
+        layout.append((a.dtype.str, a.shape, size))
+        size += -(-a.nbytes//ALIGNMENT)*ALIGNMENT
+    return layout, size
+
+
+def _write(buffer, arrays, layout):
+    for a, (dtype, shape, offset) in zip(arrays, layout):
+        np.ndarray(shape, dtype, buffer, offset)[...] = a
+
+
+def _read(buffer, layout):
+    arrays = []
+    for dtype, shape, offset in layout:
+        a = np.ndarray(shape, dtype, buffer, offset)
+        a.flags.writeable = False
+        arrays.append(a)
+    return arrays
+
+
+def _attach(buffers, slot, name):
+    """Attach (once) the shared memory block ``name`` to ``slot``."""
+    shm = buffers.get(slot)
+    if shm is not None and shm.name == name:
+        return shm
+    if shm is not None:
+        try:
+            shm.close()
+        except BufferError:
+            # The function kept a reference to one of its arguments.
+            pass
+    shm = shared_memory.SharedMemory(name=name)
+    buffers[slot] = shm
+    return shm
+
+
+def _worker_main(functions, conn):
+    buffers = {}
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        index, in_name, in_layout, description, out_name = message
+        args = kwargs = result = None
+        arrays = []
+        if in_layout:
+            arrays = _read(_attach(buffers, "in", in_name).buf, in_layout)
+        try:
+            args, kwargs = _decode(description, arrays)
+            result = functions[index](*args, **kwargs)
+            arrays = []
+            description = _encode(result, arrays)
+            layout, size = _layout(arrays)
+            if out_name is not None:
+                out = _attach(buffers, "out", out_name)
+                if size <= out.size:
+                    _write(out.buf, arrays, layout)
+                    arrays = None
+            reply = ("ok", description, layout, arrays, size)
+        except Exception as e:
+            reply = ("error", e, traceback.format_exc())
+        # Release the views of the shared memory.
+        del args, kwargs, result, arrays
+        try:
+            conn.send(reply)
+        except Exception:
+            conn.send(("error", None, traceback.format_exc()))
+        del reply
+
+
+class _WorkerDied(RuntimeError):
+    pass
+
+
+class _Worker:
+    """A worker process and the shared memory blocks it reads the
+    arguments from and writes the results to."""
+    def __init__(self, context):
+        self.context = context
+        self.process = None
+        self.conn = None
+        self.n_functions = 0
+        self.in_shm = None
+        self.out_shm = None
+        self.start_time = None
+
+    def start(self, functions):
+        self.stop()
+        # The workers should share the resource tracker of this process,
+        # otherwise their own trackers unlink the shared memory blocks
+        # they attached to when they exit.
+        resource_tracker.ensure_running()
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main,
+                                            args=(functions, child_conn),
+                                            daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.n_functions = len(functions)
+
+    def stop(self, timeout=1.0):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+
+    def release(self):
+        for shm in (self.in_shm, self.out_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self.in_shm = None
+        self.out_shm = None
+
+    def _resize(self, shm, size):
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    def submit(self, index, args, kwargs):
+        arrays = []
+        description = _encode((args, kwargs), arrays)
+        layout, size = _layout(arrays)
+        if size > 0:
+            if self.in_shm is None or self.in_shm.size < size:
+                self.in_shm = self._resize(self.in_shm, size)
+            _write(self.in_shm.buf, arrays, layout)
+        in_name = self.in_shm.name if self.in_shm is not None else None
+        out_name = self.out_shm.name if self.out_shm is not None else None
+        self.conn.send((index, in_name, layout, description, out_name))
+        self.start_time = default_timer()
+
+    def result(self):
+        try:
+            message = self.conn.recv()
+        except (EOFError, OSError):
+            raise _WorkerDied()
+        if message[0] == "error":
+            _, error, formatted_traceback = message
+            if error is None:
+                raise RuntimeError("Evaluation in the worker process "
+                                   "failed:\n" + formatted_traceback)
+            raise error
+        _, description, layout, arrays, size = message
+        if arrays is None:
+            # Copied, the next evaluation overwrites the shared memory.
+            arrays = [np.array(a) for a in _read(self.out_shm.buf, layout)]
+        elif size > 0:
+            # Large enough for the next results of the same size.
+            self.out_shm = self._resize(self.out_shm, size)
+        return _decode(description, arrays)
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class _RemoteFunction:
+    """Function evaluated by the workers of a `ProcessPool`."""
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+
+    def __call__(self, *args, **kwargs):
+        return self.pool._run([(self.index, args, kwargs)])[0]
+
+    def map(self, points, *args, **kwargs):
+        """Values at all the ``points``, evaluated by all the workers."""
+        return self.pool._run([(self.index, (x,) + args, kwargs)
+                               for x in points])
+
+
+class ProcessPool:
+    """Pool of worker processes evaluating functions.
+
+    The functions returned by `function` can be passed to
+    `minimize_constrained` (as the objective, its derivatives or the
+    functions of a `NonlinearConstraint`) and to `approx_derivative`,
+    which uses their ``map`` method to distribute the perturbed
+    points among the workers.
+
+    Parameters
+    ----------
+    n_workers : int, optional
+        Number of worker processes. Default is 1.
+    max_retries : int, optional
+        Number of times an evaluation is repeated, after restarting
+        the worker, when the worker process dies or takes longer than
+        ``timeout``. Default is 1.
+    timeout : float, optional
+        Maximum time, in seconds, taken by a single evaluation.
+        By default there is no limit.
+    context : str, optional
+        The ``multiprocessing`` start method. With 'spawn' and
+        'forkserver' the functions should be picklable.
+
+    Attributes
+    ----------
+    n_restarts : int
+        Number of times a worker was restarted after dying or timing out.
+
+    Notes
+    -----
+    The workers are started on the first evaluation and are restarted
+    when new functions are registered. The arrays received by the
+    functions are read-only views of the shared memory, valid only
+    during the call. Use the pool as a context manager, or call
+    `close`, to stop the workers and release the shared memory.
+    """
+    def __init__(self, n_workers=1, max_retries=1, timeout=None,
+                 context=None):
+        if n_workers < 1:
+            raise ValueError("``n_workers`` should be positive.")
+        self.context = multiprocessing.get_context(context)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.functions = []
+        self.workers = [_Worker(self.context) for _ in range(n_workers)]
+        self.n_restarts = 0
+
+    def function(self, function):
+        """Return a callable evaluating ``function`` in the workers."""
+        self.functions.append(function)
+        return _RemoteFunction(self, len(self.functions) - 1)
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        for worker in self.workers:
+            worker.stop()
+            worker.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _restart(self, worker):
+        worker.start(self.functions)
+        self.n_restarts += 1
+
+    def _run(self, tasks):
+        """Evaluate ``(index, args, kwargs)`` tasks in the idle workers."""
+        results = [None]*len(tasks)
+        n_tries = [0]*len(tasks)
+        pending = deque(range(len(tasks)))
+        idle = list(reversed(self.workers))
+        busy = {}
+        error = None
+        while (pending and error is None) or busy:
+            while pending and idle and error is None:
+                worker = idle.pop()
+                if (worker.process is None
+                        or worker.n_functions < len(self.functions)):
+                    worker.start(self.functions)
+                elif not worker.is_alive():
+                    self._restart(worker)
+                i = pending.popleft()
+                worker.submit(*tasks[i])
+                n_tries[i] += 1
+                busy[worker] = i
+            ready = connection.wait([worker.conn for worker in busy],
+                                    POLL_INTERVAL)
+            for worker, i in list(busy.items()):
+                try:
+                    if worker.conn in ready:
+                        del busy[worker]
+                        idle.append(worker)
+                        results[i] = worker.result()
+                    elif not worker.is_alive():
+                        raise _WorkerDied()
+                    elif (self.timeout is not None
+                          and default_timer() - worker.start_time
+                          > self.timeout):
+                        worker.process.kill()
+                        raise _WorkerDied()
+                except _WorkerDied:
+                    busy.pop(worker, None)
+                    if worker not in idle:
+                        idle.append(worker)
+                    self._restart(worker)
+                    if n_tries[i] > self.max_retries:
+                        error = RuntimeError(
+                            "The worker process died or timed out in "
+                            "{0} consecutive evaluations.".format(n_tries[i]))
+                    else:
+                        pending.appendleft(i)
+                except Exception as e:
+                    # Collect the evaluations in progress before raising.
+                    error = e
+        if error is not None:
+            raise error
+        return results
@@ -0,0 +1,425 @@
+"""Iteration recorders.
+
+A recorder receives one record per iteration of the solver. Each record
+contains the values of ``fields`` (see `IterationRecorder.start`) taken
+from the solver state. Recorders are passed to `minimize_constrained`
+through the ``recorder`` argument.
+"""
+
+from __future__ import division, print_function, absolute_import
+import numpy as np
+import json
+import logging
+import sys
+
+__all__ = ['IterationRecorder',
+           'ArrayRecorder',
+           'CSVRecorder',
+           'JSONLinesRecorder',
+           'LoggingRecorder',
+           'PrintRecorder',
+           'IterateHistory',
+           'SQP_FIELDS',
+           'IP_FIELDS']
+
+
+SQP_FIELDS = ("niter", "nfev", "cg_niter", "trust_radius",
+              "penalty", "optimality", "constr_violation")
+IP_FIELDS = ("niter", "nfev", "cg_niter", "barrier_parameter",
+             "trust_radius", "penalty", "optimality", "constr_violation")
+INT_FIELDS = ("niter", "nfev", "cg_niter")
+
+
+class IterationRecorder:
+    """Base class for iteration recorders.
+
+    Subclasses should implement ``write(record)``, where ``record``
+    is a tuple with the values of ``self.fields``.
+    """
+    fields = ()
+    method = None
+
+    def start(self, method, fields):
+        """Called once, before the first iteration."""
+        self.method = method
+        self.fields = tuple(fields)
+
+    def record(self, state):
+        """Extract the record from the solver ``state`` and write it."""
+        self.write(tuple(getattr(state, name) for name in self.fields))
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        """Called once, after the last iteration."""
+        pass
+
+
+class ArrayRecorder(IterationRecorder):
+    """Store the records in memory, one array per field.
+
+    Parameters
+    ----------
+    max_records : {int, None}, optional
+        Maximum number of records kept. When exceeded, the oldest
+        records are discarded, so only the latest ``max_records``
+        iterations are kept. By default (None) all records are kept.
+    initial_size : int, optional
+        Initial capacity of the arrays. The capacity is doubled
+        every time it is exhausted. By default is 64.
+
+    Notes
+    -----
+    The records are available, in chronological order, through
+    ``recorder[field]`` and ``recorder.as_dict()``.
+    """
+    def __init__(self, max_records=None, initial_size=64):
+        if max_records is not None and max_records < 1:
+            raise ValueError("``max_records`` should be positive.")
+        self.max_records = max_records
+        self.initial_size = initial_size
+        self.n_records = 0
+        self._columns = {}
+
+    def start(self, method, fields):
+        IterationRecorder.start(self, method, fields)
+        size = self.initial_size
+        if self.max_records is not None:
+            size = min(size, self.max_records)
+        self._columns = {name: np.empty(size, dtype=(
+            int if name in INT_FIELDS else float)) for name in self.fields}
+        self.n_records = 0
+
+    def write(self, record):
+        size = len(self._columns[self.fields[0]])
+        if self.n_records >= size:
+            if self.max_records is None or size < self.max_records:
+                new_size = 2*size
+                if self.max_records is not None:
+                    new_size = min(new_size, self.max_records)
+                for name, column in self._columns.items():
+                    new_column = np.empty(new_size, dtype=column.dtype)
+                    new_column[:size] = column
+                    self._columns[name] = new_column
+                size = new_size
+        i = self.n_records % size
+        for name, value in zip(self.fields, record):
+            self._columns[name][i] = value
+        self.n_records += 1
+
+    def __len__(self):
+        if self.max_records is None:
+            return self.n_records
+        return min(self.n_records, self.max_records)
+
+    def __getitem__(self, name):
+        column = self._columns[name]
+        n = len(self)
+        if self.n_records <= len(column):
+            return column[:n].copy()
+        # Ring buffer: oldest record is the next one to be overwritten.
+        i = self.n_records % len(column)
+        return np.concatenate((column[i:], column[:i]))
+
+    def as_dict(self):
+        """Return a dictionary with one array per field."""
+        return {name: self[name] for name in self.fields}
+
+
+class _BufferedFileRecorder(IterationRecorder):
+    """Recorder writing formatted lines to a file, ``buffer_size``
+    records at a time."""
+    def __init__(self, file, buffer_size=100):
+        self.file = file
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._stream = None
+        self._owns_stream = False
+
+    def start(self, method, fields):
+        IterationRecorder.start(self, method, fields)
+        if hasattr(self.file, "write"):
+            self._stream = self.file
+            self._owns_stream = False
+        else:
+            self._stream = open(self.file, "w")
+            self._owns_stream = True
+        self._buffer = []
+        header = self.header()
+        if header is not None:
+            self._stream.write(header)
+
+    def header(self):
+        return None
+
+    def format(self, record):
+        raise NotImplementedError
+
+    def write(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        if self._buffer:
+            self._stream.write("".join(self.format(record)
+                                       for record in self._buffer))
+            self._buffer = []
+        self._stream.flush()
+
+    def close(self):
+        if self._stream is None:
+            return
+        self.flush()
+        if self._owns_stream:
+            self._stream.close()
+        self._stream = None
+
+
+class CSVRecorder(_BufferedFileRecorder):
+    """Write the records to a CSV file.
+
+    Parameters
+    ----------
+    file : {str, file-like object}
+        Path of the file or an open file. A path is opened when
+        the optimization starts and closed when it ends. An open
+        file is flushed, but not closed, at the end.
+    buffer_size : int, optional
+        Number of records accumulated before they are written
+        to the file. By default is 100.
+    """
+    def header(self):
+        return ",".join(self.fields) + "\n"
+
+    def format(self, record):
+        return ",".join(str(value) for value in record) + "\n"
+
+
+class JSONLinesRecorder(_BufferedFileRecorder):
+    """Write the records to a file in the JSON lines format.
+
+    Each line is a JSON object mapping field names to values and
+    containing the key ``method``.
+
+    Parameters
+    ----------
+    file : {str, file-like object}
+        Path of the file or an open file. A path is opened when
+        the optimization starts and closed when it ends. An open
+        file is flushed, but not closed, at the end.
+    buffer_size : int, optional
+        Number of records accumulated before they are written
+        to the file. By default is 100.
+    """
+    def format(self, record):
+        line = {name: getattr(value, "item", lambda: value)()
+                for name, value in zip(self.fields, record)}
+        line["method"] = self.method
+        return json.dumps(line) + "\n"
+
+
+class LoggingRecorder(IterationRecorder):
+    """Emit one `logging` message per record.
+
+    The record is attached to the log entry as the attribute
+    ``iteration`` (a dictionary), so handlers and formatters can
+    access the values without parsing the message.
+
+    Parameters
+    ----------
+    logger : {`logging.Logger`, str, None}, optional
+        Logger or name of the logger to be used. By default
+        uses the logger named "ipsolver".
+    level : int, optional
+        Logging level of the messages. By default ``logging.INFO``.
+    """
+    def __init__(self, logger=None, level=logging.INFO):
+        if logger is None or isinstance(logger, str):
+            logger = logging.getLogger(logger or "ipsolver")
+        self.logger = logger
+        self.level = level
+
+    def record(self, state):
+        # Skip building the record when the message would be discarded.
+        if self.logger.isEnabledFor(self.level):
+            IterationRecorder.record(self, state)
+
+    def write(self, record):
+        iteration = dict(zip(self.fields, record))
+        iteration["method"] = self.method
+        self.logger.log(self.level, "%s", _LazyRecord(iteration),
+                        extra={"iteration": iteration})
+
+
+class _LazyRecord:
+    """Formats the record only if the log message is actually emitted."""
+    def __init__(self, iteration):
+        self.iteration = iteration
+
+    def __str__(self):
+        return " ".join("{0}={1}".format(name, value)
+                        for name, value in self.iteration.items())
+
+
+class PrintRecorder(IterationRecorder):
+    """Print the records as the rows of a table.
+
+    Used by `minimize_constrained` when ``verbose=2``.
+
+    Parameters
+    ----------
+    file : file-like object, optional
+        Where the table is printed. By default uses ``sys.stdout``.
+    """
+    def __init__(self, file=None):
+        self.file = file
+
+    def _print(self, *args):
+        print(*args, file=self.file if self.file is not None
+              else sys.stdout)
+
+    def start(self, method, fields):
+        IterationRecorder.start(self, method, fields)
+        if method == 'tr_interior_point':
+            self._print(
+                "|{0:^7}|{1:^7}|{2:^7}|{3:^13}|{4:^10}|{5:^10}|{6:^10}|"
+                "{7:^10}|".format("niter", "f evals", "CG iter",
+                                  "barrier param", "tr radius", "penalty",
+                                  "opt", "c viol"))
+            s = "-"*6 + ":"
+            s2 = ":" + "-"*11 + ":"
+            s3 = ":" + "-"*8 + ":"
+            self._print(
+                "|{0:^7}|{1:^7}|{2:^7}|{3:^13}|{4:^10}|{5:^10}|{6:^10}|"
+                "{7:^10}|".format(s, s, s, s2, s3, s3, s3, s3))
+        else:
+            self._print("|{0:^7}|{1:^7}|{2:^7}|{3:^10}|{4:^10}|{5:^10}|"
+                        "{6:^10}|".format("niter", "f evals", "CG iter",
+                                          "tr radius", "penalty", "opt",
+                                          "c viol"))
+            s = "-"*6 + ":"
+            s2 = ":" + "-"*8 + ":"
+            self._print("|{0:^7}|{1:^7}|{2:^7}|{3:^10}|{4:^10}|{5:^10}|"
+                        "{6:^10}|".format(s, s, s, s2, s2, s2, s2))
+
+    def write(self, record):
+        if self.method == 'tr_interior_point':
+            self._print("|{0:>7}|{1:>7}|{2:>7}|   {3:^1.2e}  | "
+                        "{4:^1.2e} | {5:^1.2e} | {6:^1.2e} | {7:^1.2e} |"
+                        .format(*record))
+        else:
+            self._print("|{0:>7}|{1:>7}|{2:>7}| {3:^1.2e} | {4:^1.2e} |"
+                        " {5:^1.2e} | {6:^1.2e} |".format(*record))
+
+    def close(self):
+        self._print("")
+        if self.method == 'tr_interior_point':
+            self._print((7*3 + 13 + 10*4 + 9)*"-")
+        else:
+            self._print((7*3 + 10*4 + 8)*"-")
+        self._print("")
+
+
+class IterateHistory:
+    """Store a sequence of vectors with the same size in a 2-D array.
+
+    Used to store the iterates when the option ``return_all`` is set.
+    The array is preallocated and its capacity doubled every time it
+    is exhausted, so appending a vector does not allocate memory.
+
+    Parameters
+    ----------
+    max_size : {int, None}, optional
+        Maximum number of vectors kept. When exceeded, the oldest
+        vectors are discarded. By default (None) all vectors are kept.
+    every : int, optional
+        Keep only one every ``every`` appended vectors (starting with
+        the first one). By default is 1, i.e., all vectors are kept.
+    filename : {str, None}, optional
+        When given the vectors are stored in a memory-mapped file
+        with this name rather than in memory.
+    initial_size : int, optional
+        Initial capacity. By default is 64.
+    """
+    def __init__(self, max_size=None, every=1, filename=None,
+                 initial_size=64):
+        if max_size is not None and max_size < 1:
+            raise ValueError("``max_size`` should be positive.")
+        if every < 1:
+            raise ValueError("``every`` should be positive.")
+        self.max_size = max_size
+        self.every = every
+        self.filename = filename
+        self.initial_size = initial_size
+        self.n_appended = 0
+        self.n_stored = 0
+        self._data = None
+
+    def _allocate(self, size, n):
+        if self.filename is None:
+            new_data = np.empty((size, n))
+        else:
+            if self._data is None:
+                mode = "w+"
+            else:
+                self._data.flush()
+                self._data = None
+                with open(self.filename, "r+b") as f:
+                    f.truncate(size*n*np.dtype(float).itemsize)
+                mode = "r+"
+            return np.memmap(self.filename, dtype=float, mode=mode,
+                             shape=(size, n))
+        if self._data is not None:
+            new_data[:len(self._data)] = self._data
+        return new_data
+
+    def append(self, x):
+        """Store a copy of the vector ``x``."""
+        keep = self.n_appended % self.every == 0
+        self.n_appended += 1
+        if not keep:
+            return
+        if self._data is None:
+            size = self.initial_size
+            if self.max_size is not None:
+                size = min(size, self.max_size)
+            self._data = self._allocate(size, np.size(x))
+        size, n = self._data.shape
+        if np.size(x) != n:
+            raise ValueError("All the vectors should have the same size.")
+        if self.n_stored >= size and (self.max_size is None
+                                      or size < self.max_size):
+            new_size = 2*size
+            if self.max_size is not None:
+                new_size = min(new_size, self.max_size)
+            self._data = self._allocate(new_size, n)
+            size = new_size
+        self._data[self.n_stored % size] = x
+        self.n_stored += 1
+
+    def __len__(self):
+        if self._data is None:
+            return 0
+        return min(self.n_stored, len(self._data))
+
+    def to_array(self):
+        """Return the stored vectors, in chronological order, as the
+        rows of an array with shape (len(self), n).
+
+        The returned array is a copy, which neither keeps the spare
+        capacity alive nor changes with the next appended vectors,
+        except for storage in a file: then, unless the oldest vectors
+        have been discarded, it is a memory-mapped view of the file.
+        """
+        if self._data is None:
+            return np.empty((0, 0))
+        size = len(self._data)
+        if self.n_stored <= size:
+            if self.filename is not None:
+                return self._data[:self.n_stored]
+            return self._data[:self.n_stored].copy()
+        i = self.n_stored % size
+        return np.concatenate((self._data[i:], self._data[:i]))
@@ -140,6 +140,25 @@ class TestToCanonical(TestCase):
         assert_array_equal(canonical.enforce_feasibility,
                            [False, False, False, False, False])
 
+    def test_box_to_canonical_sparse_and_dense(self):
+        kind = ("interval", [10, 20, -np.inf, 40], [50, 20, 70, np.inf])
+        x = np.array([11, 2, 3, 41])
+        canonical = []
+        for sparse_jacobian in (True, False):
+            box = BoxConstraint(kind, [True, False, False, True])
+            box.evaluate_and_initialize(x, sparse_jacobian)
+            canonical += [to_canonical(box)]
+        sparse, dense = canonical
+        assert_equal(sparse.n_eq, dense.n_eq)
+        assert_equal(sparse.n_ineq, dense.n_ineq)
+        assert_array_equal(sparse.enforce_feasibility,
+                           dense.enforce_feasibility)
+        for value_sparse, value_dense in zip(sparse.constr(x),
+                                             dense.constr(x)):
+            assert_array_equal(value_sparse, value_dense)
+        for J_sparse, J_dense in zip(sparse.jac(x), dense.jac(x)):
+            assert_array_equal(J_sparse.toarray(), J_dense)
+
     def test_linear_to_canonical_conversion(self):
         A = np.array([[1, 2, 3, 4], [5, 0, 0, 6], [7, 0, 8, 0]])
         linear = LinearConstraint(A, ("interval",
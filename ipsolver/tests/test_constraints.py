@@ -1,8 +1,10 @@
 from __future__ import division, print_function, absolute_import
 import numpy as np
+from scipy.sparse import csr_matrix
 from ipsolver._constraints import (BoxConstraint,
                                          LinearConstraint,
                                          NonlinearConstraint,
+                                         initialize_constraint,
                                          _check_kind,
                                          _check_enforce_feasibility,
                                          _reinforce_box_constraint)
@@ -47,6 +49,12 @@ class TestCheckKind(TestCase):
         assert_equal(keyword, "greater")
         assert_equal(lb, [1, 1, 1])
 
+    def test_broadcast_without_copy(self):
+        keyword, lb, ub = _check_kind(("interval", -1, [1, 2, 3]), 3)
+        assert_equal(lb, [-1, -1, -1])
+        assert_equal(lb.strides, (0,))
+        assert_equal(ub, [1, 2, 3])
+
 
 class TestCheckEnforceFeasibility(TestCase):
 
@@ -72,6 +80,17 @@ class TestReinforceBoxConstraints(TestCase):
         assert_array_less(lb[enforce_feasibility], x0[enforce_feasibility])
         assert_array_less(x0[enforce_feasibility], ub[enforce_feasibility])
 
+    def test_reinforce_box_constraints_values(self):
+        lb = np.array([0, 20, -np.inf, 0, 0])
+        ub = np.array([0.5, np.inf, 70, 1000, 1000])
+        enforce_feasibility = np.array([True, True, True, True, False])
+        kind = ("interval", lb, ub)
+        x0 = np.array([1, 2, 100, -5, -5])
+        x0_new = _reinforce_box_constraint(kind, enforce_feasibility, x0)
+        assert_array_almost_equal(x0_new, [0.495, 20.01, 69.99, 0.01, -5])
+        # The initial point is not changed
+        assert_array_equal(x0, [1, 2, 100, -5, -5])
+
 
 class TestBoxConstraint(TestCase):
 
@@ -184,3 +203,50 @@ class TestNonlinearConstraint(TestCase):
                     print(H_approx, H_exact)
                     assert_array_almost_equal(H_approx.dot(p)/H_exact.dot(p),
                                               np.ones(2), 5)
+
+    def test_hessian_vector_product(self):
+
+        def fun(x):
+            return [x[0]**2 + x[1]**3]
+
+        def jac(x):
+            return [[2*x[0], 3*x[1]**2]]
+
+        def hess(x, v):
+            return v[0]*np.array([[2, 0], [0, 6*x[1]]])
+
+        products = []
+
+        def hessp(x, v, p):
+            products.append(p)
+            return hess(x, v).dot(p)
+
+        nonlinear = NonlinearConstraint(fun, ("equals",), jac, None,
+                                        hessp=hessp)
+        nonlinear.evaluate_and_initialize([1, 2])
+        x = np.array([3.0, -1.0])
+        v = np.array([2.0])
+        H = nonlinear.hess(x, v)
+        # Neither the matrix nor its type are computed.
+        assert_equal(len(products), 0)
+        assert_equal(H.dtype, np.float64)
+        p = np.array([1.0, 4.0])
+        assert_array_equal(H.dot(p), hess(x, v).dot(p))
+        assert_equal(len(products), 1)
+
+
+class TestInitializeConstraint(TestCase):
+
+    def test_references_user_data(self):
+        A = csr_matrix([[1, 2, 0], [0, 1, 1]], dtype=float)
+        kind = ("interval", [-1, -2], [1, 2])
+        linear = LinearConstraint(A, kind)
+        initialized, x0 = initialize_constraint(linear, [0, 0, 0])
+        # The user constraint is left untouched.
+        assert_(not linear.isinitialized)
+        assert_(linear.A is A)
+        assert_(linear.kind is kind)
+        # The initialized constraint is a view of its data.
+        assert_(initialized.isinitialized)
+        assert_(np.shares_memory(initialized.A.data, A.data))
+        assert_array_equal(initialized.f0, [0, 0])
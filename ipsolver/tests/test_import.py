@@ -0,0 +1,48 @@
+from __future__ import division, print_function, absolute_import
+import os
+import subprocess
+import sys
+import ipsolver
+from numpy.testing import (TestCase, assert_raises,
+                           assert_)
+
+
+def imported_modules(statement):
+    """Modules imported by ``statement`` in a new Python process."""
+    source_dir = os.path.dirname(os.path.dirname(ipsolver.__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [source_dir] + [p for p in [os.environ.get("PYTHONPATH")] if p])
+    code = statement + "\nimport sys\nprint(' '.join(sys.modules))"
+    output = subprocess.check_output([sys.executable, "-c", code], env=env)
+    return output.decode().split()
+
+
+class TestLazyImport(TestCase):
+
+    def test_import_package(self):
+        modules = imported_modules("import ipsolver")
+        assert_("scipy" not in modules)
+        assert_("ipsolver._minimize_constrained" not in modules)
+
+    def test_heavy_modules_not_imported(self):
+        modules = imported_modules(
+            "from ipsolver import (minimize_constrained, "
+            "NonlinearConstraint)")
+        for name in ("scipy.optimize", "scipy.linalg",
+                     "scipy.sparse.linalg", "sksparse"):
+            assert_(name not in modules)
+
+    def test_batch_module(self):
+        modules = imported_modules(
+            "from ipsolver import minimize_constrained_batch")
+        for name in ("ipsolver._minimize_constrained", "scipy.optimize"):
+            assert_(name not in modules)
+
+    def test_attributes(self):
+        from ipsolver._minimize_constrained import minimize_constrained
+        assert_(ipsolver.minimize_constrained is minimize_constrained)
+        for name in ipsolver.all:
+            assert_(name in dir(ipsolver))
+            getattr(ipsolver, name)
+        assert_raises(AttributeError, getattr, ipsolver, "minimize")
@@ -0,0 +1,139 @@
+from __future__ import division, print_function, absolute_import
+import asyncio
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from numpy.testing import (TestCase, assert_array_almost_equal,
+                           assert_array_equal, assert_equal)
+from ipsolver import (NonlinearConstraint,
+                      minimize_constrained,
+                      minimize_constrained_async)
+from ipsolver._minimize_constrained_async import _Bridge
+from ipsolver._numdiff import approx_derivative
+from ipsolver.tests.test_minimized_constrained import (Maratos,
+                                                       MaratosApproxHess,
+                                                       HyperbolicIneq)
+
+
+class InFlight:
+    """Turn functions into coroutines and count concurrent calls."""
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.ncalls = 0
+
+    def __call__(self, function):
+        async def coroutine(*args):
+            self.ncalls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            try:
+                # Give the other evaluations the chance to start.
+                await asyncio.sleep(0)
+                return function(*args)
+            finally:
+                self.running -= 1
+        return coroutine
+
+
+def async_constraint(constr, to_async):
+    return NonlinearConstraint(to_async(constr._fun), constr.kind,
+                               to_async(constr._jac), constr._hess)
+
+
+class TestMinimizeConstrainedAsync(TestCase):
+
+    def solve_sync_and_async(self, prob, **kwargs):
+        constraints = prob.constr
+        if isinstance(constraints, NonlinearConstraint):
+            constraints = [constraints]
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, constraints, **kwargs)
+
+        in_flight = InFlight()
+        async_constraints = [async_constraint(c, in_flight)
+                             if isinstance(c, NonlinearConstraint) else c
+                             for c in constraints]
+        with ThreadPoolExecutor(1) as executor:
+            async_result = asyncio.run(minimize_constrained_async(
+                in_flight(prob.fun), prob.x0, in_flight(prob.grad),
+                prob.hess, async_constraints, executor=executor, **kwargs))
+        return result, async_result, in_flight
+
+    def test_same_result_as_minimize_constrained(self):
+        for prob in (Maratos(), MaratosApproxHess(), HyperbolicIneq()):
+            result, async_result, _ = self.solve_sync_and_async(prob)
+            assert_array_equal(async_result.x, result.x)
+            assert_equal(async_result.niter, result.niter)
+            assert_equal(async_result.nfev, result.nfev)
+            assert_array_almost_equal(async_result.x, prob.x_opt,
+                                      decimal=5)
+
+    def test_evaluations_are_concurrent(self):
+        for prob in (Maratos(), MaratosApproxHess(), HyperbolicIneq()):
+            _, _, in_flight = self.solve_sync_and_async(prob)
+            # The objective and the constraint (or their derivatives)
+            # are always requested together.
+            assert_equal(in_flight.max_running, 2)
+
+    def test_finite_differences_are_concurrent(self):
+        def residuals(x):
+            return np.hstack((10*(x[1:] - x[:-1]**2), 1 - x[:-1]))
+
+        x0 = np.linspace(-1, 1, 5)
+        for method in ('2-point', '3-point'):
+            in_flight = InFlight()
+
+            async def differentiate():
+                loop = asyncio.get_running_loop()
+                fun = _Bridge(loop).wrap(in_flight(residuals))
+                return await loop.run_in_executor(
+                    None, approx_derivative, fun, x0, method)
+
+            J = asyncio.run(differentiate())
+            assert_array_equal(J, approx_derivative(residuals, x0, method))
+            # All the perturbed points at once.
+            assert_equal(in_flight.max_running,
+                         5 if method == '2-point' else 10)
+
+    def test_many_solves_on_one_loop(self):
+        probs = [Maratos(degrees) for degrees in (30, 60, 90, 120)]
+        in_flight = InFlight()
+
+        async def solve_all(executor):
+            return await asyncio.gather(*[
+                minimize_constrained_async(
+                    in_flight(prob.fun), prob.x0, in_flight(prob.grad),
+                    prob.hess, async_constraint(prob.constr, in_flight),
+                    executor=executor)
+                for prob in probs])
+
+        with ThreadPoolExecutor(len(probs)) as executor:
+            results = asyncio.run(solve_all(executor))
+        for prob, result in zip(probs, results):
+            assert_array_almost_equal(result.x, prob.x_opt, decimal=5)
+        assert_equal(in_flight.max_running > 2, True)
+
+    def test_cancel(self):
+        prob = Maratos()
+        started = []
+
+        async def fun(x):
+            started.append(x)
+            await asyncio.sleep(0.01)
+            return prob.fun(x)
+
+        async def solve(executor):
+            task = asyncio.ensure_future(minimize_constrained_async(
+                fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                executor=executor))
+            while len(started) < 2:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+            return False
+
+        with ThreadPoolExecutor(1) as executor:
+            assert_equal(asyncio.run(solve(executor)), True)
@@ -0,0 +1,103 @@
+from __future__ import division, print_function, absolute_import
+import numpy as np
+from numpy.testing import (TestCase, assert_array_almost_equal,
+                           assert_array_equal, assert_equal)
+from ipsolver import (NonlinearConstraint,
+                      minimize_constrained,
+                      minimize_constrained_batch)
+import pytest
+
+
+class BatchedMaratos:
+    """Batch of problems 15.4 from Nocedal and Wright
+
+    The following optimization problems:
+        minimize 2*(x[0]**2 + x[1]**2 - 1) - x[0]
+        Subject to: x[0]**2 + x[1]**2 - 1 = 0
+    starting from different points of the unit circle.
+    """
+
+    def __init__(self, degrees=(10, 60, 90, 120, 170)):
+        rads = np.asarray(degrees)/180*np.pi
+        self.x0 = np.column_stack((np.cos(rads), np.sin(rads)))
+        self.x_opt = np.array([1.0, 0.0])
+
+    def fun(self, x):
+        return 2*(x[:, 0]**2 + x[:, 1]**2 - 1) - x[:, 0]
+
+    def grad(self, x):
+        return np.column_stack((4*x[:, 0]-1, 4*x[:, 1]))
+
+    def hess(self, x):
+        return np.repeat(4*np.eye(2)[np.newaxis], len(x), axis=0)
+
+    def constr(self, x):
+        return (x[:, 0]**2 + x[:, 1]**2 - 1)[:, np.newaxis]
+
+    def jac(self, x):
+        return 2*x[:, np.newaxis, :]
+
+    def constr_hess(self, x, v):
+        return 2*v[:, 0, np.newaxis, np.newaxis]*np.eye(2)
+
+
+class TestMinimizeConstrainedBatch(TestCase):
+
+    def test_batched_maratos(self):
+        prob = BatchedMaratos()
+        result = minimize_constrained_batch(prob.fun, prob.x0, prob.grad,
+                                            prob.hess, prob.constr,
+                                            prob.jac, prob.constr_hess)
+        assert_equal(result.x.shape, prob.x0.shape)
+        assert_array_equal(result.status, 1)
+        for x in result.x:
+            assert_array_almost_equal(x, prob.x_opt)
+
+    def test_compare_with_minimize_constrained(self):
+        prob = BatchedMaratos()
+        result = minimize_constrained_batch(prob.fun, prob.x0, prob.grad,
+                                            prob.hess, prob.constr,
+                                            prob.jac, prob.constr_hess)
+        for k, x0 in enumerate(prob.x0):
+            def single(f):
+                return lambda x: f(x[np.newaxis])[0]
+            constr = NonlinearConstraint(
+                single(prob.constr), ("equals",), single(prob.jac),
+                lambda x, v: prob.constr_hess(x[np.newaxis],
+                                              v[np.newaxis])[0])
+            result_k = minimize_constrained(single(prob.fun), x0,
+                                            single(prob.grad),
+                                            single(prob.hess), constr)
+            assert_array_almost_equal(result.x[k], result_k.x)
+            assert_equal(result.niter[k], result_k.niter)
+            assert_equal(result.nfev[k], result_k.nfev)
+
+    def test_unconstrained_problems(self):
+        # Two-dimensional Rosenbrock function from several initial points.
+        def fun(x):
+            return 100*(x[:, 1] - x[:, 0]**2)**2 + (1 - x[:, 0])**2
+
+        def grad(x):
+            return np.column_stack(
+                (-400*x[:, 0]*(x[:, 1] - x[:, 0]**2) - 2*(1 - x[:, 0]),
+                 200*(x[:, 1] - x[:, 0]**2)))
+
+        def hess(x):
+            H = np.empty((len(x), 2, 2))
+            H[:, 0, 0] = 1200*x[:, 0]**2 - 400*x[:, 1] + 2
+            H[:, 0, 1] = H[:, 1, 0] = -400*x[:, 0]
+            H[:, 1, 1] = 200
+            return H
+
+        rng = np.random.RandomState(0)
+        x0 = rng.uniform(-1, 1, (10, 2))
+        result = minimize_constrained_batch(fun, x0, grad, hess)
+        assert_array_almost_equal(result.x, np.ones((10, 2)))
+        assert_array_equal(result.status, 1)
+        assert_equal(len(result.message), 10)
+
+    def test_missing_jacobian(self):
+        prob = BatchedMaratos()
+        with pytest.raises(ValueError):
+            minimize_constrained_batch(prob.fun, prob.x0, prob.grad,
+                                       prob.hess, prob.constr)
@@ -1,5 +1,9 @@
 from __future__ import division, print_function, absolute_import
+import importlib
 import numpy as np
+import os
+import shutil
+import tempfile
 from scipy.linalg import block_diag
 from scipy.sparse import csc_matrix
 from numpy.testing import (TestCase, assert_array_almost_equal,
@@ -384,3 +388,379 @@ class TestMinimizeConstrained(TestCase):
             # max iter
             if result.status in (0, 3):
                 raise RuntimeError("Invalid termination condition.")
+
+    def test_profile(self):
+        for prob in (Maratos(), HyperbolicIneq()):
+            result = minimize_constrained(prob.fun, prob.x0,
+                                          prob.grad, prob.hess,
+                                          prob.constr,
+                                          options={"profile": True})
+            assert_array_almost_equal(result.x, prob.x_opt, decimal=5)
+            profile = result.profile
+            for phase in ("fun", "grad", "constr", "jac", "hess",
+                          "factorization", "normal_step",
+                          "tangential_step", "merit"):
+                assert_(profile["time"][phase] >= 0)
+            assert_equal(profile["count"]["factorizations"],
+                         profile["count"]["LS"])
+            assert_(profile["count"]["Z"] >= result.cg_niter)
+            assert_(profile["count"]["fun"] >= result.nfev)
+
+            # Profiling is opt-in
+            result = minimize_constrained(prob.fun, prob.x0,
+                                          prob.grad, prob.hess,
+                                          prob.constr)
+            assert_("profile" not in result)
+
+    def test_budget_limits(self):
+        prob = Elec(n_electrons=20)
+        constr = prob.constr
+        constr.kind = ("equals",)
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, constr)
+        niter = result.niter
+        for option, value, status in (("max_time", 0, 4),
+                                      ("max_nfev", 5, 5),
+                                      ("max_njev", 5, 6),
+                                      ("max_memory", 1, 7)):
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, constr,
+                                          options={option: value})
+            assert_equal(result.status, status)
+            assert_(result.niter < niter)
+            if option == "max_nfev":
+                assert_equal(result.nfev, value)
+            if option == "max_njev":
+                assert_equal(result.njev, value)
+            # Best iterate is returned
+            assert_allclose(result.constr_violation,
+                            np.max(np.abs(constr._fun(result.x))))
+
+    def test_budget_limits_ineq(self):
+        prob = HyperbolicIneq()
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, prob.constr,
+                                      options={"max_nfev": 4})
+        assert_equal(result.status, 5)
+        assert_equal(result.method, "tr_interior_point")
+        assert_equal(np.shape(result.x), np.shape(prob.x0))
+        assert_array_less(0, result.s)
+
+    def test_fused_callables(self):
+        for prob in (Maratos(), HyperbolicIneq(), Elec(n_electrons=10)):
+            constraints = prob.constr
+            if not isinstance(constraints, tuple):
+                constraints = (constraints,)
+            counter = {"fun": 0, "constr": 0}
+
+            def fun_and_grad(x):
+                counter["fun"] += 1
+                return prob.fun(x), prob.grad(x)
+
+            def fused(constr):
+                if not isinstance(constr, NonlinearConstraint):
+                    return constr
+
+                def constr_and_jac(x):
+                    counter["constr"] += 1
+                    return constr._fun(x), constr._jac(x)
+                return NonlinearConstraint(constr_and_jac, constr.kind,
+                                           True, constr._hess)
+
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, constraints)
+            result_fused = minimize_constrained(
+                fun_and_grad, prob.x0, True, prob.hess,
+                [fused(constr) for constr in constraints])
+            assert_array_almost_equal(result_fused.x, result.x)
+            assert_equal(result_fused.niter, result.niter)
+            assert_equal(result_fused.nfev, result.nfev)
+            # A single call for each point
+            assert_(counter["fun"] <= result.nfev + 1)
+            assert_(counter["constr"] <= result.ncev + 1)
+
+    def test_cache_size(self):
+        for prob in (Maratos(), HyperbolicIneq(), Elec(n_electrons=10)):
+            n_calls = []
+            for cache_size in (0, 4):
+                counter = [0]
+
+                def grad(x):
+                    counter[0] += 1
+                    return prob.grad(x)
+
+                result = minimize_constrained(
+                    prob.fun, prob.x0, grad, '2-point', prob.constr,
+                    options={"cache_size": cache_size})
+                n_calls.append(counter[0])
+                if cache_size == 0:
+                    result_uncached = result
+            assert_array_almost_equal(result.x, result_uncached.x)
+            assert_equal(result.niter, result_uncached.niter)
+            # The finite difference Hessian approximation reuses
+            # the gradient already computed at the same point.
+            assert_(n_calls[1] < n_calls[0])
+
+    def test_hessian_refresh(self):
+        for prob in (Maratos(), HyperbolicIneq(), Elec(n_electrons=10)):
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, prob.constr)
+            assert_equal(result.nhev_skipped, 0)
+            result_reuse = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                options={"hessian_refresh_every": 3})
+            assert_equal(result_reuse.status, 1)
+            assert_array_almost_equal(result_reuse.fun, result.fun, decimal=3)
+            assert_(result_reuse.nhev_skipped > 0)
+            assert_(result_reuse.nhev < result.nhev)
+            # Tight thresholds force the Hessian to be always evaluated
+            result_tol = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                options={"hessian_refresh_every": 3,
+                         "hessian_refresh_xtol": 0})
+            assert_equal(result_tol.nhev_skipped, 0)
+            assert_equal(result_tol.nhev, result.nhev)
+
+    def test_factorization_reuse(self):
+        # Linear constraints: a single factorization, as long
+        # as the matrices are compared.
+        prob = Rosenbrock()
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, prob.constr)
+        assert_equal(result.nfactor_reused, 0)
+        result = minimize_constrained(
+            prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+            options={"factorization_reuse_tol": 1e-12})
+        assert_equal(result.nfactor, 1)
+        assert_(result.nfactor_reused > 0)
+
+        prob = Maratos()
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, prob.constr)
+        assert_equal(result.nfactor_reused, 0)
+        result_reuse = minimize_constrained(
+            prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+            options={"factorization_reuse_tol": 0.1})
+        assert_array_almost_equal(result_reuse.x, result.x)
+        assert_(result_reuse.nfactor < result.nfactor)
+        assert_equal(result_reuse.nfactor + result_reuse.nfactor_reused,
+                     result.nfactor)
+
+    def test_factorization_plan(self):
+        # Small problem: dense factorization, even though the
+        # Jacobian of the box constraints is sparse.
+        prob = HyperbolicIneq()
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, prob.constr)
+        assert_equal(result.factorization_plan["method"], "QRFactorization")
+        assert_equal(result.factorization_plan["sparse"], False)
+        assert_equal(result.factorization_plan["shape"], (3, 5))
+        # The representation follows the method, and conversely.
+        for sparse_jacobian, options, method in (
+                (None, {"factorization_method": "AugmentedSystem"},
+                 "AugmentedSystem"),
+                (None, {"factorization_method": "SVDFactorization"},
+                 "SVDFactorization"),
+                (True, {}, "AugmentedSystem")):
+            result_given = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                sparse_jacobian=sparse_jacobian, options=options)
+            assert_equal(result_given.factorization_plan["method"], method)
+            assert_array_almost_equal(result_given.x, result.x)
+        assert_raises(ValueError, minimize_constrained, prob.fun, prob.x0,
+                      prob.grad, prob.hess, prob.constr,
+                      sparse_jacobian=False,
+                      options={"factorization_method": "AugmentedSystem"})
+
+        # Large Jacobian with few nonzeros, given as a dense array.
+        n = 1000
+        A = (np.eye(n//2, n) - 2*np.eye(n//2, n, 1) + np.eye(n//2, n, 2))
+        b = np.ones(n//2)
+        result = minimize_constrained(lambda x: 1/2*x.dot(x), np.zeros(n),
+                                      lambda x: x,
+                                      lambda x: csc_matrix(np.eye(n)),
+                                      LinearConstraint(A, ("equals", b)))
+        assert_equal(result.factorization_plan["method"], "AugmentedSystem")
+        assert_equal(result.factorization_plan["sparse"], True)
+        assert_array_almost_equal(result.x, np.linalg.lstsq(A, b,
+                                                            rcond=None)[0])
+
+    def test_factorization_counts(self):
+        # Up to date at every iteration
+        for prob in (Maratos(), HyperbolicIneq()):
+            counts = []
+
+            def callback(state):
+                counts.append(state.nfactor + state.nfactor_reused)
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, prob.constr,
+                                          callback=callback)
+            assert_equal(counts[0], 1)
+            assert_equal(counts[-1], result.nfactor + result.nfactor_reused)
+            assert_array_less(counts[:-1], counts[-1] + 1)
+
+    def test_checkpoint_and_resume(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "checkpoint.npz")
+            for prob in (Maratos(), HyperbolicIneq(), EqIneqRosenbrock()):
+                result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                              prob.hess, prob.constr)
+                for n_iter in (1, 5, 8):
+                    # Interrupted execution
+                    minimize_constrained(
+                        prob.fun, prob.x0, prob.grad, prob.hess,
+                        prob.constr, callback=lambda s: s.niter >= n_iter,
+                        options={"checkpoint_file": filename,
+                                 "checkpoint_every": 1})
+                    result_resumed = minimize_constrained(
+                        prob.fun, prob.x0, prob.grad, prob.hess,
+                        prob.constr, resume_from=filename)
+                    assert_array_equal(result_resumed.x, result.x)
+                    assert_array_equal(result_resumed.v, result.v)
+                    assert_equal(result_resumed.niter, result.niter)
+                    assert_equal(result_resumed.nfev, result.nfev)
+                    assert_equal(result_resumed.cg_niter, result.cg_niter)
+            # The method should match the one of the checkpoint
+            assert_raises(ValueError, minimize_constrained,
+                          prob.fun, prob.x0, prob.grad, prob.hess,
+                          prob.constr, method='equality_constrained_sqp',
+                          resume_from=filename)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_single_precision(self):
+        for prob in (Maratos(), HyperbolicIneq(), Elec(n_electrons=10)):
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, prob.constr)
+            result_single = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                options={"dtype": np.float32})
+            assert_equal(result_single.status, 1)
+            assert_equal(result_single.x.dtype, np.float64)
+            assert_array_almost_equal(result_single.fun, result.fun)
+
+    def test_single_precision_reused_hessian(self):
+        # After the switch to double precision the reused Hessian
+        # is also applied in double precision.
+        module = importlib.import_module(
+            "ipsolver._large_scale_constrained.equality_constrained_sqp")
+        projected_cg = module.projected_cg
+        dtypes = []
+
+        def spy(H, c, *args, **kwargs):
+            dtypes.append((H.dtype, c.dtype))
+            return projected_cg(H, c, *args, **kwargs)
+
+        prob = Maratos()
+        module.projected_cg = spy
+        try:
+            result = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                options={"dtype": np.float32,
+                         "hessian_refresh_every": 1000})
+        finally:
+            module.projected_cg = projected_cg
+        assert_equal(result.status, 1)
+        assert_equal(dtypes[0], (np.float32, np.float32))
+        assert_(dtypes[-1][1] == np.float64)
+        for H_dtype, c_dtype in dtypes:
+            assert_equal(H_dtype, c_dtype)
+
+    def test_user_constraints_unchanged(self):
+        prob = EqIneqRosenbrock()
+        constraints = prob.constr
+        attributes = [dict(vars(constr)) for constr in constraints]
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, constraints)
+        assert_equal(result.status, 1)
+        for constr, attrs in zip(constraints, attributes):
+            assert_equal(sorted(vars(constr)), sorted(attrs))
+            for name, value in attrs.items():
+                assert_(getattr(constr, name) is value)
+
+    def test_gltr_tangential_solver(self):
+        for prob in (Maratos(), HyperbolicIneq(), Rosenbrock(),
+                     Elec(n_electrons=10)):
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, prob.constr)
+            result_gltr = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                options={"tangential_solver": "gltr"})
+            assert_equal(result_gltr.status, 1)
+            assert_array_almost_equal(result_gltr.fun, result.fun)
+        assert_raises(ValueError, minimize_constrained, prob.fun,
+                      prob.x0, prob.grad, prob.hess, prob.constr,
+                      options={"tangential_solver": "lanczos"})
+
+    def test_hessian_vector_product(self):
+        for prob in (Maratos(), HyperbolicIneq(), Rosenbrock()):
+            products = []
+
+            def hessp(x, p, prob=prob):
+                products.append(p)
+                return prob.hess(x).dot(p)
+
+            def hess(x):
+                raise AssertionError("The Hessian should not be formed.")
+
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, prob.constr)
+            result_hessp = minimize_constrained(prob.fun, prob.x0,
+                                                prob.grad, hess,
+                                                prob.constr, hessp=hessp)
+            assert_equal(result_hessp.status, 1)
+            assert_array_almost_equal(result_hessp.x, result.x)
+            assert_equal(result_hessp.niter, result.niter)
+            assert_(len(products) > 0)
+
+        # Hessian-vector products of the constraints.
+        prob = Maratos()
+        constr = prob.constr
+        constr_products = []
+
+        def objective_hessp(x, p, prob=prob):
+            return prob.hess(x).dot(p)
+
+        def constr_hessp(x, v, p, constr=constr):
+            constr_products.append(p)
+            return constr._hess(x, v).dot(p)
+
+        constr_with_hessp = NonlinearConstraint(
+            constr._fun, constr.kind, constr._jac, None,
+            hessp=constr_hessp)
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, constr)
+        result_hessp = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                            hess, constr_with_hessp,
+                                            hessp=objective_hessp)
+        assert_array_almost_equal(result_hessp.x, result.x)
+        assert_equal(result_hessp.niter, result.niter)
+        assert_(len(constr_products) > 0)
+
+    def test_nonmonotone_acceptance(self):
+        for prob in (Maratos(), Maratos(degrees=170), HyperbolicIneq(),
+                     Rosenbrock(), Elec(n_electrons=10)):
+            result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                          prob.hess, prob.constr)
+            result_monotone = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                options={"nonmonotone_memory": 1})
+            assert_array_equal(result_monotone.x, result.x)
+            result_nonmonotone = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                options={"nonmonotone_memory": 3})
+            assert_equal(result_nonmonotone.status, 1)
+            assert_array_almost_equal(result_nonmonotone.fun, result.fun,
+                                      decimal=4)
+        # Fewer steps across the curved constraint are rejected.
+        prob = Maratos(degrees=170)
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, prob.constr)
+        result_nonmonotone = minimize_constrained(
+            prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+            options={"nonmonotone_memory": 3})
+        assert_(result_nonmonotone.nfev < result.nfev)
+        assert_raises(ValueError, minimize_constrained, prob.fun,
+                      prob.x0, prob.grad, prob.hess, prob.constr,
+                      options={"nonmonotone_memory": 0})
@@ -0,0 +1,126 @@
+from __future__ import division, print_function, absolute_import
+import os
+import tempfile
+import time
+import numpy as np
+import scipy.sparse as spc
+from numpy.testing import (TestCase, assert_array_equal, assert_equal,
+                           assert_raises)
+from ipsolver import (NonlinearConstraint, ProcessPool,
+                      minimize_constrained)
+from ipsolver._numdiff import approx_derivative
+from ipsolver.tests.test_minimized_constrained import Maratos
+
+
+def rosenbrock_residuals(x):
+    return np.hstack((10*(x[1:] - x[:-1]**2), 1 - x[:-1]))
+
+
+def values_of_all_kinds(x):
+    return (np.sum(x), 2*x, spc.diags(x, format="csr"), [x[:1], "label"])
+
+
+def getpid(x):
+    time.sleep(0.1)
+    return os.getpid()
+
+
+def raise_value_error(x):
+    raise ValueError("Invalid point.")
+
+
+def crash(x):
+    os._exit(1)
+
+
+def crash_once(flag):
+    # Crash on the first call only, the flag file survives the worker.
+    if not os.path.exists(flag):
+        open(flag, "w").close()
+        os._exit(1)
+    return 1.0
+
+
+def sleep(x):
+    time.sleep(10)
+
+
+class TestProcessPool(TestCase):
+
+    def test_values_of_all_kinds(self):
+        x = np.arange(1.0, 4.0)
+        with ProcessPool() as pool:
+            fun = pool.function(values_of_all_kinds)
+            # The second call uses the shared memory for the results.
+            for _ in range(2):
+                total, twice, matrix, (first, label) = fun(x)
+                assert_equal(total, 6)
+                assert_array_equal(twice, 2*x)
+                assert_equal(spc.isspmatrix_csr(matrix), True)
+                assert_array_equal(matrix.toarray(), np.diag(x))
+                assert_array_equal(first, [1])
+                assert_equal(label, "label")
+
+    def test_results_are_not_overwritten(self):
+        with ProcessPool() as pool:
+            fun = pool.function(rosenbrock_residuals)
+            x = np.linspace(-1, 1, 100000)
+            results = [fun(x), fun(2*x), fun(x)]
+        assert_array_equal(results[0], rosenbrock_residuals(x))
+        assert_array_equal(results[1], rosenbrock_residuals(2*x))
+        assert_array_equal(results[2], results[0])
+
+    def test_map_uses_all_workers(self):
+        with ProcessPool(n_workers=2) as pool:
+            pids = pool.function(getpid).map([np.zeros(1)]*4)
+        assert_equal(len(set(pids)), 2)
+        assert_equal(os.getpid() in pids, False)
+
+    def test_approx_derivative(self):
+        x0 = np.linspace(-1, 1, 20)
+        with ProcessPool(n_workers=2) as pool:
+            fun = pool.function(rosenbrock_residuals)
+            for method in ('2-point', '3-point'):
+                assert_array_equal(
+                    approx_derivative(fun, x0, method),
+                    approx_derivative(rosenbrock_residuals, x0, method))
+
+    def test_minimize_constrained(self):
+        prob = Maratos()
+        constr = prob.constr
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, constr)
+        with ProcessPool() as pool:
+            remote_constr = NonlinearConstraint(
+                pool.function(constr._fun), constr.kind,
+                pool.function(constr._jac), constr._hess)
+            remote_result = minimize_constrained(
+                pool.function(prob.fun), prob.x0, pool.function(prob.grad),
+                pool.function(prob.hess), remote_constr)
+        assert_array_equal(remote_result.x, result.x)
+        assert_equal(remote_result.nfev, result.nfev)
+
+    def test_exception(self):
+        with ProcessPool() as pool:
+            fun = pool.function(raise_value_error)
+            assert_raises(ValueError, fun, np.zeros(2))
+            # The worker is still usable.
+            assert_equal(pool.function(np.sum)(np.ones(3)), 3)
+            assert_equal(pool.n_restarts, 0)
+
+    def test_restart(self):
+        flag = os.path.join(tempfile.mkdtemp(), "flag")
+        with ProcessPool() as pool:
+            assert_equal(pool.function(crash_once)(flag), 1.0)
+            assert_equal(pool.n_restarts, 1)
+            fun = pool.function(crash)
+            assert_raises(RuntimeError, fun, np.zeros(2))
+            assert_equal(pool.n_restarts, 3)
+            assert_equal(pool.function(np.sum)(np.ones(3)), 3)
+
+    def test_timeout(self):
+        with ProcessPool(max_retries=0, timeout=0.5) as pool:
+            fun = pool.function(sleep)
+            start = time.time()
+            assert_raises(RuntimeError, fun, np.zeros(2))
+            assert_equal(time.time() - start < 5, True)
@@ -0,0 +1,166 @@
+from __future__ import division, print_function, absolute_import
+import numpy as np
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+from numpy.testing import (TestCase, assert_array_equal, assert_equal,
+                           assert_)
+from ipsolver import (minimize_constrained,
+                      ArrayRecorder,
+                      CSVRecorder,
+                      JSONLinesRecorder,
+                      LoggingRecorder)
+from ipsolver._recorders import SQP_FIELDS, IP_FIELDS, IterateHistory
+from test_minimized_constrained import Maratos, HyperbolicIneq
+
+
+class State:
+    def __init__(self, niter):
+        self.niter = niter
+        self.nfev = niter + 1
+        self.cg_niter = 2*niter
+        self.trust_radius = 1.0/(niter + 1)
+        self.penalty = 1.0
+        self.optimality = 0.5
+        self.constr_violation = 0.25
+
+
+class TestArrayRecorder(TestCase):
+
+    def test_growth(self):
+        recorder = ArrayRecorder(initial_size=2)
+        recorder.start('equality_constrained_sqp', SQP_FIELDS)
+        for i in range(10):
+            recorder.record(State(i))
+        assert_equal(len(recorder), 10)
+        assert_array_equal(recorder["niter"], np.arange(10))
+        assert_array_equal(recorder["cg_niter"], 2*np.arange(10))
+        assert_equal(recorder["niter"].dtype, int)
+        assert_equal(recorder["trust_radius"].dtype, float)
+
+    def test_bounded_memory(self):
+        recorder = ArrayRecorder(max_records=4, initial_size=2)
+        recorder.start('equality_constrained_sqp', SQP_FIELDS)
+        for i in range(11):
+            recorder.record(State(i))
+        assert_equal(len(recorder), 4)
+        assert_array_equal(recorder["niter"], [7, 8, 9, 10])
+        assert_array_equal(recorder.as_dict()["nfev"], [8, 9, 10, 11])
+
+
+class TestIterateHistory(TestCase):
+
+    def test_growth(self):
+        history = IterateHistory(initial_size=2)
+        for i in range(9):
+            history.append(np.full(3, i))
+        assert_equal(len(history), 9)
+        allvecs = history.to_array()
+        assert_array_equal(allvecs,
+                           np.repeat(np.arange(9.0)[:, None], 3, axis=1))
+        # The array does not share the storage of the history.
+        assert_(not np.shares_memory(allvecs, history._data))
+        history.append(np.full(3, 9))
+        assert_equal(allvecs.shape, (9, 3))
+
+    def test_ring_buffer_and_downsampling(self):
+        history = IterateHistory(max_size=3, every=2, initial_size=2)
+        for i in range(11):
+            history.append([i, -i])
+        assert_equal(len(history), 3)
+        assert_array_equal(history.to_array()[:, 0], [6, 8, 10])
+
+    def test_memmap(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "history")
+            history = IterateHistory(filename=filename, initial_size=2)
+            for i in range(5):
+                history.append(np.arange(4) + i)
+            assert_(isinstance(history.to_array(), np.memmap))
+            assert_array_equal(history.to_array()[-1], np.arange(4) + 4)
+            assert_equal(os.path.getsize(filename), 8*4*8)
+            del history
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_return_all(self):
+        prob = HyperbolicIneq()
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, prob.constr,
+                                      options={"return_all": True})
+        assert_equal(result.allvecs.shape, (result.niter, len(prob.x0)))
+        assert_equal(len(result.allslack), result.niter)
+        assert_equal(len(result.allmult), result.niter)
+        assert_array_equal(result.allvecs[-1], result.x)
+        assert_array_equal(result.allslack[-1], result.s)
+
+        prob = Maratos()
+        result = minimize_constrained(prob.fun, prob.x0, prob.grad,
+                                      prob.hess, prob.constr,
+                                      options={"return_all": True,
+                                               "history_size": 2})
+        assert_equal(result.allvecs.shape, (2, 2))
+        assert_array_equal(result.allvecs[-1], result.x)
+        assert_array_equal(result.allmult[-1], result.v)
+
+
+class TestRecorders(TestCase):
+
+    def test_minimize_constrained(self):
+        for prob, fields in ((Maratos(), SQP_FIELDS),
+                             (HyperbolicIneq(), IP_FIELDS)):
+            array_recorder = ArrayRecorder()
+            csv_file = io.StringIO()
+            json_file = io.StringIO()
+            result = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                recorder=[array_recorder,
+                          CSVRecorder(csv_file, buffer_size=3),
+                          JSONLinesRecorder(json_file)])
+            niter = array_recorder["niter"]
+            assert_equal(niter[-1], result.niter)
+            assert_equal(array_recorder["optimality"][-1],
+                         result.optimality)
+
+            lines = csv_file.getvalue().splitlines()
+            assert_equal(lines[0].split(","), list(fields))
+            assert_equal(len(lines), len(niter) + 1)
+            assert_equal(int(lines[-1].split(",")[0]), result.niter)
+
+            records = [json.loads(line)
+                       for line in json_file.getvalue().splitlines()]
+            assert_equal(len(records), len(niter))
+            assert_equal(records[-1]["niter"], result.niter)
+            assert_equal(records[-1]["method"], result.method)
+
+    def test_logging(self):
+        records = []
+
+        class Handler(logging.Handler):
+            def emit(self, record):
+                records.append(record)
+
+        logger = logging.getLogger("ipsolver.test")
+        logger.setLevel(logging.INFO)
+        handler = Handler()
+        logger.addHandler(handler)
+        try:
+            prob = Maratos()
+            result = minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                recorder=LoggingRecorder(logger))
+            assert_equal(records[-1].iteration["niter"], result.niter)
+            assert_("niter=" in records[-1].getMessage())
+
+            # Disabled level: nothing is emitted
+            del records[:]
+            minimize_constrained(
+                prob.fun, prob.x0, prob.grad, prob.hess, prob.constr,
+                recorder=LoggingRecorder(logger, logging.DEBUG))
+            assert_equal(records, [])
+        finally:
+            logger.removeHandler(handler)
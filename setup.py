@@ -7,9 +7,10 @@ setup(name='ip-nonlinear-solver',
       author='Antonio H. Ribeiro, Nikolay Mayorov, Matt Haberland, Ralf Gommers',
       author_email='antonior92@gmail.com',
       packages=['ipsolver'],
+      python_requires='>=3.8',
       test_suite='nose.collector',
-      install_requires=['scipy>=0.19.1', 'numpy>=1.13.1'],
-      test_require=['scipy>=0.19.1',
+      install_requires=['scipy>=1.0', 'numpy>=1.13.1'],
+      test_require=['scipy>=1.0',
                     'numpy>=1.13.1',
                     'nose>=1.0',
                     'pytest'])